@@ -0,0 +1,275 @@
+"""
+Inference Runtime Auto-Tuner
+Benchmark thread counts, worker processes and batch sizes on this machine
+
+Every candidate (worker processes x intra-op threads x inter-op threads)
+is started as real worker processes that load the model through
+MLPredictionService, then score the bundled sample comments at each
+candidate batch size for a fixed time. The fastest configuration whose
+p95 batch latency stays under --max-latency-ms is written to the runtime
+profile (RUNTIME_PROFILE_PATH), which the service applies at load time.
+
+Usage (from the project root):
+    python -m app.cli.autotune
+    python -m app.cli.autotune --standin --seconds 1 --dry-run
+    python -m app.cli.autotune --batch-sizes 8,16,32 --max-latency-ms 500
+"""
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+# Throughput within this share of the best counts as a tie; ties go to
+# fewer processes (less memory), then lower latency
+TIE_TOLERANCE = 0.05
+
+
+def _int_list(value: str) -> List[int]:
+    return sorted({int(part) for part in value.split(",") if part.strip()})
+
+
+def _powers_of_two(limit: int) -> List[int]:
+    values, n = [], 1
+    while n <= limit:
+        values.append(n)
+        n *= 2
+    if limit not in values:
+        values.append(limit)
+    return values
+
+
+def read_comments(path: Path, column: str) -> List[str]:
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        if column not in (reader.fieldnames or []):
+            raise SystemExit(f"❌ CSV must contain '{column}' column")
+        return [row[column].strip() for row in reader if (row[column] or "").strip()]
+
+
+def candidate_layouts(cores: int, processes: List[int], threads: List[int], interop: List[int],
+                      oversubscribe: bool) -> List[Dict[str, int]]:
+    """(processes, intra-op, inter-op) combinations that fit on `cores`"""
+    layouts = []
+    for p, t, i in itertools.product(processes, threads, interop):
+        if not oversubscribe and p * t > cores:
+            continue
+        layouts.append({"processes": p, "torch_num_threads": t, "torch_interop_threads": i})
+    return layouts
+
+
+# ============================================
+# WORKER PROCESS
+# ============================================
+def _worker(layout: Dict[str, int], standin: bool, texts: List[str], batch_sizes: List[int],
+            seconds: float, barrier, results):
+    """Load the model like the app does, then time batches in lock-step with the other workers"""
+    if standin:
+        os.environ["ML_STANDIN_MODEL"] = "1"
+    from app.services.ml_service import ml_service
+
+    ml_service.configure_threads(layout["torch_num_threads"], layout["torch_interop_threads"])
+    ml_service._load_model()
+
+    for batch_size in batch_sizes:
+        # The service packs forward passes by token budget; size it like the
+        # profile would (batch_size full-length rows) so each batch is one pass
+        ml_service.token_budget = batch_size * ml_service.max_length
+        batches = [
+            [texts[(start + k) % len(texts)] for k in range(batch_size)]
+            for start in range(0, len(texts), batch_size)
+        ]
+        ml_service._infer(batches[0], record=False)  # warm-up (allocator, kernels)
+
+        # All workers start timing together, as concurrent servers would
+        barrier.wait()
+        latencies, comments = [], 0
+        started = time.perf_counter()
+        for batch in itertools.cycle(batches):
+            begin = time.perf_counter()
+            ml_service._infer(batch, record=False)
+            latencies.append((time.perf_counter() - begin) * 1000)
+            comments += len(batch)
+            if time.perf_counter() - started >= seconds:
+                break
+        results.put((batch_size, latencies, comments, time.perf_counter() - started))
+
+
+def benchmark_layout(layout: Dict[str, int], standin: bool, texts: List[str], batch_sizes: List[int],
+                     seconds: float, timeout: float) -> List[Dict[str, Any]]:
+    """Run one process/thread layout across every batch size"""
+    context = multiprocessing.get_context("spawn")  # fresh torch thread pools per run
+    processes = layout["processes"]
+    barrier = context.Barrier(processes)
+    results = context.Queue()
+    workers = [
+        context.Process(target=_worker, args=(layout, standin, texts, batch_sizes, seconds, barrier, results),
+                        daemon=True)
+        for _ in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+
+    rows = []
+    try:
+        for batch_size in batch_sizes:
+            reports = [results.get(timeout=timeout) for _ in range(processes)]
+            latencies = sorted(ms for report in reports for ms in report[1])
+            comments = sum(report[2] for report in reports)
+            wall = max(report[3] for report in reports)
+            row = {
+                **layout,
+                "batch_size": batch_size,
+                "comments_per_sec": round(comments / wall, 1),
+                "p50_ms": round(latencies[len(latencies) // 2], 2),
+                "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2)
+            }
+            rows.append(row)
+            print(f"  procs={processes} intra={layout['torch_num_threads']} inter={layout['torch_interop_threads']} "
+                  f"batch={batch_size:<4} {row['comments_per_sec']:10.1f} comments/s   "
+                  f"p50 {row['p50_ms']:8.1f} ms   p95 {row['p95_ms']:8.1f} ms")
+    except queue.Empty:
+        print(f"  ⚠️ Layout {layout} timed out after {timeout:.0f}s, skipped", file=sys.stderr)
+    finally:
+        for worker in workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+    return rows
+
+
+# ============================================
+# SELECTION
+# ============================================
+def select_best(rows: List[Dict[str, Any]], max_latency_ms: float) -> Optional[Dict[str, Any]]:
+    """
+    Highest throughput whose p95 batch latency fits the budget
+
+    Near-ties prefer fewer processes, then lower p95. If nothing fits the
+    budget, the lowest-latency configuration wins.
+    """
+    if not rows:
+        return None
+    eligible = [row for row in rows if row["p95_ms"] <= max_latency_ms]
+    if not eligible:
+        return min(rows, key=lambda row: row["p95_ms"])
+    best = max(row["comments_per_sec"] for row in eligible)
+    close = [row for row in eligible if row["comments_per_sec"] >= best * (1 - TIE_TOLERANCE)]
+    return min(close, key=lambda row: (row["processes"], row["p95_ms"]))
+
+
+def build_profile(best: Dict[str, Any], rows: List[Dict[str, Any]], args, model: str) -> Dict[str, Any]:
+    import torch
+
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "cpu_count": os.cpu_count()
+        },
+        "model": model,
+        "max_latency_ms": args.max_latency_ms,
+        "settings": {
+            "torch_num_threads": best["torch_num_threads"],
+            "torch_interop_threads": best["torch_interop_threads"],
+            "batch_size": best["batch_size"],
+            "web_concurrency": best["processes"]
+        },
+        "selected": best,
+        "results": rows
+    }
+
+
+def run(args) -> int:
+    cores = os.cpu_count() or 1
+    processes = _int_list(args.processes) if args.processes else _powers_of_two(min(cores, args.max_processes))
+    threads = _int_list(args.threads) if args.threads else _powers_of_two(cores)
+    interop = _int_list(args.interop) if args.interop else [n for n in (1, 2) if n <= cores]
+    batch_sizes = _int_list(args.batch_sizes)
+
+    layouts = candidate_layouts(cores, processes, threads, interop, args.oversubscribe)
+    if not layouts:
+        raise SystemExit("❌ No candidate layout fits on this machine (try --oversubscribe)")
+
+    if args.standin:
+        os.environ["ML_STANDIN_MODEL"] = "1"
+    from app.config import MODEL_VERSION, RUNTIME_PROFILE_PATH
+    from app.services.ml_service import ml_service
+
+    comments = read_comments(Path(args.input), args.column)
+    print(f"🔤 Preprocessing {len(comments)} sample comments...")
+    texts = [ml_service.preprocess(comment) for comment in comments]
+
+    model = "standin" if args.standin else MODEL_VERSION
+    print(f"🔧 {len(layouts)} layout(s) x {len(batch_sizes)} batch size(s) on {cores} core(s), model={model}")
+    rows = []
+    for layout in layouts:
+        rows.extend(benchmark_layout(layout, args.standin, texts, batch_sizes, args.seconds, args.timeout))
+
+    best = select_best(rows, args.max_latency_ms)
+    if best is None:
+        print("❌ No configuration finished", file=sys.stderr)
+        return 1
+    if best["p95_ms"] > args.max_latency_ms:
+        print(f"⚠️ Nothing met p95 <= {args.max_latency_ms:g} ms; using the lowest-latency configuration")
+
+    profile = build_profile(best, rows, args, model)
+    settings = profile["settings"]
+    print(f"\n🏆 batch_size={settings['batch_size']}  torch_num_threads={settings['torch_num_threads']}  "
+          f"torch_interop_threads={settings['torch_interop_threads']}  web_concurrency={settings['web_concurrency']}  "
+          f"({best['comments_per_sec']:.1f} comments/s, p95 {best['p95_ms']:.1f} ms)")
+
+    if args.dry_run:
+        print(json.dumps(profile, indent=2))
+        return 0
+
+    output = Path(args.output or RUNTIME_PROFILE_PATH)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+    print(f"💾 Runtime profile written to {output} (applied when the model loads)")
+    if settings["web_concurrency"] > 1:
+        print(f"   Start the server with WEB_CONCURRENCY={settings['web_concurrency']} to match it")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Tune torch threads, worker processes and batch size")
+    parser.add_argument("--input", default=str(PROJECT_ROOT / "sample_comments.csv"),
+                        help="CSV of comments to score (default: bundled sample_comments.csv)")
+    parser.add_argument("--column", default="Comment", help="Comment column name")
+    parser.add_argument("--output", help="Profile path (default: RUNTIME_PROFILE_PATH)")
+    parser.add_argument("--batch-sizes", default="1,8,16,32,64", help="Comma-separated batch sizes")
+    parser.add_argument("--threads", help="Intra-op thread counts (default: powers of two up to the core count)")
+    parser.add_argument("--interop", help="Inter-op thread counts (default: 1,2)")
+    parser.add_argument("--processes", help="Worker process counts (default: powers of two up to --max-processes)")
+    parser.add_argument("--max-processes", type=int, default=4,
+                        help="Upper bound for the default process candidates (each holds a model copy)")
+    parser.add_argument("--oversubscribe", action="store_true", help="Also try processes x threads > cores")
+    parser.add_argument("--max-latency-ms", type=float, default=1000.0,
+                        help="p95 latency budget per forward pass")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Measurement time per batch size")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Give up on a layout after this many seconds")
+    parser.add_argument("--standin", action="store_true", help="Use the tiny stand-in model (ML_STANDIN_MODEL)")
+    parser.add_argument("--dry-run", action="store_true", help="Print the profile instead of writing it")
+    return parser
+
+
+def main(argv=None):
+    sys.exit(run(build_parser().parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""
+Offline Bulk Scorer
+Score large review dumps without going through the HTTP API
+
+Streams a CSV / JSONL / Parquet file through the same preprocessing and
+model code as the web app (MLPredictionService), using a pool of worker
+processes, and appends results to the output file chunk by chunk. A
+checkpoint file makes the run resumable after an interruption.
+
+Usage (from the project root):
+    python -m app.cli.bulk_score reviews.csv scored.csv --workers 4
+    python -m app.cli.bulk_score reviews.jsonl scored.jsonl --resume
+    python -m app.cli.bulk_score reviews.parquet scored.csv \\
+        --load-history --username alice --product-name "Tai nghe X"
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+# (input row number, comment)
+Row = Tuple[int, str]
+
+
+# ============================================
+# INPUT READERS
+# ============================================
+def _comment_from_record(record: dict, column: str) -> str:
+    value = record.get(column)
+    if value is None:
+        value = record.get(column.lower(), "")
+    return str(value or "").strip()
+
+
+def read_rows(path: Path, column: str, skip: int = 0) -> Iterator[Row]:
+    """Yield (row number, comment) for every input row after the first `skip`"""
+    suffix = path.suffix.lower()
+
+    if suffix == ".csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            if column not in (reader.fieldnames or []):
+                raise SystemExit(f"❌ CSV must contain '{column}' column")
+            for index, record in enumerate(reader):
+                if index >= skip:
+                    yield index, _comment_from_record(record, column)
+
+    elif suffix in (".jsonl", ".ndjson"):
+        with open(path, encoding="utf-8") as f:
+            for index, line in enumerate(f):
+                if index >= skip and line.strip():
+                    yield index, _comment_from_record(json.loads(line), column)
+
+    elif suffix == ".parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("❌ Parquet input requires pyarrow (pip install pyarrow)")
+        parquet = pq.ParquetFile(path)
+        index = 0
+        for batch in parquet.iter_batches(columns=[column], batch_size=8192):
+            values = batch.column(0).to_pylist()
+            if index + len(values) <= skip:
+                index += len(values)
+                continue
+            for value in values:
+                if index >= skip:
+                    yield index, str(value or "").strip()
+                index += 1
+
+    else:
+        raise SystemExit(f"❌ Unsupported input format: {suffix} (use .csv, .jsonl or .parquet)")
+
+
+def count_rows(path: Path) -> Optional[int]:
+    """Total input rows, used for the ETA (CSV count is approximate for multi-line cells)"""
+    suffix = path.suffix.lower()
+    if suffix == ".parquet":
+        try:
+            import pyarrow.parquet as pq
+            return pq.ParquetFile(path).metadata.num_rows
+        except ImportError:
+            return None
+
+    with open(path, "rb") as f:
+        lines = sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b""))
+    return lines - 1 if suffix == ".csv" else lines
+
+
+def chunked(rows: Iterator[Row], size: int) -> Iterator[List[Row]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ============================================
+# OUTPUT WRITERS
+# ============================================
+class ResultWriter:
+    """Append-only CSV / JSONL writer that reports its byte offset for checkpoints"""
+
+    CSV_FIELDS = ['Row', 'Comment', 'Predicted_Rating', 'Confidence']
+
+    def __init__(self, path: Path, resume_offset: Optional[int]):
+        self.format = "jsonl" if path.suffix.lower() in (".jsonl", ".ndjson") else "csv"
+        if resume_offset is None:
+            self.file = open(path, "w", newline="", encoding="utf-8")
+        else:
+            self.file = open(path, "r+", newline="", encoding="utf-8")
+            self.file.truncate(resume_offset)
+            self.file.seek(resume_offset)
+
+        self.csv_writer = csv.writer(self.file) if self.format == "csv" else None
+        if self.csv_writer and resume_offset is None:
+            self.csv_writer.writerow(self.CSV_FIELDS)
+
+    def write(self, rows: List[Row], predictions: "PredictionBatch"):
+        _, ratings, confidences = predictions.columns(decimals=6)
+        for (index, comment), rating, confidence in zip(rows, ratings, confidences):
+            if self.csv_writer:
+                self.csv_writer.writerow([index, comment, rating, confidence])
+            else:
+                self.file.write(json.dumps({
+                    'row': index,
+                    'comment': comment,
+                    'predicted_rating': rating,
+                    'confidence': confidence
+                }, ensure_ascii=False) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    @property
+    def offset(self) -> int:
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+# ============================================
+# CHECKPOINTS
+# ============================================
+def load_checkpoint(path: Path, input_path: Path, output_path: Path) -> Optional[dict]:
+    if not path.exists():
+        return None
+    checkpoint = json.loads(path.read_text())
+    if checkpoint.get('input') != str(input_path) or checkpoint.get('output') != str(output_path):
+        raise SystemExit(f"❌ Checkpoint {path} belongs to a different input/output pair")
+    return checkpoint
+
+
+def save_checkpoint(path: Path, checkpoint: dict):
+    """Atomically replace the checkpoint file"""
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_text(json.dumps(checkpoint))
+    os.replace(tmp_path, path)
+
+
+# ============================================
+# WORKERS
+# ============================================
+def _init_worker(threads_per_worker: int):
+    """Load the model once per worker process"""
+    from app.services.ml_service import ml_service
+    ml_service.configure_threads(threads_per_worker)
+    ml_service._load_model()
+
+
+def _score_chunk(comments: List[str]) -> "PredictionBatch":
+    from app.services.ml_service import ml_service
+    return ml_service.predict_batch(comments)
+
+
+class _InlineExecutor:
+    """Single-process stand-in for ProcessPoolExecutor (workers=1)"""
+
+    class _Done:
+        def __init__(self, value):
+            self._value = value
+
+        def result(self):
+            return self._value
+
+    def submit(self, func, *args):
+        return self._Done(func(*args))
+
+    def shutdown(self, *args, **kwargs):
+        pass
+
+
+# ============================================
+# PROGRESS
+# ============================================
+class Progress:
+    def __init__(self, total: Optional[int], already_done: int, interval: float = 2.0):
+        self.total = total
+        self.start_rows = already_done
+        self.rows = already_done
+        self.started = time.monotonic()
+        self.last_report = 0.0
+        self.interval = interval
+
+    def update(self, rows_done: int, force: bool = False):
+        self.rows = rows_done
+        now = time.monotonic()
+        if not force and now - self.last_report < self.interval:
+            return
+        self.last_report = now
+
+        elapsed = max(now - self.started, 1e-9)
+        rate = (self.rows - self.start_rows) / elapsed
+        message = f"⏱️  {self.rows:,} rows  {rate:,.1f} rows/s"
+        if self.total:
+            remaining = max(self.total - self.rows, 0)
+            eta = remaining / rate if rate > 0 else float("inf")
+            eta_text = time.strftime("%H:%M:%S", time.gmtime(eta)) if eta != float("inf") else "--:--:--"
+            message += f"  {self.rows / self.total:6.1%}  ETA {eta_text}"
+        print(message, file=sys.stderr, flush=True)
+
+
+# ============================================
+# MAIN
+# ============================================
+def _resolve_user_id(username: str) -> int:
+    from app.database import SessionLocal
+    from app.models import User
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.username == username).first()
+        if user is None:
+            raise SystemExit(f"❌ Unknown user: {username}")
+        return user.id
+    finally:
+        db.close()
+
+
+def run(args) -> int:
+    input_path = Path(args.input).resolve()
+    output_path = Path(args.output).resolve()
+    checkpoint_path = Path(args.checkpoint or f"{output_path}.ckpt").resolve()
+
+    checkpoint = load_checkpoint(checkpoint_path, input_path, output_path) if args.resume else None
+    if checkpoint is None:
+        checkpoint = {
+            'input': str(input_path),
+            'output': str(output_path),
+            'rows_consumed': 0,
+            'rows_scored': 0,
+            'output_bytes': None,
+            'history_rows': 0,
+        }
+    else:
+        print(f"↩️  Resuming after {checkpoint['rows_consumed']:,} rows", file=sys.stderr)
+
+    user_id = _resolve_user_id(args.username) if args.load_history else None
+
+    writer = ResultWriter(output_path, checkpoint['output_bytes'])
+    progress = Progress(args.total or count_rows(input_path), checkpoint['rows_consumed'])
+
+    workers = max(1, args.workers)
+    if workers == 1:
+        executor = _InlineExecutor()
+        _init_worker(max(1, os.cpu_count() or 1))
+    else:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(threads,))
+
+    history_db = None
+    if user_id is not None:
+        from app.database import SessionLocal
+        history_db = SessionLocal()
+
+    pending = deque()
+    rows = read_rows(input_path, args.column, skip=checkpoint['rows_consumed'])
+
+    def drain_one():
+        chunk, future = pending.popleft()
+        scored = [row for row in chunk if row[1]]
+        predictions = future.result()
+
+        writer.write(scored, predictions)
+        if history_db is not None:
+            from app.services.history_service import save_prediction_history
+            checkpoint['history_rows'] += save_prediction_history(
+                history_db, user_id, args.product_name, predictions, prediction_type='bulk'
+            )
+
+        checkpoint['rows_consumed'] = chunk[-1][0] + 1
+        checkpoint['rows_scored'] += len(scored)
+        checkpoint['output_bytes'] = writer.offset
+        save_checkpoint(checkpoint_path, checkpoint)
+        progress.update(checkpoint['rows_consumed'])
+
+    try:
+        for chunk in chunked(rows, args.chunk_size):
+            comments = [comment for _, comment in chunk if comment]
+            pending.append((chunk, executor.submit(_score_chunk, comments)))
+            # Bounded in-flight work keeps memory flat on huge inputs
+            if len(pending) >= workers * 2:
+                drain_one()
+        while pending:
+            drain_one()
+    except KeyboardInterrupt:
+        print(f"\n⏸️  Interrupted - rerun with --resume to continue from row {checkpoint['rows_consumed']:,}",
+              file=sys.stderr)
+        return 130
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        writer.close()
+        if history_db is not None:
+            history_db.close()
+
+    progress.update(checkpoint['rows_consumed'], force=True)
+    print(f"✅ Scored {checkpoint['rows_scored']:,} comments → {output_path}", file=sys.stderr)
+    if user_id is not None:
+        print(f"🗄️  Loaded {checkpoint['history_rows']:,} rows into prediction_history", file=sys.stderr)
+    checkpoint_path.unlink(missing_ok=True)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Score a CSV/JSONL/Parquet file of reviews offline")
+    parser.add_argument("input", help="Input file (.csv, .jsonl or .parquet)")
+    parser.add_argument("output", help="Output file (.csv or .jsonl)")
+    parser.add_argument("--column", default="Comment", help="Column/field holding the comment (default: Comment)")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes, each with its own model copy")
+    parser.add_argument("--chunk-size", type=int, default=256, help="Rows per work unit / checkpoint")
+    parser.add_argument("--checkpoint", help="Checkpoint path (default: <output>.ckpt)")
+    parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint if present")
+    parser.add_argument("--total", type=int, help="Total rows for the ETA (default: counted up front)")
+    parser.add_argument("--load-history", action="store_true", help="Also insert results into prediction_history")
+    parser.add_argument("--username", help="Owner of the history rows (with --load-history)")
+    parser.add_argument("--product-name", default="", help="Product name for the history rows")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.load_history and not args.username:
+        raise SystemExit("❌ --load-history requires --username")
+    sys.exit(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Cascade CLI
+Train and evaluate the lexical fast path from prediction_history
+
+`train` distils PhoBERT's stored predictions into a hashed n-gram model,
+evaluates it on a held-out split and stores the lowest confidence
+threshold that still reaches --target-agreement. `report` shows the
+agreement / skipped-traffic trade-off of the current model on recent rows.
+
+Rows answered by the cascade itself are also stored in prediction_history;
+pass --relabel to re-score comments with PhoBERT instead of trusting the
+stored labels.
+
+Usage (from the project root):
+    python -m app.cli.cascade train --target-agreement 0.97
+    python -m app.cli.cascade train --relabel --limit 20000
+    python -m app.cli.cascade report --limit 2000
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime
+from typing import List, Tuple
+
+THRESHOLDS = [0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.93, 0.95, 0.97, 0.99]
+MIN_TRAINING_ROWS = 50
+
+
+def load_history(limit: int) -> Tuple[List[str], List[int]]:
+    """Newest distinct comments with their stored rating"""
+    from app.database import SessionLocal
+    from app.services.history_service import recent_distinct_comments
+
+    db = SessionLocal()
+    try:
+        rows = recent_distinct_comments(db, limit)
+    finally:
+        db.close()
+    return [comment for comment, _ in rows], [rating for _, rating in rows]
+
+
+def relabel(texts: List[str], chunk_size: int = 256) -> List[int]:
+    """Score comments with PhoBERT (bypassing the cascade)"""
+    from app.services.ml_service import ml_service
+
+    labels = []
+    started = time.monotonic()
+    for start in range(0, len(texts), chunk_size):
+        chunk = texts[start:start + chunk_size]
+        labels.extend(ml_service._predict_batch_phobert(chunk).ratings.tolist())
+        rate = len(labels) / max(time.monotonic() - started, 1e-9)
+        print(f"\r🧠 Relabelled {len(labels):,}/{len(texts):,} ({rate:,.1f}/s)", end="", file=sys.stderr)
+    print(file=sys.stderr)
+    return labels
+
+
+def _load_labels(args) -> Tuple[List[str], List[int], str]:
+    texts, labels = load_history(args.limit)
+    source = "prediction_history"
+    if args.relabel and texts:
+        from app.config import MODEL_VERSION
+        labels = relabel(texts)
+        source = f"relabel:{MODEL_VERSION}"
+    return texts, labels, source
+
+
+def print_report(rows):
+    print(f"\n  {'threshold':>9}  {'skipped':>8}  {'fast agree':>10}  {'cascade agree':>13}")
+    for row in rows:
+        fast = f"{row['fast_path_agreement']:.2%}" if row['fast_path_agreement'] is not None else "-"
+        print(f"  {row['threshold']:>9.2f}  {row['skipped_share']:>8.1%}  {fast:>10}  "
+              f"{row['cascade_agreement']:>13.2%}")
+    if rows:
+        print(f"  lexical tier: {rows[0]['lexical_ms_per_comment']:.3f} ms/comment")
+
+
+def choose_threshold(rows, target_agreement: float):
+    """Lowest threshold (= most traffic skipped) whose fast-path agreement meets the target"""
+    for row in rows:
+        if row['fast_path_agreement'] is not None and row['fast_path_agreement'] >= target_agreement:
+            return row
+    return None
+
+
+def train(args) -> int:
+    from app.config import CASCADE_MODEL_PATH
+    from app.services.cascade_service import DISABLED_THRESHOLD, LexicalClassifier, evaluate
+
+    texts, labels, source = _load_labels(args)
+    if len(texts) < MIN_TRAINING_ROWS:
+        print(f"❌ Need at least {MIN_TRAINING_ROWS} distinct comments in prediction_history, found {len(texts)}",
+              file=sys.stderr)
+        return 1
+
+    pairs = list(zip(texts, labels))
+    random.Random(args.seed).shuffle(pairs)
+    holdout = max(1, int(len(pairs) * args.holdout))
+    test, training = pairs[:holdout], pairs[holdout:]
+
+    print(f"🏋️ Training on {len(training):,} comments ({source}), evaluating on {len(test):,}...")
+    started = time.perf_counter()
+    model = LexicalClassifier.train(
+        [t for t, _ in training], [r for _, r in training],
+        n_features=2 ** args.hash_bits, epochs=args.epochs
+    )
+    print(f"   done in {time.perf_counter() - started:.1f}s")
+
+    rows = evaluate(model, [t for t, _ in test], [r for _, r in test], THRESHOLDS)
+    print_report(rows)
+
+    chosen = choose_threshold(rows, args.target_agreement)
+    if chosen is None:
+        print(f"\n⚠️ No threshold reaches {args.target_agreement:.0%} agreement; "
+              f"the fast path stays off (threshold {DISABLED_THRESHOLD})", file=sys.stderr)
+    threshold = chosen['threshold'] if chosen else DISABLED_THRESHOLD
+
+    model.metadata = {
+        "trained_at": datetime.now().isoformat(timespec="seconds"),
+        "label_source": source,
+        "training_rows": len(training),
+        "holdout_rows": len(test),
+        "hash_bits": args.hash_bits,
+        "threshold": threshold,
+        "target_agreement": args.target_agreement,
+        "holdout": chosen
+    }
+    output = args.output or str(CASCADE_MODEL_PATH)
+    model.save(output)
+    print(f"\n💾 Saved {output} with threshold {threshold:.2f}"
+          + (f" (skips {chosen['skipped_share']:.1%}, {chosen['fast_path_agreement']:.2%} agreement)" if chosen else ""))
+    print("   Running servers pick up the new file on the next prediction.")
+    return 0
+
+
+def report(args) -> int:
+    from app.config import CASCADE_MODEL_PATH, CASCADE_THRESHOLD
+    from app.services.cascade_service import LexicalClassifier, evaluate
+
+    path = args.model or str(CASCADE_MODEL_PATH)
+    try:
+        model = LexicalClassifier.load(path)
+    except FileNotFoundError:
+        print(f"❌ No cascade model at {path}; run `python -m app.cli.cascade train` first", file=sys.stderr)
+        return 1
+
+    texts, labels, source = _load_labels(args)
+    if not texts:
+        print("❌ prediction_history is empty", file=sys.stderr)
+        return 1
+
+    threshold = CASCADE_THRESHOLD if CASCADE_THRESHOLD is not None else model.metadata.get("threshold")
+    print(f"📊 {path} (trained {model.metadata.get('trained_at', '?')}, threshold {threshold})")
+    print(f"   evaluated on {len(texts):,} recent comments labelled by {source}")
+    thresholds = sorted(set(THRESHOLDS + ([threshold] if threshold is not None else [])))
+    print_report(evaluate(model, texts, labels, thresholds))
+    if source == "prediction_history":
+        print("\n   Note: rows answered by the cascade are in the history too; use --relabel for unbiased numbers")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Train / evaluate the lexical cascade tier")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = commands.add_parser("train", help="Distil prediction_history into the lexical model")
+    train_parser.add_argument("--limit", type=int, default=50000, help="Newest N history rows (0 = all)")
+    train_parser.add_argument("--relabel", action="store_true", help="Re-score comments with PhoBERT first")
+    train_parser.add_argument("--holdout", type=float, default=0.2, help="Share of rows kept for evaluation")
+    train_parser.add_argument("--target-agreement", type=float, default=0.95,
+                              help="Required fast-path agreement with PhoBERT on the holdout")
+    train_parser.add_argument("--hash-bits", type=int, default=18, help="2^N hashed feature buckets")
+    train_parser.add_argument("--epochs", type=int, default=200)
+    train_parser.add_argument("--seed", type=int, default=13)
+    train_parser.add_argument("--output", help="Model path (default: CASCADE_MODEL_PATH)")
+    train_parser.set_defaults(func=train)
+
+    report_parser = commands.add_parser("report", help="Agreement and skipped traffic per threshold")
+    report_parser.add_argument("--limit", type=int, default=2000, help="Newest N history rows (0 = all)")
+    report_parser.add_argument("--relabel", action="store_true", help="Compare against fresh PhoBERT labels")
+    report_parser.add_argument("--model", help="Model path (default: CASCADE_MODEL_PATH)")
+    report_parser.set_defaults(func=report)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Early-Exit CLI
+Calibrate intermediate exit heads for the served model and report their effect
+
+`calibrate` runs the full model over recent prediction_history comments,
+distils a linear head at every exit layer from the final layer's output,
+picks per-head confidence thresholds on a held-out split and saves them as
+`<version>.exits.pt` next to the weights. `report` measures average layers
+executed, latency saved and agreement with the full model.
+
+Usage (from the project root):
+    python -m app.cli.early_exit calibrate --target-agreement 0.98
+    python -m app.cli.early_exit calibrate --layers 4,6,8,10 --limit 5000
+    python -m app.cli.early_exit report --limit 1000
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+MIN_CALIBRATION_ROWS = 50
+
+
+def _load_model():
+    from app.services.ml_service import ml_service
+
+    ml_service._load_model()
+    return ml_service, ml_service.registry.active
+
+
+def _load_comments(limit: int) -> List[str]:
+    from app.database import SessionLocal
+    from app.services.history_service import recent_distinct_comments
+
+    db = SessionLocal()
+    try:
+        return [comment for comment, _ in recent_distinct_comments(db, limit)]
+    finally:
+        db.close()
+
+
+def encode(ml_service, texts: List[str]) -> List[List[int]]:
+    """Preprocess + tokenize; one model window per comment (its first)"""
+    processed = [ml_service.preprocess(text) for text in texts]
+    token_ids = ml_service.tokenizer(processed, add_special_tokens=False, truncation=False,
+                                     verbose=False)["input_ids"]
+    return [ml_service._windows(ids)[0] for ids in token_ids]
+
+
+def padded_batches(ml_service, sequences: List[List[int]]):
+    """(indices, input_ids, attention_mask) per token-budget batch"""
+    for batch in ml_service._token_batches([len(sequence) for sequence in sequences]):
+        input_ids, attention_mask = ml_service._pad([sequences[index] for index in batch])
+        yield batch, input_ids.to(ml_service.device), attention_mask.to(ml_service.device)
+
+
+def measure(ml_service, model, heads, sequences: List[List[int]]) -> Dict[str, Any]:
+    """Full model vs early exit on the same batches"""
+    import torch
+    from app.services.early_exit import early_exit_forward
+
+    num_layers = model.config.num_hidden_layers
+    agree = layers = 0
+    full_seconds = early_seconds = 0.0
+    with torch.no_grad():
+        # Warm both paths up so neither pays for first-call allocation
+        _, input_ids, attention_mask = next(padded_batches(ml_service, sequences[:8]))
+        model(input_ids=input_ids, attention_mask=attention_mask)
+        early_exit_forward(model, heads, input_ids, attention_mask)
+
+        for batch, input_ids, attention_mask in padded_batches(ml_service, sequences):
+            start = time.perf_counter()
+            full = model(input_ids=input_ids, attention_mask=attention_mask).logits
+            full_seconds += time.perf_counter() - start
+
+            start = time.perf_counter()
+            early, exit_layers = early_exit_forward(model, heads, input_ids, attention_mask)
+            early_seconds += time.perf_counter() - start
+
+            agree += int((full.argmax(dim=1) == early.argmax(dim=1)).sum())
+            layers += int(exit_layers.sum())
+
+    exits = len(sequences)
+    return {
+        "sequences": exits,
+        "agreement": round(agree / exits, 4),
+        "avg_layers_executed": round(layers / exits, 2),
+        "num_layers": num_layers,
+        "full_ms_per_sequence": round(full_seconds * 1000 / exits, 3),
+        "early_exit_ms_per_sequence": round(early_seconds * 1000 / exits, 3),
+        "latency_saved": round(1 - early_seconds / full_seconds, 4) if full_seconds else None
+    }
+
+
+def print_measurement(result: Dict[str, Any]):
+    print(f"\n  sequences            {result['sequences']:,}")
+    print(f"  agreement w/ full    {result['agreement']:.2%}")
+    print(f"  avg layers executed  {result['avg_layers_executed']:.2f} / {result['num_layers']}")
+    print(f"  full model           {result['full_ms_per_sequence']:.3f} ms/sequence")
+    print(f"  early exit           {result['early_exit_ms_per_sequence']:.3f} ms/sequence")
+    if result['latency_saved'] is not None:
+        print(f"  latency saved        {result['latency_saved']:.1%}")
+
+
+def calibrate(args) -> int:
+    import torch
+    from app.services.early_exit import (
+        calibrate_thresholds, collect_features, default_exit_layers, heads_path, train_heads
+    )
+
+    texts = _load_comments(args.limit)
+    if len(texts) < MIN_CALIBRATION_ROWS:
+        print(f"❌ Need at least {MIN_CALIBRATION_ROWS} distinct comments in prediction_history, found {len(texts)}",
+              file=sys.stderr)
+        return 1
+
+    ml_service, version = _load_model()
+    model = version.model
+    num_layers = model.config.num_hidden_layers
+    layers = [int(layer) for layer in args.layers.split(",")] if args.layers else default_exit_layers(num_layers)
+    layers = [layer for layer in layers if 0 < layer < num_layers]
+    if not layers:
+        print(f"❌ No exit layer below the model's {num_layers} layers", file=sys.stderr)
+        return 1
+
+    random.Random(args.seed).shuffle(texts)
+    print(f"🔎 Running {version.name} ({num_layers} layers) over {len(texts):,} comments...")
+    sequences = encode(ml_service, texts)
+    features = {layer: [None] * len(sequences) for layer in layers}
+    teacher = [None] * len(sequences)
+    for batch, input_ids, attention_mask in padded_batches(ml_service, sequences):
+        batch_features, logits = collect_features(model, input_ids, attention_mask, layers)
+        for row, index in enumerate(batch):
+            teacher[index] = logits[row]
+            for layer in layers:
+                features[layer][index] = batch_features[layer][row]
+
+    holdout = max(1, int(len(sequences) * args.holdout))
+    train_features = {layer: torch.stack(rows[holdout:]) for layer, rows in features.items()}
+    test_features = {layer: torch.stack(rows[:holdout]) for layer, rows in features.items()}
+
+    print(f"🏋️ Training heads at layers {layers} on {len(sequences) - holdout:,} comments...")
+    heads = train_heads(train_features, torch.stack(teacher[holdout:]), model.config.hidden_size, epochs=args.epochs)
+    calibration = calibrate_thresholds(heads, test_features, torch.stack(teacher[:holdout]), args.target_agreement)
+
+    print(f"\n  {'layer':>5}  {'threshold':>9}  {'exits':>7}  {'agreement':>9}")
+    for layer in layers:
+        chosen = calibration[layer]
+        if chosen is None:
+            print(f"  {layer:>5}  {'off':>9}  {'-':>7}  {'-':>9}")
+        else:
+            print(f"  {layer:>5}  {chosen['threshold']:>9.2f}  {chosen['exit_share']:>7.1%}  {chosen['agreement']:>9.2%}")
+
+    heads.metadata = {
+        "calibrated_at": datetime.now().isoformat(timespec="seconds"),
+        "version": version.name,
+        "training_rows": len(sequences) - holdout,
+        "holdout_rows": holdout,
+        "target_agreement": args.target_agreement
+    }
+    heads.to(ml_service.device)
+    result = measure(ml_service, model, heads, sequences[:holdout])
+    print_measurement(result)
+    heads.metadata["holdout"] = result
+
+    path = heads_path(version.path)
+    heads.cpu().save(path)
+    print(f"\n💾 Saved {path}; restart or re-activate {version.name} to serve with early exit")
+    return 0
+
+
+def report(args) -> int:
+    from app.services.early_exit import ExitHeads, heads_path
+
+    ml_service, version = _load_model()
+    path = heads_path(version.path)
+    try:
+        heads = ExitHeads.load(path).to(ml_service.device)
+    except FileNotFoundError:
+        print(f"❌ No heads at {path}; run `python -m app.cli.early_exit calibrate` first", file=sys.stderr)
+        return 1
+
+    texts = _load_comments(args.limit)
+    if not texts:
+        print("❌ prediction_history is empty", file=sys.stderr)
+        return 1
+
+    print(f"📊 {path} (calibrated {heads.metadata.get('calibrated_at', '?')})")
+    print("  thresholds: " + ", ".join(f"L{layer}={value:.2f}" for layer, value in heads.describe()["thresholds"].items()))
+    print_measurement(measure(ml_service, version.model, heads, encode(ml_service, texts)))
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Calibrate / evaluate early-exit heads")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    calibrate_parser = commands.add_parser("calibrate", help="Distil exit heads from the final layer")
+    calibrate_parser.add_argument("--limit", type=int, default=5000, help="Newest N history rows (0 = all)")
+    calibrate_parser.add_argument("--layers", help="Comma-separated exit layers (default: ~6 evenly spaced)")
+    calibrate_parser.add_argument("--holdout", type=float, default=0.2, help="Share of rows used to pick thresholds")
+    calibrate_parser.add_argument("--target-agreement", type=float, default=0.98,
+                                  help="Required agreement of each head's exits with the full model")
+    calibrate_parser.add_argument("--epochs", type=int, default=200)
+    calibrate_parser.add_argument("--seed", type=int, default=13)
+    calibrate_parser.set_defaults(func=calibrate)
+
+    report_parser = commands.add_parser("report", help="Layers executed, latency saved, agreement")
+    report_parser.add_argument("--limit", type=int, default=1000, help="Newest N history rows (0 = all)")
+    report_parser.set_defaults(func=report)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""
+Database Initialisation CLI
+Create all tables once (e.g. in a release step) instead of on every worker boot
+
+Usage:
+    python -m app.cli.init_db
+"""
+from app.database import engine, Base
+import app.models  # noqa: F401  (registers every table on Base.metadata)
+
+
+def create_tables():
+    """Create missing tables and indexes (existing tables are left untouched)"""
+    print("🔄 Creating database tables...")
+    Base.metadata.create_all(bind=engine)
+    # create_all skips existing tables entirely, including indexes added later
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    print("✅ Database tables created successfully!")
+
+
+if __name__ == "__main__":
+    create_tables()
@@ -0,0 +1,110 @@
+"""
+Static Assets CLI
+Precompress CSS / JS / SVG under app/static as .gz and .br variants
+
+CachedStaticFiles sends a variant instead of the file when the client
+accepts its encoding and the variant is at least as new as the file, so
+assets are compressed once at build time (maximum level) instead of on
+every response. Brotli variants need the optional `brotli` package.
+Uploads (word clouds) are skipped: PNGs are already compressed.
+
+Usage (from the project root):
+    python -m app.cli.static compress
+    python -m app.cli.static clean
+"""
+import argparse
+import gzip
+import os
+import sys
+from pathlib import Path
+from typing import Iterator
+
+COMPRESSIBLE_SUFFIXES = {".css", ".js", ".svg", ".json", ".txt", ".html", ".map"}
+SKIP_DIRS = {"uploads"}
+
+# A variant that saves less than this is not worth a second file
+MIN_SAVING = 0.1
+
+
+def _static_dir() -> Path:
+    from app.static_files import STATIC_DIR
+    return STATIC_DIR
+
+
+def _assets(root: Path) -> Iterator[Path]:
+    for directory, subdirs, files in os.walk(root):
+        subdirs[:] = [name for name in subdirs if name not in SKIP_DIRS]
+        for name in sorted(files):
+            path = Path(directory) / name
+            if path.suffix in COMPRESSIBLE_SUFFIXES:
+                yield path
+
+
+def _write_variant(source: Path, suffix: str, data: bytes, original_size: int) -> str:
+    variant = source.with_name(source.name + suffix)
+    if len(data) > original_size * (1 - MIN_SAVING):
+        if variant.exists():
+            variant.unlink()
+        return "-"
+    variant.write_bytes(data)
+    # Same mtime as the source: the server treats older variants as stale
+    stat_result = source.stat()
+    os.utime(variant, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns))
+    return f"{len(data):,}"
+
+
+def compress(args) -> int:
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+        print("ℹ️ `brotli` is not installed; writing gzip variants only", file=sys.stderr)
+
+    root = _static_dir()
+    count = 0
+    print(f"  {'file':<40} {'bytes':>10} {'gzip':>10} {'brotli':>10}")
+    for path in _assets(root):
+        data = path.read_bytes()
+        if len(data) < args.min_size:
+            continue
+        gz = _write_variant(path, ".gz", gzip.compress(data, compresslevel=9, mtime=0), len(data))
+        br = _write_variant(path, ".br", brotli.compress(data, quality=11), len(data)) if brotli else "n/a"
+        print(f"  {str(path.relative_to(root)):<40} {len(data):>10,} {gz:>10} {br:>10}")
+        count += 1
+    print(f"\n✅ Precompressed {count} file(s) under {root}")
+    return 0
+
+
+def clean(args) -> int:
+    root = _static_dir()
+    removed = 0
+    for directory, subdirs, files in os.walk(root):
+        subdirs[:] = [name for name in subdirs if name not in SKIP_DIRS]
+        for name in files:
+            if name.endswith((".gz", ".br")):
+                os.remove(os.path.join(directory, name))
+                removed += 1
+    print(f"🧹 Removed {removed} precompressed file(s)")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Precompress static assets")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compress_parser = commands.add_parser("compress", help="Write .gz / .br next to each text asset")
+    compress_parser.add_argument("--min-size", type=int, default=256, help="Skip files smaller than this (bytes)")
+    compress_parser.set_defaults(func=compress)
+
+    clean_parser = commands.add_parser("clean", help="Delete all precompressed variants")
+    clean_parser.set_defaults(func=clean)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
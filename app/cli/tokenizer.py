@@ -0,0 +1,236 @@
+"""
+Tokenizer CLI
+Convert PhoBERT's tokenizer to the fast `tokenizers` backend and prove parity
+
+`convert` rebuilds the bundled vocab.txt/bpe.codes as a Rust BPE tokenizer,
+encodes a parity corpus with both tokenizers and only writes
+`tokenizer.fast.json` when every input id matches. `verify` re-checks a
+converted file (e.g. on a larger corpus) and reports the speed-up.
+
+The parity corpus is the bundled sample comments, recent prediction_history
+comments and an optional CSV, each raw, word-segmented (as the service feeds
+the model) and NFD-decomposed, plus seeded random texts built from the
+vocabulary, unusual whitespace, special tokens and arbitrary characters.
+
+Usage (from the project root):
+    python -m app.cli.tokenizer convert
+    python -m app.cli.tokenizer verify --input reviews.csv --fuzz 100000
+"""
+import argparse
+import csv
+import random
+import sys
+import time
+import unicodedata
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+# Texts per encode_batch call when timing (a typical request batch)
+TIMING_BATCH = 64
+
+
+def _tokenizer_dir() -> str:
+    from app.services.ml_service import ml_service
+    return ml_service.TOKENIZER_DIR
+
+
+def _load_slow(tokenizer_dir: str):
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(tokenizer_dir, use_fast=False)
+
+
+def _read_csv(path: Path, column: str, limit: int = 0) -> List[str]:
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        if column not in (reader.fieldnames or []):
+            raise SystemExit(f"❌ {path} must contain '{column}' column")
+        comments = [row[column] for row in reader if (row[column] or "").strip()]
+    return comments[:limit] if limit else comments
+
+
+def _history_comments(limit: int) -> List[str]:
+    if limit < 0:
+        return []
+    from app.database import SessionLocal
+    from app.services.history_service import recent_distinct_comments
+
+    db = SessionLocal()
+    try:
+        return [comment for comment, _ in recent_distinct_comments(db, limit)]
+    except Exception as e:
+        print(f"⚠️ prediction_history unavailable ({type(e).__name__}); continuing without it", file=sys.stderr)
+        return []
+    finally:
+        db.close()
+
+
+def fuzz_texts(slow_tokenizer, count: int, seed: int) -> List[str]:
+    """Random texts mixing vocabulary pieces, whitespace, special tokens and odd characters"""
+    rng = random.Random(seed)
+    pieces = list(slow_tokenizer.encoder)
+    spaces = [chr(code) for code in range(0x3100) if chr(code).isspace()] + ["　", " "]
+    specials = list(slow_tokenizer.added_tokens_encoder)
+    symbols = list("<>/@\\_-.,!?:;()[]\"'%&*+=#~`^|") + ["😀", "👍", "🔥", "❤️", "́", "̣"]
+    texts = []
+    for _ in range(count):
+        parts = []
+        for _ in range(rng.randint(1, 40)):
+            draw = rng.random()
+            if draw < 0.6:
+                piece = rng.choice(pieces)
+                parts.append(piece[:-2] if piece.endswith("@@") and rng.random() < 0.5 else piece)
+            elif draw < 0.7:
+                parts.append(rng.choice(spaces))
+            elif draw < 0.75:
+                parts.append(rng.choice(specials))
+            elif draw < 0.9:
+                parts.append(rng.choice(symbols))
+            else:
+                parts.append(chr(rng.randint(0x20, 0x2FFF)))
+            parts.append(rng.choice([" ", " ", " ", "", "  ", "\n", "_"]))
+        texts.append("".join(parts))
+    return texts
+
+
+def build_corpus(slow_tokenizer, args) -> List[str]:
+    from app.services.ml_service import ml_service
+
+    comments = _read_csv(PROJECT_ROOT / "sample_comments.csv", "Comment")
+    if args.input:
+        comments += _read_csv(Path(args.input), args.column, args.limit)
+    comments += _history_comments(args.history)
+
+    print(f"🔤 Word-segmenting {len(comments):,} comments...")
+    segmented = [ml_service.preprocess(comment) for comment in comments]
+    corpus = comments + segmented + [unicodedata.normalize("NFD", text) for text in segmented]
+    corpus += fuzz_texts(slow_tokenizer, args.fuzz, args.seed)
+    return list(dict.fromkeys(corpus))
+
+
+def check_parity(slow_tokenizer, fast_tokenizer, texts: List[str]) -> Dict[str, Any]:
+    """Encode `texts` with both tokenizers; mismatching texts and timings"""
+    started = time.perf_counter()
+    expected = [slow_tokenizer(text, add_special_tokens=False, verbose=False)["input_ids"] for text in texts]
+    slow_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    actual = []
+    for start in range(0, len(texts), TIMING_BATCH):
+        actual.extend(fast_tokenizer.encode_batch(texts[start:start + TIMING_BATCH]))
+    fast_seconds = time.perf_counter() - started
+
+    mismatches = [index for index, (a, b) in enumerate(zip(expected, actual)) if a != b]
+    return {
+        "texts": len(texts),
+        "tokens": sum(len(ids) for ids in expected),
+        "mismatches": len(mismatches),
+        "examples": [
+            {"text": texts[index][:200], "slow": expected[index][:40], "fast": actual[index][:40]}
+            for index in mismatches[:5]
+        ],
+        "slow_ms_per_text": round(slow_seconds * 1000 / max(1, len(texts)), 4),
+        "fast_ms_per_text": round(fast_seconds * 1000 / max(1, len(texts)), 4),
+        "speedup": round(slow_seconds / fast_seconds, 2) if fast_seconds else None
+    }
+
+
+def print_parity(result: Dict[str, Any]):
+    print(f"\n  texts               {result['texts']:,} ({result['tokens']:,} tokens)")
+    print(f"  mismatching ids     {result['mismatches']:,}")
+    print(f"  slow tokenizer      {result['slow_ms_per_text']:.4f} ms/text")
+    print(f"  fast tokenizer      {result['fast_ms_per_text']:.4f} ms/text (batches of {TIMING_BATCH})")
+    if result['speedup'] is not None:
+        print(f"  speed-up            {result['speedup']:.1f}x")
+    for example in result['examples']:
+        print(f"\n  ✗ {example['text']!r}\n    slow {example['slow']}\n    fast {example['fast']}")
+
+
+def convert(args) -> int:
+    import tokenizers
+    from app.services.fast_tokenizer import convert as convert_tokenizer, fast_tokenizer_path
+
+    tokenizer_dir = _tokenizer_dir()
+    slow = _load_slow(tokenizer_dir)
+    started = time.perf_counter()
+    fast = convert_tokenizer(slow, tokenizer_dir)
+    print(f"🔧 Converted {len(slow):,} tokens in {time.perf_counter() - started:.2f}s")
+
+    result = check_parity(slow, fast, build_corpus(slow, args))
+    print_parity(result)
+    if result["mismatches"] and not args.force:
+        print("\n❌ Not saved: the fast tokenizer disagrees with the slow one (use --force to save anyway)",
+              file=sys.stderr)
+        return 1
+
+    fast.metadata.update({
+        "converted_at": datetime.now().isoformat(timespec="seconds"),
+        "tokenizers_version": tokenizers.__version__,
+        "parity": {key: result[key] for key in ("texts", "tokens", "mismatches")}
+    })
+    output = args.output or fast_tokenizer_path(tokenizer_dir)
+    fast.save(output)
+    print(f"\n💾 Saved {output}; the service uses it from the next model load")
+    return 0
+
+
+def verify(args) -> int:
+    from app.services.fast_tokenizer import FastPhobertTokenizer, fast_tokenizer_path, fingerprint
+
+    tokenizer_dir = _tokenizer_dir()
+    path = args.tokenizer or fast_tokenizer_path(tokenizer_dir)
+    try:
+        fast = FastPhobertTokenizer.load(path)
+    except FileNotFoundError:
+        print(f"❌ No fast tokenizer at {path}; run `python -m app.cli.tokenizer convert` first", file=sys.stderr)
+        return 1
+    if fast.metadata.get("fingerprint") != fingerprint(tokenizer_dir):
+        print("⚠️ Converted from different vocab/merges files; the service will not load it", file=sys.stderr)
+
+    slow = _load_slow(tokenizer_dir)
+    print(f"📊 {path} (converted {fast.metadata.get('converted_at', '?')})")
+    result = check_parity(slow, fast, build_corpus(slow, args))
+    print_parity(result)
+    if result["mismatches"]:
+        print("\n❌ Parity check failed", file=sys.stderr)
+        return 1
+    print("\n✅ Identical input ids")
+    return 0
+
+
+def _add_corpus_arguments(parser: argparse.ArgumentParser, fuzz: int):
+    parser.add_argument("--input", help="Extra CSV of reviews for the parity corpus")
+    parser.add_argument("--column", default="Comment", help="Comment column name")
+    parser.add_argument("--limit", type=int, default=0, help="First N rows of --input (0 = all)")
+    parser.add_argument("--history", type=int, default=5000,
+                        help="Newest N prediction_history comments (0 = all, -1 = none)")
+    parser.add_argument("--fuzz", type=int, default=fuzz, help="Random texts added to the corpus")
+    parser.add_argument("--seed", type=int, default=13)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Convert / verify the fast PhoBERT tokenizer")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = commands.add_parser("convert", help="Build tokenizer.fast.json after a parity check")
+    _add_corpus_arguments(convert_parser, fuzz=20000)
+    convert_parser.add_argument("--output", help="Output path (default: next to the bundled tokenizer)")
+    convert_parser.add_argument("--force", action="store_true", help="Save even if parity fails")
+    convert_parser.set_defaults(func=convert)
+
+    verify_parser = commands.add_parser("verify", help="Parity and speed of a converted tokenizer")
+    _add_corpus_arguments(verify_parser, fuzz=50000)
+    verify_parser.add_argument("--tokenizer", help="Converted file (default: next to the bundled tokenizer)")
+    verify_parser.set_defaults(func=verify)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 Configuration Settings
 Supports environment variables for production deployment
 """
+import json
 import os
 from pathlib import Path
 
@@ -21,6 +22,30 @@ SECRET_KEY = os.getenv(
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 
+# Principal cache: skips JWT decode + user query for recently seen tokens
+# Set AUTH_CACHE_TTL_SECONDS=0 to disable
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "4096"))
+
+# API keys for machine clients. Verified keys are cached per process;
+# a revocation reaches other workers within API_KEY_CACHE_TTL_SECONDS.
+API_KEY_CACHE_TTL_SECONDS = float(os.getenv("API_KEY_CACHE_TTL_SECONDS", "300"))
+API_KEY_CACHE_MAX_ENTRIES = int(os.getenv("API_KEY_CACHE_MAX_ENTRIES", "1024"))
+
+# Password hashing (argon2). Unset cost parameters keep passlib defaults;
+# changing them rehashes each user's password on their next login.
+def _optional_int(name):
+    value = os.getenv(name)
+    return int(value) if value else None
+
+ARGON2_TIME_COST = _optional_int("ARGON2_TIME_COST")
+ARGON2_MEMORY_COST = _optional_int("ARGON2_MEMORY_COST")  # KiB
+ARGON2_PARALLELISM = _optional_int("ARGON2_PARALLELISM")
+
+# Each argon2 call holds ~memory_cost KiB; keep the pool small on 512 MB hosts
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+
 # ============================================
 # UPLOAD DIRECTORIES
 # ============================================
@@ -33,6 +58,243 @@ WORDCLOUD_DIR = UPLOAD_DIR / "wordclouds"
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 WORDCLOUD_DIR.mkdir(parents=True, exist_ok=True)
 
+# ============================================
+# RUNTIME PROFILE
+# ============================================
+# Written by `python -m app.cli.autotune` for this machine; supplies the
+# defaults for the thread counts and batch size below. Environment
+# variables still take precedence.
+RUNTIME_PROFILE_PATH = Path(os.getenv("RUNTIME_PROFILE_PATH", str(BASE_DIR / "runtime_profile.json")))
+
+
+def _load_runtime_profile(path: Path) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f).get("settings", {})
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError, AttributeError) as e:
+        print(f"⚠️ Ignoring unreadable runtime profile {path}: {e}")
+        return {}
+
+
+RUNTIME_PROFILE = _load_runtime_profile(RUNTIME_PROFILE_PATH)
+
+# ============================================
+# INFERENCE
+# ============================================
+# Use a tiny, randomly initialised Roberta instead of PhoBERT (benchmarks,
+# load tests, offline dev). Predictions are meaningless; cost is tiny.
+ML_STANDIN_MODEL = os.getenv("ML_STANDIN_MODEL", "").lower() in ("1", "true", "yes")
+
+# Weight file served by default (stem of a .pth in app/services/Model);
+# other files there can be hot-swapped in via /admin/models
+MODEL_VERSION = os.getenv("MODEL_VERSION", "best_phoBER")
+
+# Comments per padded forward pass in MLPredictionService.predict_batch
+INFERENCE_BATCH_SIZE = int(os.getenv("INFERENCE_BATCH_SIZE", RUNTIME_PROFILE.get("batch_size", 16)))
+
+# Padded token positions per forward pass (0 = INFERENCE_BATCH_SIZE full-length
+# rows). Batches are formed by this budget, so short reviews pack densely and
+# one long review no longer pads a whole batch.
+INFERENCE_TOKEN_BUDGET = int(os.getenv("INFERENCE_TOKEN_BUDGET", RUNTIME_PROFILE.get("token_budget", 0)))
+
+# Model window (PhoBERT supports 256 tokens incl. <s> and </s>). Longer
+# reviews are split into windows overlapping by WINDOW_OVERLAP tokens and
+# their logits averaged; past MAX_WINDOWS_PER_TEXT windows are spread evenly
+MAX_SEQUENCE_LENGTH = int(os.getenv("MAX_SEQUENCE_LENGTH", "256"))
+WINDOW_OVERLAP = int(os.getenv("WINDOW_OVERLAP", "64"))
+MAX_WINDOWS_PER_TEXT = int(os.getenv("MAX_WINDOWS_PER_TEXT", "8"))
+
+# Torch intra-op / inter-op threads per process (0 = torch default, or the
+# cores split evenly across WEB_CONCURRENCY workers)
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", RUNTIME_PROFILE.get("torch_num_threads", 0)))
+TORCH_INTEROP_THREADS = int(os.getenv("TORCH_INTEROP_THREADS", RUNTIME_PROFILE.get("torch_interop_threads", 0)))
+
+# Use the converted Rust tokenizer (`python -m app.cli.tokenizer convert`)
+# when present; otherwise the slow pure-Python PhobertTokenizer
+FAST_TOKENIZER_ENABLED = os.getenv("FAST_TOKENIZER_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Threads for batch encoding with the fast tokenizer (0 = all cores, or the
+# cores split evenly across WEB_CONCURRENCY workers)
+TOKENIZER_THREADS = int(os.getenv("TOKENIZER_THREADS", "0"))
+
+# Worker processes uvicorn was started with (uvicorn reads the same variable)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# Max items accepted by the JSON bulk endpoint (/api/predict/bulk)
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "1000"))
+
+# Responses smaller than this are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+
+# Early exit: confident sequences leave PhoBERT at intermediate layers once
+# heads were calibrated (`python -m app.cli.early_exit calibrate`)
+EARLY_EXIT_ENABLED = os.getenv("EARLY_EXIT_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# One threshold for every head (unset = per-head calibrated thresholds)
+EARLY_EXIT_THRESHOLD = float(os.environ["EARLY_EXIT_THRESHOLD"]) if os.getenv("EARLY_EXIT_THRESHOLD") else None
+
+# ============================================
+# CASCADE (lexical fast path before PhoBERT)
+# ============================================
+# Hashed n-gram model trained with `python -m app.cli.cascade train`; the
+# cascade stays inactive until this file exists
+CASCADE_ENABLED = os.getenv("CASCADE_ENABLED", "true").lower() in ("1", "true", "yes")
+CASCADE_MODEL_PATH = Path(os.getenv(
+    "CASCADE_MODEL_PATH", str(BASE_DIR / "app" / "services" / "Model" / "cascade_lexical.npz")
+))
+
+# Minimum lexical confidence to skip PhoBERT (unset = value chosen at training time)
+CASCADE_THRESHOLD = float(os.environ["CASCADE_THRESHOLD"]) if os.getenv("CASCADE_THRESHOLD") else None
+
+# Share of fast-path answers re-scored by PhoBERT to track live agreement
+CASCADE_AUDIT_RATE = float(os.getenv("CASCADE_AUDIT_RATE", "0.02"))
+
+# ============================================
+# ADMISSION CONTROL
+# ============================================
+# Threads running inference (each is one concurrent forward pass).
+# Interactive /single work always gets the next free thread before batch work.
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+
+# Admitted prediction requests that may wait beyond INFERENCE_WORKERS;
+# further requests get 429 + Retry-After
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+
+# Batch/bulk jobs are scheduled in chunks of this many comments, so single
+# predictions can run between chunks of a large upload
+ADMISSION_CHUNK_SIZE = int(os.getenv("ADMISSION_CHUNK_SIZE", "64"))
+
+# Per-user limits (0 disables): requests in flight, and a token bucket in
+# comments (sustained rate + burst capacity)
+USER_MAX_CONCURRENT_REQUESTS = int(os.getenv("USER_MAX_CONCURRENT_REQUESTS", "2"))
+USER_RATE_COMMENTS_PER_SEC = float(os.getenv("USER_RATE_COMMENTS_PER_SEC", "50"))
+USER_RATE_BURST = float(os.getenv("USER_RATE_BURST", "2000"))
+
+# ============================================
+# LIVE PREDICTION (WebSocket)
+# ============================================
+# A text is scored once the user stopped typing for this long; newer text
+# cancels older text that is still waiting or queued
+LIVE_DEBOUNCE_MS = float(os.getenv("LIVE_DEBOUNCE_MS", "250"))
+
+# Texts from all connections collected for this long go through one
+# predict_batch call (at most LIVE_MAX_BATCH texts)
+LIVE_BATCH_WINDOW_MS = float(os.getenv("LIVE_BATCH_WINDOW_MS", "10"))
+LIVE_MAX_BATCH = int(os.getenv("LIVE_MAX_BATCH", "32"))
+
+# Recent (text -> prediction) results, so backspacing costs no inference
+LIVE_CACHE_SIZE = int(os.getenv("LIVE_CACHE_SIZE", "2048"))
+
+LIVE_MAX_TEXT_CHARS = int(os.getenv("LIVE_MAX_TEXT_CHARS", "5000"))
+LIVE_MAX_CONNECTIONS_PER_USER = int(os.getenv("LIVE_MAX_CONNECTIONS_PER_USER", "4"))
+LIVE_AUTH_TIMEOUT_SECONDS = float(os.getenv("LIVE_AUTH_TIMEOUT_SECONDS", "10"))
+
+# ============================================
+# EVENT STREAM (Server-Sent Events)
+# ============================================
+# How events reach streams held by other worker processes:
+#   auto - "file" when WEB_CONCURRENCY > 1, otherwise "off"
+#   file - append to EVENTS_BRIDGE_PATH and tail it (workers on one host)
+#   off  - in-process only
+EVENTS_BRIDGE = os.getenv("EVENTS_BRIDGE", "auto").lower()
+EVENTS_BRIDGE_PATH = os.getenv("EVENTS_BRIDGE_PATH", str(BASE_DIR / "logs" / "events.jsonl"))
+EVENTS_BRIDGE_POLL_MS = float(os.getenv("EVENTS_BRIDGE_POLL_MS", "100"))
+EVENTS_BRIDGE_MAX_BYTES = int(os.getenv("EVENTS_BRIDGE_MAX_BYTES", str(4 * 1024 * 1024)))
+
+# Events buffered per open stream; a client that falls further behind is
+# told to reload its history instead
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))
+
+# Newest rows sent in one "history" event (the dashboard shows 50)
+EVENTS_HISTORY_ROWS = int(os.getenv("EVENTS_HISTORY_ROWS", "50"))
+
+# Comment lines keep idle streams open through proxies; streams end after
+# EVENTS_MAX_STREAM_SECONDS and the client reconnects, so graceful shutdown
+# and rebalancing across workers never wait on an idle stream for long
+EVENTS_KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", "15"))
+EVENTS_MAX_STREAM_SECONDS = float(os.getenv("EVENTS_MAX_STREAM_SECONDS", "300"))
+EVENTS_MAX_STREAMS_PER_USER = int(os.getenv("EVENTS_MAX_STREAMS_PER_USER", "4"))
+
+# ============================================
+# BATCH JOB STORE
+# ============================================
+# Results of /batch and /bulk jobs are kept as columnar files (one
+# directory per job, see job_store); the batch_jobs table only points
+# at them. Set JOB_STORE_ENABLED=false to return results in the response only.
+JOB_STORE_ENABLED = os.getenv("JOB_STORE_ENABLED", "true").lower() in ("1", "true", "yes")
+JOB_STORE_DIR = Path(os.getenv("JOB_STORE_DIR", str(BASE_DIR / "app" / "database" / "jobs")))
+
+# Older jobs beyond this many per user are deleted (0 = keep all)
+JOB_STORE_MAX_JOBS_PER_USER = int(os.getenv("JOB_STORE_MAX_JOBS_PER_USER", "20"))
+
+# Largest page served by GET /api/predict/jobs/{job_id}/results
+JOB_PAGE_MAX_ROWS = int(os.getenv("JOB_PAGE_MAX_ROWS", "1000"))
+
+# ============================================
+# MEMORY GOVERNOR
+# ============================================
+# Unload the model after this many idle seconds (0 = keep it resident).
+# The next request reloads it through the normal lazy-load path.
+MODEL_IDLE_UNLOAD_SECONDS = float(os.getenv("MODEL_IDLE_UNLOAD_SECONDS", "0"))
+
+# Process RSS budget in MB (0 = unlimited). Above MEMORY_SOFT_LIMIT_RATIO of
+# the budget the optional word cloud is skipped; above the
+# budget new batch/bulk jobs wait up to MEMORY_ADMIT_WAIT_SECONDS, then get 503.
+MEMORY_BUDGET_MB = float(os.getenv("MEMORY_BUDGET_MB", "0"))
+MEMORY_SOFT_LIMIT_RATIO = float(os.getenv("MEMORY_SOFT_LIMIT_RATIO", "0.85"))
+MEMORY_ADMIT_WAIT_SECONDS = float(os.getenv("MEMORY_ADMIT_WAIT_SECONDS", "10"))
+MEMORY_CHECK_INTERVAL_SECONDS = float(os.getenv("MEMORY_CHECK_INTERVAL_SECONDS", "15"))
+
+# ============================================
+# PDF REPORTS
+# ============================================
+# Optional Vietnamese-capable TTF pair; tried before the built-in
+# fallback chain in report_service (DejaVu -> Arial -> Helvetica)
+REPORT_FONT_PATH = os.getenv("REPORT_FONT_PATH")
+REPORT_FONT_BOLD_PATH = os.getenv("REPORT_FONT_BOLD_PATH")
+
+# ============================================
+# TRACING & OPERATIONS
+# ============================================
+# Per-request span trees (auth, DB queries, inference, rendering)
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Requests slower than this are written to SLOW_REQUEST_LOG (JSONL) with
+# their span tree and DB query counts. 0 logs every request.
+SLOW_REQUEST_THRESHOLD_MS = float(os.getenv("SLOW_REQUEST_THRESHOLD_MS", "1000"))
+SLOW_REQUEST_LOG = os.getenv("SLOW_REQUEST_LOG", str(BASE_DIR / "logs" / "slow_requests.jsonl"))
+
+# Where finished traces go: "memory" (recent traces at /debug/traces),
+# "file" (every trace appended to TRACE_EXPORT_PATH), "none"
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "memory").lower()
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", str(BASE_DIR / "logs" / "traces.jsonl"))
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "200"))
+
+# On-demand profiler (/debug/profile, admin only). Nothing runs until a
+# session starts; sessions last at most PROFILER_MAX_SECONDS.
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "10"))
+# Frames kept per allocation traceback in memory mode
+PROFILER_TRACEMALLOC_FRAMES = int(os.getenv("PROFILER_TRACEMALLOC_FRAMES", "25"))
+
+# Usernames allowed to call the operational /debug endpoints (comma separated)
+ADMIN_USERNAMES = {
+    name.strip() for name in os.getenv("ADMIN_USERNAMES", "").split(",") if name.strip()
+}
+
+# ============================================
+# STARTUP
+# ============================================
+# Run Base.metadata.create_all when the app starts. Multi-worker deployments
+# can turn this off and run `python -m app.cli.init_db` once per release.
+AUTO_CREATE_TABLES = os.getenv("AUTO_CREATE_TABLES", "true").lower() in ("1", "true", "yes")
+
+# Import word cloud / matplotlib / reportlab in a background thread after
+# startup, so neither boot nor the first batch request pays for them
+PRELOAD_HEAVY_MODULES = os.getenv("PRELOAD_HEAVY_MODULES", "true").lower() in ("1", "true", "yes")
+
 # ============================================
 # PRODUCTION SETTINGS
 # ============================================
@@ -0,0 +1,77 @@
+"""
+HTTP Caching
+Validators (ETag / Last-Modified) and 304 Not Modified responses
+
+Routes compute a cheap validator first and only build the full response
+when the client's cached copy is out of date.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import Response
+
+# Always revalidate (cheap with validators), never reuse blindly
+REVALIDATE = "no-cache"
+PRIVATE_REVALIDATE = "private, no-cache"
+# For URLs that change whenever their content does
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def content_etag(body: bytes) -> str:
+    return f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+
+
+def http_date(moment: datetime) -> str:
+    """IMF-fixdate for Last-Modified (naive datetimes are UTC, as stored)"""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return format_datetime(moment.astimezone(timezone.utc), usegmt=True)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # Weak comparison: W/"x" and "x" are the same representation here
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == wanted for candidate in if_none_match.split(","))
+
+
+def is_not_modified(request_headers: Headers, etag: Optional[str] = None,
+                    last_modified: Optional[datetime] = None) -> bool:
+    """
+    Whether the client's cached copy is current
+
+    If-None-Match wins over If-Modified-Since when both are sent (RFC 9110).
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag is not None and _etag_matches(if_none_match, etag)
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def validator_headers(etag: Optional[str] = None, last_modified: Optional[datetime] = None,
+                      cache_control: str = REVALIDATE) -> Dict[str, str]:
+    headers = {"Cache-Control": cache_control}
+    if etag is not None:
+        headers["ETag"] = etag
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    """304 carrying the same validators and Cache-Control as the full response"""
+    return Response(status_code=304, headers=headers)
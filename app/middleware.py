@@ -0,0 +1,281 @@
+"""
+ASGI Middleware
+Response compression (zstd / brotli / gzip), request metrics and tracing
+"""
+import time
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.metrics_service import REQUEST_SECONDS, REQUESTS_IN_PROGRESS
+from app.services.tracing_service import start_trace, end_trace
+
+try:
+    # Optional: zstd compresses JSON faster and smaller than gzip
+    import zstandard
+except ImportError:  # pragma: no cover - fallback when zstandard is not installed
+    zstandard = None
+
+try:
+    # Optional: brotli is smaller than gzip and the best most browsers accept
+    import brotli
+except ImportError:  # pragma: no cover - fallback when brotli is not installed
+    brotli = None
+
+# Content types worth compressing (images/PDFs are already compressed)
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "text/html",
+    "text/csv",
+    "text/plain",
+    "text/css",
+    "application/javascript",
+    "image/svg+xml",
+)
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """Parse an Accept-Encoding header into the set of encodings with q > 0"""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        if params.strip().startswith("q="):
+            try:
+                if float(params.strip()[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip())
+    return accepted
+
+
+class _GzipStream:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class _ZstdStream:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with the best encoding the client accepts
+
+    Preference: zstd (if the `zstandard` package is installed), brotli (if
+    `brotli` is installed), then gzip.
+    Small bodies, non-text content types and responses that already carry a
+    Content-Encoding are passed through untouched. Streaming responses are
+    compressed chunk by chunk.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, zstd_level: int = 3,
+                 brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": gzip_level, "zstd": zstd_level, "br": brotli_quality}
+
+    def _negotiate(self, accept_encoding: str) -> Optional[str]:
+        accepted = accepted_encodings(accept_encoding)
+        if zstandard is not None and "zstd" in accepted:
+            return "zstd"
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def _stream(self, encoding: str):
+        if encoding == "zstd":
+            return _ZstdStream(self.levels["zstd"])
+        if encoding == "br":
+            return _BrotliStream(self.levels["br"])
+        return _GzipStream(self.levels["gzip"])
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self._negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        stream = None
+        passthrough = False
+
+        async def send_wrapper(message: Message):
+            nonlocal start_message, stream, passthrough
+
+            if message["type"] == "http.response.start":
+                # Hold the headers until we see the first body chunk
+                start_message = message
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                passthrough = (
+                    "content-encoding" in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                )
+                if passthrough:
+                    await send(message)
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if stream is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                stream = self._stream(encoding)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    body = stream.finish(body)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(start_message)
+
+            chunk = stream.compress(body) if more_body else stream.finish(body)
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def is_event_stream(message: Message) -> bool:
+    """Server-Sent Events responses stay open for minutes: not a latency sample"""
+    return Headers(raw=message["headers"]).get("content-type", "").startswith("text/event-stream")
+
+
+def route_label(scope: Scope) -> str:
+    """Route template (e.g. /api/predict/history) to keep label cardinality bounded"""
+    # Newer FastAPI resolves included routers lazily; the effective context
+    # carries the full prefixed template while scope["route"] only has the tail
+    context = (scope.get("fastapi") or {}).get("effective_route_context")
+    path = getattr(context, "path_format", None) or getattr(scope.get("route"), "path", None)
+    if path:
+        return path
+    if scope.get("path", "").startswith("/static/"):
+        return "/static"
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Record http_request_duration_seconds by method, route template and status
+
+    Event streams are counted in http_requests_in_progress but not timed.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        streaming = False
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code, streaming
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                streaming = is_event_stream(message)
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc(method=method)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_PROGRESS.dec(method=method)
+            if not streaming:
+                REQUEST_SECONDS.observe(
+                    time.perf_counter() - start,
+                    method=method,
+                    route=route_label(scope),
+                    status=str(status_code)
+                )
+
+
+class TracingMiddleware:
+    """
+    Open a per-request trace and return its id in X-Trace-Id
+
+    Traces of event streams are not exported (they would all be "slow").
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope.get("path", "").startswith("/static/"):
+            await self.app(scope, receive, send)
+            return
+
+        handle = start_trace(scope["method"], scope.get("path", ""))
+        if handle is None:
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = handle[0].trace_id
+        status_code = 500
+        streaming = False
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code, streaming
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                streaming = is_event_stream(message)
+                MutableHeaders(scope=message)["X-Trace-Id"] = trace_id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end_trace(handle, status_code, route_label(scope), export=not streaming)
@@ -1,7 +1,7 @@
 """
 SQLAlchemy Database Models
 """
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Float, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -18,6 +18,8 @@ class User(Base):
     
     # Relationship
     predictions = relationship("PredictionHistory", back_populates="user")
+    api_keys = relationship("ApiKey", back_populates="user")
+    batch_jobs = relationship("BatchJob", back_populates="user")
     
     def __repr__(self):
         return f"<User {self.username}>"
@@ -39,5 +41,53 @@ class PredictionHistory(Base):
     # Relationship
     user = relationship("User", back_populates="predictions")
     
+    # A user's newest rows (history page, ETag) without scanning everyone's
+    __table_args__ = (Index("ix_prediction_history_user_id_id", "user_id", "id"),)
+    
     def __repr__(self):
         return f"<PredictionHistory {self.id}: {self.predicted_rating}⭐>"
+
+
+class ApiKey(Base):
+    """Long-lived API key for machine clients (only an HMAC of the key is stored)"""
+    __tablename__ = "api_keys"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    name = Column(String(100), nullable=False)
+    prefix = Column(String(16), unique=True, index=True, nullable=False)  # lookup index
+    key_hash = Column(String(64), nullable=False)
+    scopes = Column(String(200), nullable=False, default="predict")  # comma-separated
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True)
+    revoked_at = Column(DateTime, nullable=True)
+    
+    # Relationship
+    user = relationship("User", back_populates="api_keys")
+    
+    def __repr__(self):
+        return f"<ApiKey {self.prefix} ({self.name})>"
+
+
+class BatchJob(Base):
+    """Finished batch/bulk job (the results live in columnar files, see job_store)"""
+    __tablename__ = "batch_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    job_id = Column(String(64), nullable=False)  # client-chosen or generated
+    kind = Column(String(20), nullable=False)  # 'batch' or 'bulk'
+    product_name = Column(String(200), nullable=False, default="")  # "" when it varies per row
+    total = Column(Integer, nullable=False)
+    storage_path = Column(String(255), nullable=False)  # relative to JOB_STORE_DIR
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationship
+    user = relationship("User", back_populates="batch_jobs")
+    
+    # Reusing a job_id replaces that job
+    __table_args__ = (UniqueConstraint("user_id", "job_id", name="uq_batch_jobs_user_job"),)
+    
+    def __repr__(self):
+        return f"<BatchJob {self.job_id}: {self.total} rows>"
@@ -0,0 +1,34 @@
+"""
+Response Classes
+Fast JSON serialization for large API payloads
+"""
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    # Optional: orjson is ~5-10x faster than the stdlib encoder on large lists
+    import orjson
+except ImportError:  # pragma: no cover - fallback when orjson is not installed
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Compact JSON response
+
+    Uses orjson when available, otherwise the stdlib encoder without
+    whitespace. Return it directly from a route so FastAPI skips its own
+    `jsonable_encoder` pass over the payload.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(
+            content,
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
@@ -3,19 +3,23 @@ Authentication Router
 Handles user registration and login
 """
 from datetime import timedelta
+from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models import User
-from app.schemas import UserCreate, UserResponse, Token
+from app.schemas import UserCreate, UserResponse, Token, ApiKeyCreate, ApiKeyResponse, ApiKeyCreated
+from app.services.auth_cache import Principal
 from app.services.auth_service import (
-    get_password_hash,
-    authenticate_user,
+    get_password_hash_async,
+    authenticate_user_async,
     create_access_token,
-    get_current_user
+    get_current_user,
+    get_session_principal
 )
+from app.services.api_key_service import API_KEY_SCOPES, create_api_key, list_api_keys, revoke_api_key
 from app.config import ACCESS_TOKEN_EXPIRE_MINUTES
 
 router = APIRouter()
@@ -50,7 +54,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     new_user = User(
         username=user_data.username,
         email=user_data.email,
-        hashed_password=get_password_hash(user_data.password)
+        hashed_password=await get_password_hash_async(user_data.password)
     )
     
     db.add(new_user)
@@ -73,7 +77,7 @@ async def login(
     
     Returns JWT access token for authentication
     """
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user_async(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -95,3 +99,56 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
     Get current authenticated user information
     """
     return current_user
+
+
+@router.post("/api-keys", response_model=ApiKeyCreated, status_code=status.HTTP_201_CREATED)
+async def create_key(
+    key_data: ApiKeyCreate,
+    principal: Principal = Depends(get_session_principal),
+    db: Session = Depends(get_db)
+):
+    """
+    Create a long-lived API key for machine clients
+    
+    - **name**: Label for the key (e.g. the integration job)
+    - **scopes**: Any of `predict`, `history`
+    - **expires_in_days**: Optional expiry
+    
+    The plaintext key is returned only once. Send it as `X-API-Key: <key>`
+    or `Authorization: Bearer <key>`.
+    """
+    unknown = set(key_data.scopes) - set(API_KEY_SCOPES)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown scopes: {', '.join(sorted(unknown))}"
+        )
+    
+    api_key, plaintext = create_api_key(
+        db, principal.user, key_data.name, key_data.scopes, key_data.expires_in_days
+    )
+    
+    return ApiKeyCreated(**ApiKeyResponse.model_validate(api_key).model_dump(), api_key=plaintext)
+
+
+@router.get("/api-keys", response_model=List[ApiKeyResponse])
+async def get_keys(
+    principal: Principal = Depends(get_session_principal),
+    db: Session = Depends(get_db)
+):
+    """List your API keys (secrets are never returned)"""
+    return list_api_keys(db, principal.user)
+
+
+@router.delete("/api-keys/{key_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_key(
+    key_id: int,
+    principal: Principal = Depends(get_session_principal),
+    db: Session = Depends(get_db)
+):
+    """Revoke an API key"""
+    if not revoke_api_key(db, principal.user, key_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="API key not found"
+        )
@@ -1,18 +1,33 @@
 """
 Dashboard Router
 Serves frontend Jinja2 templates
+
+Pages carry no per-user data (the browser fetches that with its token), so
+each response has an ETag of its content and repeat visits get 304.
 """
 from fastapi import APIRouter, Request, Depends
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
 from sqlalchemy.orm import Session
 
 from app.database import get_db
+from app.http_cache import content_etag, is_not_modified, not_modified, validator_headers
 from app.models import User
 from app.services.auth_service import get_current_user
+from app.static_files import static_url
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
+templates.env.globals["static_url"] = static_url
+
+
+def render_page(request: Request, name: str) -> Response:
+    """Render a template; 304 when the client already has this exact page"""
+    body = templates.get_template(name).render({"request": request}).encode("utf-8")
+    headers = validator_headers(etag=content_etag(body))
+    if is_not_modified(request.headers, etag=headers["ETag"]):
+        return not_modified(headers)
+    return HTMLResponse(body, headers=headers)
 
 
 @router.get("/", response_class=HTMLResponse)
@@ -24,13 +39,13 @@ async def home(request: Request):
 @router.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request):
     """Login page"""
-    return templates.TemplateResponse("login.html", {"request": request})
+    return render_page(request, "login.html")
 
 
 @router.get("/register", response_class=HTMLResponse)
 async def register_page(request: Request):
     """Registration page"""
-    return templates.TemplateResponse("register.html", {"request": request})
+    return render_page(request, "register.html")
 
 
 @router.get("/dashboard", response_class=HTMLResponse)
@@ -39,6 +54,4 @@ async def dashboard_page(request: Request):
     Main dashboard page
     Requires authentication (handle in frontend with token)
     """
-    return templates.TemplateResponse("dashboard.html", {
-        "request": request
-    })
+    return render_page(request, "dashboard.html")
@@ -0,0 +1,150 @@
+"""
+Jobs Router
+Stored batch / bulk results: listing, paging, filtering by rating and export
+"""
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.config import JOB_PAGE_MAX_ROWS
+from app.database import get_db
+from app.models import User, BatchJob
+from app.responses import FastJSONResponse
+from app.services.auth_service import get_current_user, require_scope
+from app.services.job_store import JobStore, JobColumns, get_job_store, EXPORT_FORMATS
+
+router = APIRouter(dependencies=[Depends(require_scope("history"))])
+
+EXPORT_MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "jsonl": "application/x-ndjson"}
+
+
+def _job_info(job: BatchJob) -> dict:
+    return {
+        "job_id": job.job_id,
+        "kind": job.kind,
+        "product_name": job.product_name,
+        "total": job.total,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "results_url": f"/api/jobs/{job.job_id}/results",
+        "export_url": f"/api/jobs/{job.job_id}/export?format=csv",
+    }
+
+
+def _get_job(db: Session, store: JobStore, user: User, job_id: str) -> BatchJob:
+    job = store.get(db, user.id, job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+
+def _open(store: JobStore, job: BatchJob) -> JobColumns:
+    try:
+        return store.open(job)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="The results of this job are no longer available"
+        )
+
+
+@router.get("")
+async def list_jobs(
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    store: JobStore = Depends(get_job_store)
+):
+    """
+    Your stored batch / bulk jobs, newest first
+
+    - **limit**: Maximum number of jobs to return (default: 50)
+    """
+    return [_job_info(job) for job in store.list_jobs(db, current_user.id, limit)]
+
+
+@router.get("/{job_id}")
+async def get_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    store: JobStore = Depends(get_job_store)
+):
+    """
+    One job with its rating distribution, average rating and average confidence
+    """
+    job = _get_job(db, store, current_user, job_id)
+    columns = _open(store, job)
+    summary = await run_in_threadpool(columns.summary)
+    return FastJSONResponse({**_job_info(job), **summary})
+
+
+@router.get("/{job_id}/results")
+async def get_job_results(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=JOB_PAGE_MAX_ROWS),
+    rating: Optional[int] = Query(None, ge=1, le=5),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    store: JobStore = Depends(get_job_store)
+):
+    """
+    One page of a job's results, in upload order
+
+    - **offset** / **limit**: Page window (over the filtered rows when `rating` is set)
+    - **rating**: Only rows predicted with this rating (1-5)
+
+    `total` counts all matching rows; each row carries its `index` in the job.
+    """
+    job = _get_job(db, store, current_user, job_id)
+    columns = _open(store, job)
+    page = await run_in_threadpool(columns.page, offset, limit, rating)
+    return FastJSONResponse({"job_id": job.job_id, **page})
+
+
+@router.get("/{job_id}/export")
+async def export_job(
+    job_id: str,
+    format: str = Query("csv", pattern="^(" + "|".join(EXPORT_FORMATS) + ")$"),
+    rating: Optional[int] = Query(None, ge=1, le=5),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    store: JobStore = Depends(get_job_store)
+):
+    """
+    Download a job's results as CSV or JSON Lines
+
+    - **format**: `csv` (default, same columns as the /batch download) or `jsonl`
+    - **rating**: Only rows predicted with this rating (1-5)
+
+    Streamed chunk by chunk straight from the stored columns.
+    """
+    job = _get_job(db, store, current_user, job_id)
+    columns = _open(store, job)
+    # Give the pooled connection back: large exports stream for a while
+    db.close()
+    suffix = f"_{rating}star" if rating is not None else ""
+    filename = f"job_{job.job_id}{suffix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
+    return StreamingResponse(
+        columns.export(format, rating),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+@router.delete("/{job_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    store: JobStore = Depends(get_job_store)
+):
+    """
+    Delete a job and its stored results
+    """
+    job = _get_job(db, store, current_user, job_id)
+    await run_in_threadpool(store.delete, db, job)
@@ -1,33 +1,72 @@
 """
 Prediction Router
-Handles single and batch predictions
+Handles single, batch and live (WebSocket) predictions, and the event stream
 """
+import asyncio
 import io
 import csv
-from typing import List, Dict
+import json
+from typing import List, Optional, Sequence, Union
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from fastapi.responses import StreamingResponse
+from fastapi import (
+    APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request, WebSocket, WebSocketDisconnect
+)
+from fastapi.responses import Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.config import LIVE_AUTH_TIMEOUT_SECONDS, LIVE_DEBOUNCE_MS, LIVE_MAX_TEXT_CHARS, LIVE_MAX_CONNECTIONS_PER_USER
+from app.database import get_db, SessionLocal
 from app.models import User, PredictionHistory
 from app.schemas import (
     SinglePredictionRequest,
     SinglePredictionResponse,
     BatchPredictionResponse,
+    BulkPredictionRequest,
+    BulkPredictionResponse,
     PredictionHistoryResponse,
     PDFReportRequest
 )
-from app.services.auth_service import get_current_user
+from app.services.auth_cache import Principal
+from app.services.auth_service import get_current_user, require_scope, authenticate_credential
 from app.services.ml_service import get_ml_service, MLPredictionService
 from app.services.visualization_service import get_viz_service, VisualizationService
 from app.services.report_service import get_report_service, ReportService
+from app.services.history_service import save_prediction_history
+from app.services.memory_governor import memory_governor
+from app.services.admission_service import admission, LANE_INTERACTIVE, LANE_BULK
+from app.services.live_service import live_batcher, LiveSession
+from app.services.events_service import event_broker, publish_history, JobProgress
+from app.services.job_store import job_store
+from app.services.prediction_batch import PredictionBatch
+from app.services.metrics_service import stage_timer
+from app.responses import FastJSONResponse
+from app.http_cache import PRIVATE_REVALIDATE, is_not_modified, not_modified, validator_headers
 
 router = APIRouter()
 
 
-@router.post("/single", response_model=SinglePredictionResponse)
+async def _store_job(
+    db: Session,
+    user_id: int,
+    job: JobProgress,
+    product_names: Union[str, Sequence[str]],
+    predictions: PredictionBatch
+) -> Optional[str]:
+    """Keep the job's results in the job store; returns their URL (None if not stored)"""
+    if job_store is None:
+        return None
+    try:
+        stored = await run_in_threadpool(
+            job_store.save, db, user_id, job.kind, job.job_id, product_names, predictions
+        )
+    except OSError as e:
+        print(f"⚠️ Could not store results of job {job.job_id}: {e}")
+        return None
+    return f"/api/jobs/{job.job_id}" if stored is not None else None
+
+
+@router.post("/single", response_model=SinglePredictionResponse, dependencies=[Depends(require_scope("predict"))])
 async def predict_single(
     request: SinglePredictionRequest,
     current_user: User = Depends(get_current_user),
@@ -42,8 +81,9 @@ async def predict_single(
     
     Returns predicted rating (1-5 stars) with confidence score
     """
-    # Make prediction
-    prediction = ml_service.predict_single(request.comment)
+    # Make prediction (interactive lane: runs ahead of queued batch chunks)
+    async with admission.admit(current_user.id, cost=1):
+        prediction = await admission.run(LANE_INTERACTIVE, ml_service.predict_single, request.comment)
     
     # Save to history
     history = PredictionHistory(
@@ -54,8 +94,13 @@ async def predict_single(
         confidence_score=prediction['confidence'],
         prediction_type='single'
     )
-    db.add(history)
-    db.commit()
+    with stage_timer("db.save_history"):
+        db.add(history)
+        db.commit()
+    publish_history(
+        current_user.id, request.product_name,
+        PredictionBatch([request.comment], [prediction['rating']], [prediction['confidence']]), 'single'
+    )
     
     return {
         "predicted_rating": prediction['rating'],
@@ -64,24 +109,119 @@ async def predict_single(
     }
 
 
-@router.post("/batch", response_model=BatchPredictionResponse)
+def _authenticate_live(message: str) -> Principal:
+    """
+    First live message: {"type": "auth", "token": "<JWT or API key>"}
+    
+    May query the database: call it from a worker thread.
+    """
+    data = json.loads(message)
+    if not isinstance(data, dict) or data.get("type") != "auth" or not isinstance(data.get("token"), str):
+        raise ValueError("expected an auth message")
+    db = SessionLocal()
+    try:
+        principal = authenticate_credential(data["token"], db)
+    finally:
+        db.close()
+    if not principal.has_scope("predict"):
+        raise ValueError("API key lacks the 'predict' scope")
+    return principal
+
+
+@router.websocket("/live")
+async def live_predictions(websocket: WebSocket):
+    """
+    Rate as you type over one WebSocket connection
+    
+    - First message: `{"type": "auth", "token": "<JWT or API key>"}`
+    - Then per edit: `{"type": "predict", "id": <n>, "text": "..."}`
+    
+    Only the newest text is scored: it is debounced, superseded text is
+    dropped and the rest is batched with other live clients. Replies are
+    `{"type": "prediction", "id": <n>, "rating", "confidence", "cached"}`.
+    Live predictions are not saved to history (submit via `/single` for that).
+    """
+    await websocket.accept()
+    try:
+        message = await asyncio.wait_for(websocket.receive_text(), LIVE_AUTH_TIMEOUT_SECONDS)
+        # A cache miss queries the database: keep it off the loop serving the other sessions
+        principal = await run_in_threadpool(_authenticate_live, message)
+    except WebSocketDisconnect:
+        return
+    except (asyncio.TimeoutError, ValueError, HTTPException) as e:
+        reason = "Authentication timed out" if isinstance(e, asyncio.TimeoutError) else "Could not validate credentials"
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=reason)
+        return
+    
+    user_id = principal.user.id
+    if not live_batcher.connect(user_id):
+        await websocket.close(
+            code=status.WS_1013_TRY_AGAIN_LATER,
+            reason=f"Too many live connections (max {LIVE_MAX_CONNECTIONS_PER_USER})"
+        )
+        return
+    
+    session = LiveSession(websocket.send_json, live_batcher)
+    try:
+        await websocket.send_json({"type": "ready", "debounce_ms": LIVE_DEBOUNCE_MS})
+        while True:
+            message = await websocket.receive_text()
+            try:
+                data = json.loads(message)
+                kind = data.get("type")
+            except (ValueError, AttributeError):
+                await websocket.send_json({"type": "error", "detail": "Messages must be JSON objects"})
+                continue
+            
+            if kind == "predict":
+                text = data.get("text")
+                if not isinstance(text, str) or len(text) > LIVE_MAX_TEXT_CHARS:
+                    session.cancel()
+                    await websocket.send_json({
+                        "type": "error",
+                        "id": data.get("id"),
+                        "detail": f"text must be a string of at most {LIVE_MAX_TEXT_CHARS} characters"
+                    })
+                    continue
+                session.submit(data.get("id"), text)
+            elif kind == "ping":
+                await websocket.send_json({"type": "pong"})
+            else:
+                await websocket.send_json({"type": "error", "detail": f"Unknown message type: {kind!r}"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session.cancel()
+        live_batcher.disconnect(user_id)
+
+
+@router.post(
+    "/batch",
+    response_model=BatchPredictionResponse,
+    response_class=FastJSONResponse,
+    dependencies=[Depends(require_scope("predict")), Depends(memory_governor.admit_batch)]
+)
 async def predict_batch(
     product_name: str = Form(...),
     file: UploadFile = File(...),
+    job_id: Optional[str] = Form(None, max_length=64, pattern=r"^[\w-]+$"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
     ml_service: MLPredictionService = Depends(get_ml_service),
-    viz_service: VisualizationService = Depends(get_viz_service),
-    report_service: ReportService = Depends(get_report_service)
+    viz_service: VisualizationService = Depends(get_viz_service)
 ):
     """
     Predict ratings for batch of comments from CSV file
     
     - **product_name**: Name of the product
     - **file**: CSV file with 'Comment' column
+    - **job_id**: Optional id echoed in `batch_progress` / `batch_complete` events (`/events`)
     
-    Returns predictions with visualization data (wordcloud, distribution chart)
+    Returns predictions with visualization data (wordcloud, distribution chart).
+    The results are also kept under `results_url` for paging, filtering by
+    rating and export (`/api/jobs`); reusing a `job_id` replaces that job.
     """
+    job = JobProgress(current_user.id, 'batch', job_id)
     # Validate file type
     if not file.filename.endswith('.csv'):
         raise HTTPException(
@@ -90,23 +230,25 @@ async def predict_batch(
         )
     
     try:
-        # Read CSV file
-        contents = await file.read()
-        csv_file = io.StringIO(contents.decode('utf-8'))
-        reader = csv.DictReader(csv_file)
-        
-        # Check for Comment column
-        if 'Comment' not in reader.fieldnames:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="CSV must contain 'Comment' column"
-            )
-        
-        # Extract comments
-        comments = []
-        for row in reader:
-            if row.get('Comment', '').strip():
-                comments.append(row['Comment'].strip())
+        # Read CSV file (the raw bytes are dropped once decoded)
+        with stage_timer("router.csv_parse"):
+            csv_file = io.StringIO((await file.read()).decode('utf-8'))
+            reader = csv.DictReader(csv_file)
+            
+            # Check for Comment column
+            if 'Comment' not in reader.fieldnames:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="CSV must contain 'Comment' column"
+                )
+            
+            # Extract comments (the one copy every later stage shares)
+            comments = []
+            for row in reader:
+                comment = (row.get('Comment') or '').strip()
+                if comment:
+                    comments.append(comment)
+            del csv_file, reader
         
         if not comments:
             raise HTTPException(
@@ -114,67 +256,129 @@ async def predict_batch(
                 detail="No valid comments found in CSV"
             )
         
-        # Make batch predictions
-        predictions = ml_service.predict_batch(comments)
+        # Make batch predictions (bulk lane, scheduled chunk by chunk)
+        async with admission.admit(current_user.id, cost=len(comments)):
+            predictions = await admission.run_chunked(
+                LANE_BULK, ml_service.predict_batch, comments, progress=job.scored,
+                combine=lambda chunks: PredictionBatch.concat(chunks, texts=comments)
+            )
         
         # Save to history
-        for pred in predictions:
-            history = PredictionHistory(
-                user_id=current_user.id,
-                product_name=product_name,
-                comment=pred['text'],
-                predicted_rating=pred['rating'],
-                confidence_score=pred['confidence'],
-                prediction_type='batch'
-            )
-            db.add(history)
-        db.commit()
+        job.stage("saving")
+        with stage_timer("db.save_history"):
+            save_prediction_history(db, current_user.id, product_name, predictions, prediction_type='batch')
+        publish_history(current_user.id, product_name, predictions, 'batch')
+        results_url = await _store_job(db, current_user.id, job, product_name, predictions)
         
         # Calculate rating distribution
-        ratings = [p['rating'] for p in predictions]
-        distribution = viz_service.calculate_rating_distribution(ratings)
-        
-        # Generate word cloud
-        wordcloud_filename = f"wordcloud_{current_user.username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-        wordcloud_url = viz_service.generate_wordcloud(comments, wordcloud_filename)
-        
-        # Prepare results for CSV download
-        results = []
-        for pred in predictions:
-            results.append({
-                'Comment': pred['text'],
-                'Predicted_Rating': pred['rating'],
-                'Confidence': pred['confidence']
-            })
+        distribution = viz_service.calculate_rating_distribution(predictions.ratings)
         
-        # Generate PDF report
-        pdf_filename = f"report_{current_user.username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-        pdf_content = report_service.generate_pdf_report(
-            predictions=predictions,
-            distribution=distribution,
-            wordcloud_path=wordcloud_url,
-            username=current_user.username,
-            filename=pdf_filename
-        )
+        # Generate word cloud (skipped when the server is short on memory)
+        warnings = []
+        wordcloud_url = ""
+        if memory_governor.allow_optional_work("wordcloud"):
+            job.stage("wordcloud")
+            wordcloud_filename = f"wordcloud_{current_user.username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
+            wordcloud_url = await run_in_threadpool(viz_service.generate_wordcloud, comments, wordcloud_filename)
+        else:
+            warnings.append("Word cloud skipped: server is low on memory")
         
-        return {
+        job.complete(total_predictions=len(predictions), rating_distribution=distribution)
+        # Rows for the results table / CSV download, built only for the response
+        texts, ratings, confidences = predictions.columns()
+        return FastJSONResponse({
+            "job_id": job.job_id,
             "total_predictions": len(predictions),
             "rating_distribution": distribution,
             "wordcloud_url": wordcloud_url,
-            "results": results,
-            "csv_download_url": f"/api/predict/download/{current_user.id}/{datetime.now().timestamp()}",
-            "pdf_download_url": f"/api/predict/download-pdf/{current_user.id}/{datetime.now().timestamp()}"
-        }
+            "results": [
+                {'Comment': text, 'Predicted_Rating': rating, 'Confidence': confidence}
+                for text, rating, confidence in zip(texts, ratings, confidences)
+            ],
+            "csv_download_url": (
+                f"{results_url}/export?format=csv" if results_url
+                else f"/api/predict/download/{current_user.id}/{datetime.now().timestamp()}"
+            ),
+            "pdf_download_url": f"/api/predict/download-pdf/{current_user.id}/{datetime.now().timestamp()}",
+            "results_url": results_url,
+            "warnings": warnings
+        })
     
+    except HTTPException as e:
+        # Validation errors (400) and admission rejections (429) pass through
+        job.failed(str(e.detail))
+        raise
     except Exception as e:
+        job.failed(f"Error processing file: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error processing file: {str(e)}"
         )
 
 
-@router.get("/history", response_model=List[PredictionHistoryResponse])
+@router.post(
+    "/bulk",
+    response_model=BulkPredictionResponse,
+    response_class=FastJSONResponse,
+    dependencies=[Depends(require_scope("predict")), Depends(memory_governor.admit_batch)]
+)
+async def predict_bulk(
+    request: BulkPredictionRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    ml_service: MLPredictionService = Depends(get_ml_service)
+):
+    """
+    Predict ratings for many comments sent as JSON (scoring only)
+    
+    - **items**: Array of `{product_name, comment}` objects
+    - **save_history**: Also store the predictions in your history (default: false)
+    - **job_id**: Optional id echoed in `batch_progress` / `batch_complete` events (`/events`)
+    
+    Unlike `/batch`, no word cloud or PDF is produced. Results are returned
+    column-oriented (`ratings[i]`, `confidences[i]` for `items[i]`); send
+    `Accept-Encoding: zstd` or `gzip` for compressed responses. They are
+    also kept under `results_url` for paging and export (`/api/jobs`).
+    """
+    comments = [item.comment for item in request.items]
+    job = JobProgress(current_user.id, 'bulk', request.job_id)
+    try:
+        async with admission.admit(current_user.id, cost=len(comments)):
+            predictions = await admission.run_chunked(
+                LANE_BULK, ml_service.predict_batch, comments, progress=job.scored,
+                combine=lambda chunks: PredictionBatch.concat(chunks, texts=comments)
+            )
+    except HTTPException as e:
+        job.failed(str(e.detail))
+        raise
+    except Exception as e:
+        job.failed(f"Prediction failed: {str(e)}")
+        raise
+    
+    if request.save_history:
+        product_names = [item.product_name for item in request.items]
+        job.stage("saving")
+        with stage_timer("db.save_history"):
+            save_prediction_history(db, current_user.id, product_names, predictions, prediction_type='bulk')
+        publish_history(current_user.id, product_names, predictions, 'bulk')
+    results_url = await _store_job(
+        db, current_user.id, job, [item.product_name for item in request.items], predictions
+    )
+    
+    job.complete(total_predictions=len(predictions))
+    return FastJSONResponse({
+        "job_id": job.job_id,
+        "total_predictions": len(predictions),
+        "ratings": predictions.ratings.tolist(),
+        "confidences": predictions.confidences.astype("float64").round(4).tolist(),
+        "results_url": results_url
+    })
+
+
+@router.get("/history", response_model=List[PredictionHistoryResponse], dependencies=[Depends(require_scope("history"))])
 async def get_prediction_history(
+    request: Request,
+    response: Response,
     limit: int = 50,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -183,15 +387,68 @@ async def get_prediction_history(
     Get prediction history for current user
     
     - **limit**: Maximum number of records to return (default: 50)
+    
+    Rows are only ever appended, so the newest row id identifies the
+    response: send `If-None-Match` (or `If-Modified-Since`) to get
+    `304 Not Modified` without the rows being loaded.
     """
-    history = db.query(PredictionHistory).filter(
-        PredictionHistory.user_id == current_user.id
-    ).order_by(PredictionHistory.created_at.desc()).limit(limit).all()
+    with stage_timer("db.load_history"):
+        latest = db.query(PredictionHistory.id, PredictionHistory.created_at).filter(
+            PredictionHistory.user_id == current_user.id
+        ).order_by(PredictionHistory.id.desc()).first()
+    
+    headers = validator_headers(
+        etag=f'W/"history-{current_user.id}-{latest.id if latest else 0}-{limit}"',
+        last_modified=latest.created_at if latest else None,
+        cache_control=PRIVATE_REVALIDATE
+    )
+    if is_not_modified(request.headers, headers["ETag"], latest.created_at if latest else None):
+        return not_modified(headers)
+    
+    history = []
+    if latest is not None:
+        with stage_timer("db.load_history"):
+            history = db.query(PredictionHistory).filter(
+                PredictionHistory.user_id == current_user.id
+            ).order_by(PredictionHistory.id.desc()).limit(limit).all()
     
+    response.headers.update(headers)
     return history
 
 
-@router.post("/download-csv")
+@router.get("/events", dependencies=[Depends(require_scope("history"))])
+async def prediction_events(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Server-Sent Events stream of your new predictions and batch progress
+    
+    Events (JSON data):
+    - **ready**: stream is open; reload history now to not miss anything
+    - **history**: `{total, rows}` newest rows just saved, newest first
+    - **batch_progress**: `{job_id, kind, stage, done, total, percent}`
+    - **batch_complete** / **batch_failed**: `{job_id, kind, ...}`
+    - **resync**: events were dropped; reload history
+    
+    The stream ends after a few minutes; reconnect when it does.
+    """
+    user_id = current_user.id
+    if not event_broker.can_subscribe(user_id):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many open event streams"
+        )
+    # Give the pooled connection back now: the stream stays open for minutes
+    db.close()
+    return StreamingResponse(
+        event_broker.stream(user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/download-csv", dependencies=[Depends(require_scope("predict"))])
 async def download_predictions_csv(
     results: List[dict],
     current_user: User = Depends(get_current_user)
@@ -221,7 +478,7 @@ async def download_predictions_csv(
     )
 
 
-@router.post("/download-pdf")
+@router.post("/download-pdf", dependencies=[Depends(require_scope("predict"))])
 async def download_predictions_pdf(
     request: PDFReportRequest,
     current_user: User = Depends(get_current_user),
@@ -231,8 +488,9 @@ async def download_predictions_pdf(
     Download prediction results as PDF report
     """
     try:
-        pdf_content = report_service.generate_pdf_report(
-            predictions=request.predictions,
+        pdf_content = await run_in_threadpool(
+            report_service.generate_pdf_report,
+            predictions=PredictionBatch.from_dicts(request.predictions),
             distribution=request.distribution,
             wordcloud_path=request.wordcloud_path,
             username=current_user.username
@@ -0,0 +1,238 @@
+"""
+System Router
+Operational endpoints (metrics, memory, traces, profiler, model registry, cascade, early exit)
+"""
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from app.config import PROFILER_INTERVAL_MS, PROFILER_MAX_SECONDS
+from app.schemas import ModelActivateRequest, ModelCandidateRequest, CascadeThresholdRequest
+from app.services.auth_service import require_admin
+from app.services.ml_service import ml_service
+from app.services.memory_governor import memory_governor
+from app.services.metrics_service import metrics
+from app.services.profiler_service import profiler
+from app.services.tracing_service import tracer
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """
+    Prometheus metrics (text exposition format)
+    
+    Per-stage timings, request latency by route, queue depths, model state,
+    cache hit rates and process RSS.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get("/status/memory")
+async def memory_status():
+    """
+    Memory governor state
+    
+    RSS against the configured budget, pressure level (ok / soft / hard),
+    whether the model is resident or idle-unloaded, and shed work counts.
+    """
+    return memory_governor.status()
+
+
+@router.get("/debug/traces", dependencies=[Depends(require_admin)])
+async def list_traces(limit: int = 50, min_duration_ms: float = 0.0):
+    """
+    Recent request traces, newest first (admin only)
+    
+    - **limit**: Maximum number of traces to return
+    - **min_duration_ms**: Only traces at least this slow
+    
+    Requires `TRACE_EXPORTER=memory` (the default).
+    """
+    if tracer.collector is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="In-memory trace collector is disabled (TRACE_EXPORTER)"
+        )
+    return {
+        "slow_threshold_ms": tracer.slow_threshold_ms,
+        "slow_requests": tracer.slow_requests,
+        "traces": tracer.collector.recent(limit=limit, min_duration_ms=min_duration_ms)
+    }
+
+
+@router.get("/debug/traces/{trace_id}", dependencies=[Depends(require_admin)])
+async def get_trace(trace_id: str):
+    """
+    Full span tree for one trace (id from the X-Trace-Id response header)
+    """
+    trace = tracer.collector.get(trace_id) if tracer.collector is not None else None
+    if trace is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trace not found (it may have been evicted)"
+        )
+    return trace.to_dict()
+
+
+# ===== Profiler (admin) =====
+@router.get("/debug/profile", dependencies=[Depends(require_admin)])
+async def cpu_profile(
+    seconds: float = Query(10.0, gt=0, le=PROFILER_MAX_SECONDS),
+    interval_ms: float = Query(PROFILER_INTERVAL_MS, ge=1, le=1000),
+    format: str = Query("collapsed", pattern="^(collapsed|json)$"),
+    include_idle: bool = False
+):
+    """
+    Sample the Python stacks of every thread in this worker (admin only)
+    
+    - **seconds**: How long to sample
+    - **interval_ms**: Time between samples
+    - **format**: `collapsed` (one `thread;frame;...;frame count` line per
+      stack, for flamegraph.pl / speedscope / inferno) or `json` (samples per
+      thread, top functions by self and total samples)
+    - **include_idle**: Also count threads blocked in a wait / select / queue get
+    
+    The worker keeps serving while it is sampled. One session at a time
+    (409 otherwise); only the worker handling this request is profiled.
+    """
+    try:
+        sampler = await profiler.cpu(seconds, interval_ms, include_idle)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    if format == "json":
+        return {"pid": os.getpid(), "seconds": seconds, "interval_ms": interval_ms, **sampler.summary()}
+    return PlainTextResponse(
+        sampler.collapsed(),
+        headers={"X-Profile-Pid": str(os.getpid()), "X-Profile-Samples": str(sampler.samples)}
+    )
+
+
+@router.get("/debug/profile/memory", dependencies=[Depends(require_admin)])
+async def memory_profile(
+    seconds: float = Query(30.0, gt=0, le=PROFILER_MAX_SECONDS),
+    top: int = Query(30, ge=1, le=200),
+    match: Optional[str] = "app/*"
+):
+    """
+    Python allocations that grew during the session, by traceback (admin only)
+    
+    - **seconds**: How long to trace allocations
+    - **top**: Number of tracebacks to return, largest growth first
+    - **match**: Only allocations with a frame in these files (glob relative to
+      the project root, e.g. `app/services/ml_service.py`; empty = everything)
+    
+    tracemalloc runs only for the session (unless it was already started
+    with PYTHONTRACEMALLOC) and slows allocations meanwhile. Memory held by
+    native libraries (torch tensors) is not traced.
+    """
+    try:
+        return await profiler.memory(seconds, top, match or None)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+# ===== Model Registry (admin) =====
+def _start_model_operation(start):
+    """Run a registry call, mapping its errors to HTTP responses"""
+    try:
+        start()
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return ml_service.registry.status()
+
+
+@router.get("/admin/models", dependencies=[Depends(require_admin)])
+async def model_registry_status():
+    """
+    Model versions: available weight files, active/candidate version,
+    per-version latency, shadow agreement and the last swap operation
+    """
+    return ml_service.registry.status()
+
+
+@router.post("/admin/models/activate", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(require_admin)])
+async def activate_model_version(request: ModelActivateRequest):
+    """
+    Hot-swap the active model version
+    
+    The version is loaded and warmed in the background while the current
+    one keeps serving; traffic then switches atomically and the old version
+    is freed once its in-flight requests finish. Poll `GET /admin/models`.
+    """
+    return _start_model_operation(lambda: ml_service.registry.activate(request.version))
+
+
+@router.post("/admin/models/candidate", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(require_admin)])
+async def set_candidate_model_version(request: ModelCandidateRequest):
+    """
+    Run a second version next to the active one
+    
+    - **mode=shadow**: active version answers; candidate scores the same
+      comments in the background and agreement is tracked
+    - **mode=split**: `percent` of requests are answered by the candidate
+    
+    Promote it with `POST /admin/models/activate` (no reload needed).
+    """
+    return _start_model_operation(
+        lambda: ml_service.registry.set_candidate(request.version, request.mode, request.percent)
+    )
+
+
+@router.delete("/admin/models/candidate", dependencies=[Depends(require_admin)])
+async def clear_candidate_model_version():
+    """Stop shadowing/splitting and free the candidate once it drains"""
+    if not ml_service.registry.clear_candidate():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No candidate version")
+    return ml_service.registry.status()
+
+
+# ===== Cascade (admin) =====
+@router.get("/admin/cascade", dependencies=[Depends(require_admin)])
+async def cascade_status():
+    """
+    Lexical fast path: threshold, share of traffic that skipped PhoBERT,
+    and live agreement with PhoBERT on audited fast-path answers
+    """
+    from app.services.cascade_service import cascade
+    return cascade.status()
+
+
+@router.put("/admin/cascade/threshold", dependencies=[Depends(require_admin)])
+async def set_cascade_threshold(request: CascadeThresholdRequest):
+    """
+    Change the confidence threshold at runtime (this worker only)
+    
+    Higher = fewer comments skip PhoBERT, higher agreement. Above 1 (e.g.
+    1.01) turns the fast path off; `null` restores the threshold chosen at
+    training time (or CASCADE_THRESHOLD).
+    """
+    from app.config import CASCADE_THRESHOLD
+    from app.services.cascade_service import cascade
+    
+    cascade.threshold_override = request.threshold if request.threshold is not None else CASCADE_THRESHOLD
+    return cascade.status()
+
+
+# ===== Early exit (admin) =====
+@router.get("/admin/early-exit", dependencies=[Depends(require_admin)])
+async def early_exit_status():
+    """
+    Early-exit heads of the active version (layers, thresholds, calibration
+    results) and the live exit distribution / average layers executed
+    """
+    active = ml_service.registry.active
+    heads = getattr(active.model, "exit_heads", None) if active is not None else None
+    num_layers = active.model.config.num_hidden_layers if active is not None else None
+    
+    from app.services.early_exit import exit_stats
+    return {
+        "version": active.name if active is not None else None,
+        "heads": heads.describe() if heads is not None else None,
+        **exit_stats(num_layers)
+    }
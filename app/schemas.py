@@ -1,10 +1,12 @@
 """
 Pydantic Schemas for Request/Response Validation
 """
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field, field_validator
+from typing import Optional, List, Literal
 from datetime import datetime
 
+from app.config import BULK_MAX_ITEMS
+
 # ===== Auth Schemas =====
 class UserCreate(BaseModel):
     username: str = Field(..., min_length=3, max_length=50)
@@ -32,6 +34,37 @@ class TokenData(BaseModel):
     username: Optional[str] = None
 
 
+# ===== API Key Schemas =====
+class ApiKeyCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    scopes: List[str] = Field(default_factory=lambda: ["predict"], min_length=1)
+    expires_in_days: Optional[int] = Field(None, ge=1, le=3650)
+
+class ApiKeyResponse(BaseModel):
+    id: int
+    name: str
+    prefix: str
+    scopes: List[str]
+    created_at: datetime
+    last_used_at: Optional[datetime]
+    expires_at: Optional[datetime]
+    revoked_at: Optional[datetime]
+    
+    @field_validator("scopes", mode="before")
+    @classmethod
+    def split_scopes(cls, value):
+        # Stored as a comma-separated string
+        if isinstance(value, str):
+            return [s for s in value.split(",") if s]
+        return value
+    
+    class Config:
+        from_attributes = True
+
+class ApiKeyCreated(ApiKeyResponse):
+    api_key: str  # Plaintext key, shown only once
+
+
 # ===== Prediction Schemas =====
 class SinglePredictionRequest(BaseModel):
     product_name: Optional[str] = ""
@@ -42,13 +75,33 @@ class SinglePredictionResponse(BaseModel):
     confidence_score: float
     comment: str
 
+class BulkPredictionItem(BaseModel):
+    product_name: Optional[str] = ""
+    comment: str = Field(..., min_length=1)
+
+class BulkPredictionRequest(BaseModel):
+    items: List[BulkPredictionItem] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+    save_history: bool = False
+    job_id: Optional[str] = Field(None, max_length=64, pattern=r"^[\w-]+$")
+
+class BulkPredictionResponse(BaseModel):
+    """Column-oriented results: ratings[i] / confidences[i] belong to items[i]"""
+    job_id: str
+    total_predictions: int
+    ratings: List[int]
+    confidences: List[float]
+    results_url: Optional[str] = None  # /api/jobs/{job_id} (None when the job store is off)
+
 class BatchPredictionResponse(BaseModel):
+    job_id: str
     total_predictions: int
     rating_distribution: dict
     wordcloud_url: str
     results: List[dict]
     csv_download_url: str
     pdf_download_url: str
+    results_url: Optional[str] = None
+    warnings: List[str] = []
 
 class PDFReportRequest(BaseModel):
     predictions: List[dict]
@@ -68,3 +121,19 @@ class PredictionHistoryResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+# ===== Model Registry Schemas =====
+class ModelActivateRequest(BaseModel):
+    version: str = Field(..., min_length=1)
+
+class ModelCandidateRequest(BaseModel):
+    version: str = Field(..., min_length=1)
+    mode: Literal["shadow", "split"] = "shadow"
+    percent: float = Field(10.0, ge=0, le=100)
+
+# ===== Cascade Schemas =====
+class CascadeThresholdRequest(BaseModel):
+    # null = back to the threshold stored with the model; above 1 (e.g. 1.01)
+    # switches the fast path off
+    threshold: Optional[float] = Field(None, ge=0)
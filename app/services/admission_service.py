@@ -0,0 +1,260 @@
+"""
+Admission Control
+Per-user fairness and a prioritised, bounded queue in front of inference
+
+Two levels:
+
+1. admit(): per request. Rejects with 429 + Retry-After when the user has
+   too many requests in flight, has exhausted their comment-rate token
+   bucket, or the global queue is full.
+2. run() / run_chunked(): per unit of inference work. Work runs on a small
+   dedicated thread pool (off the event loop); when a slot frees up,
+   interactive work (single predictions) is always picked before bulk work.
+   Batch jobs are split into chunks that re-queue between chunks, so a
+   huge CSV cannot hold the model while /single calls wait.
+
+All bookkeeping happens on the event loop, so no locks are needed.
+"""
+import asyncio
+import contextvars
+import math
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from fastapi import HTTPException, status
+
+from app.config import (
+    INFERENCE_WORKERS,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_CHUNK_SIZE,
+    USER_MAX_CONCURRENT_REQUESTS,
+    USER_RATE_COMMENTS_PER_SEC,
+    USER_RATE_BURST
+)
+from app.services.metrics_service import metrics
+
+LANE_INTERACTIVE = "interactive"
+LANE_BULK = "bulk"
+LANES = (LANE_INTERACTIVE, LANE_BULK)  # priority order
+
+REJECTIONS = metrics.counter(
+    "admission_rejections_total",
+    "Prediction requests rejected with 429",
+    ["reason"]
+)
+
+WAIT_SECONDS = metrics.histogram(
+    "admission_wait_seconds",
+    "Time inference work waited for a worker slot",
+    ["lane"]
+)
+
+
+class AdmissionController:
+    """
+    Args:
+        workers: Inference threads (= concurrent forward passes)
+        max_queue: Admitted requests allowed to wait beyond `workers`
+        chunk_size: Comments per scheduling unit for batch work
+        user_max_concurrent: Requests one user may have in flight (0 = off)
+        user_rate: Sustained comments/second per user (0 = off)
+        user_burst: Token bucket capacity (comments)
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_queue: int,
+        chunk_size: int,
+        user_max_concurrent: int,
+        user_rate: float,
+        user_burst: float
+    ):
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.chunk_size = max(1, chunk_size)
+        self.user_max_concurrent = user_max_concurrent
+        self.user_rate = user_rate
+        self.user_burst = max(1.0, user_burst)
+
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        self._free_slots = self.workers
+        self._waiters: Dict[str, deque] = {lane: deque() for lane in LANES}
+        self._admitted = 0
+        self._user_active: Dict[int, int] = {}
+        self._buckets: Dict[int, List[float]] = {}  # user_id -> [tokens, last refill]
+
+    # ---------- request admission ----------
+    def _reject(self, reason: str, detail: str, retry_after: float):
+        REJECTIONS.inc(reason=reason)
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    def _take_tokens(self, user_id: int, cost: int):
+        """Token bucket in comments; may go into debt so one large job still fits"""
+        if self.user_rate <= 0:
+            return
+        now = time.monotonic()
+        bucket = self._buckets.setdefault(user_id, [self.user_burst, now])
+        bucket[0] = min(self.user_burst, bucket[0] + (now - bucket[1]) * self.user_rate)
+        bucket[1] = now
+        if bucket[0] <= 0:
+            self._reject(
+                "rate_limited",
+                "Prediction rate limit exceeded, please slow down",
+                (1 - bucket[0]) / self.user_rate
+            )
+        bucket[0] -= cost
+
+    @asynccontextmanager
+    async def admit(self, user_id: int, cost: int):
+        """
+        Admit one prediction request of `cost` comments for `user_id`
+
+        Raises:
+            HTTPException 429 (with Retry-After) if the request must be shed
+        """
+        if self._admitted >= self.workers + self.max_queue:
+            self._reject("queue_full", "Prediction queue is full, please retry shortly", 1)
+        if self.user_max_concurrent and self._user_active.get(user_id, 0) >= self.user_max_concurrent:
+            self._reject(
+                "user_concurrency",
+                f"Too many concurrent prediction requests (max {self.user_max_concurrent})",
+                1
+            )
+        self._take_tokens(user_id, cost)
+
+        self._admitted += 1
+        self._user_active[user_id] = self._user_active.get(user_id, 0) + 1
+        try:
+            yield
+        finally:
+            self._admitted -= 1
+            self._user_active[user_id] -= 1
+            if not self._user_active[user_id]:
+                del self._user_active[user_id]
+
+    # ---------- slot scheduling ----------
+    async def _acquire_slot(self, lane: str):
+        # Only skip the queue if nobody of equal or higher priority is waiting
+        ahead = LANES[:LANES.index(lane) + 1]
+        if self._free_slots > 0 and not any(self._waiters[l] for l in ahead):
+            self._free_slots -= 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[lane].append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was granted just as we were cancelled: pass it on
+                self._release_slot()
+            else:
+                self._waiters[lane].remove(waiter)
+            raise
+
+    def _release_slot(self):
+        self._free_slots += 1
+        for lane in LANES:
+            queue = self._waiters[lane]
+            while queue and self._free_slots > 0:
+                waiter = queue.popleft()
+                if waiter.done():
+                    continue
+                self._free_slots -= 1
+                waiter.set_result(None)
+            if self._free_slots == 0:
+                return
+
+    def _work_done(self, future: asyncio.Future):
+        self._release_slot()
+        if not future.cancelled():
+            future.exception()  # retrieved: the caller may have gone away
+
+    async def run(self, lane: str, func: Callable, *args) -> Any:
+        """
+        Run `func(*args)` on an inference thread once a slot is free
+
+        The slot is held until the thread finishes, even if the caller is
+        cancelled (client disconnect): freeing it earlier would queue the
+        next work behind the orphaned call inside the executor, out of lane
+        order.
+        """
+        start = time.perf_counter()
+        await self._acquire_slot(lane)
+        WAIT_SECONDS.observe(time.perf_counter() - start, lane=lane)
+        try:
+            # Copy the context so tracing spans follow the work into the thread
+            context = contextvars.copy_context()
+            future = asyncio.wrap_future(self._executor.submit(context.run, func, *args))
+        except BaseException:
+            self._release_slot()
+            raise
+        future.add_done_callback(self._work_done)
+        return await asyncio.shield(future)
+
+    async def run_chunked(self, lane: str, func: Callable[[List[Any]], Sequence[Any]], items: List[Any],
+                          progress: Optional[Callable[[int, int], None]] = None,
+                          combine: Optional[Callable[[List[Sequence[Any]]], Any]] = None) -> Any:
+        """
+        Run a list-in/sequence-out function chunk by chunk, re-queueing between chunks
+
+        `progress(done, total)` is called on the event loop after each chunk.
+        Chunk results are concatenated into one list, or passed to
+        `combine(chunks)` (e.g. PredictionBatch.concat) when given.
+        """
+        chunks: List[Sequence[Any]] = []
+        done = 0
+        for start in range(0, len(items), self.chunk_size):
+            chunk = await self.run(lane, func, items[start:start + self.chunk_size])
+            chunks.append(chunk)
+            done += len(chunk)
+            if progress is not None:
+                progress(done, len(items))
+        if combine is not None:
+            return combine(chunks)
+        return [result for chunk in chunks for result in chunk]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "busy_workers": self.workers - self._free_slots,
+            "admitted": self._admitted,
+            "max_admitted": self.workers + self.max_queue,
+            "waiting": {lane: len(self._waiters[lane]) for lane in LANES},
+            "active_users": len(self._user_active),
+            "rejected": {
+                reason: REJECTIONS.value(reason=reason)
+                for reason in ("queue_full", "user_concurrency", "rate_limited")
+            }
+        }
+
+
+# Singleton instance
+admission = AdmissionController(
+    workers=INFERENCE_WORKERS,
+    max_queue=ADMISSION_MAX_QUEUE,
+    chunk_size=ADMISSION_CHUNK_SIZE,
+    user_max_concurrent=USER_MAX_CONCURRENT_REQUESTS,
+    user_rate=USER_RATE_COMMENTS_PER_SEC,
+    user_burst=USER_RATE_BURST
+)
+
+metrics.callback(
+    "admission_queue_length",
+    "Inference work waiting for a worker slot",
+    lambda: [({"lane": lane}, len(admission._waiters[lane])) for lane in LANES],
+    labelnames=["lane"]
+)
+
+metrics.callback(
+    "admission_requests_admitted",
+    "Prediction requests admitted and not yet finished (running + queued)",
+    lambda: [({}, admission._admitted)]
+)
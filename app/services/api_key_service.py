@@ -0,0 +1,158 @@
+"""
+API Key Service
+Long-lived, revocable, scoped API keys for machine clients
+
+Keys look like `rpk_<prefix>_<secret>`. The prefix is stored in clear and
+indexed, so verification is one indexed lookup plus an HMAC-SHA256 compare;
+no argon2 is involved (the secret is 256 bits of randomness, so a fast keyed
+hash is sufficient). Verified keys are then served from an in-memory cache.
+"""
+import hashlib
+import hmac
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.config import SECRET_KEY, API_KEY_CACHE_TTL_SECONDS, API_KEY_CACHE_MAX_ENTRIES
+from app.models import ApiKey, User
+from app.services.auth_cache import Principal, PrincipalCache
+
+API_KEY_PREFIX = "rpk_"
+
+# Scopes an API key may carry
+API_KEY_SCOPES = ("predict", "history")
+
+# Singleton instance
+api_key_cache = PrincipalCache(API_KEY_CACHE_MAX_ENTRIES, API_KEY_CACHE_TTL_SECONDS, name="api_key")
+
+
+def is_api_key(credential: str) -> bool:
+    """Whether a credential has the API key format (vs a JWT)"""
+    return credential.startswith(API_KEY_PREFIX)
+
+
+def hash_api_key(key: str) -> str:
+    """Keyed hash stored in the database"""
+    return hmac.new(SECRET_KEY.encode('utf-8'), key.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def _parse_prefix(key: str) -> Optional[str]:
+    parts = key[len(API_KEY_PREFIX):].split("_", 1)
+    if len(parts) != 2 or not parts[0] or not parts[1]:
+        return None
+    return parts[0]
+
+
+def create_api_key(
+    db: Session,
+    user: User,
+    name: str,
+    scopes: List[str],
+    expires_in_days: Optional[int] = None
+) -> Tuple[ApiKey, str]:
+    """
+    Create a new API key
+
+    Returns:
+        tuple: (ApiKey row, plaintext key). The plaintext is never stored.
+    """
+    prefix = secrets.token_hex(6)
+    key = f"{API_KEY_PREFIX}{prefix}_{secrets.token_urlsafe(32)}"
+
+    api_key = ApiKey(
+        user_id=user.id,
+        name=name,
+        prefix=prefix,
+        key_hash=hash_api_key(key),
+        scopes=",".join(sorted(set(scopes))),
+        expires_at=datetime.utcnow() + timedelta(days=expires_in_days) if expires_in_days else None
+    )
+    db.add(api_key)
+    db.commit()
+    db.refresh(api_key)
+
+    return api_key, key
+
+
+def revoke_api_key(db: Session, user: User, key_id: int) -> bool:
+    """Revoke one of the user's keys. Returns False if it does not exist"""
+    api_key = db.query(ApiKey).filter(ApiKey.id == key_id, ApiKey.user_id == user.id).first()
+    if api_key is None:
+        return False
+
+    if api_key.revoked_at is None:
+        api_key.revoked_at = datetime.utcnow()
+        db.commit()
+    return True
+
+
+def list_api_keys(db: Session, user: User) -> List[ApiKey]:
+    return db.query(ApiKey).filter(ApiKey.user_id == user.id).order_by(ApiKey.created_at.desc()).all()
+
+
+def verify_api_key(db: Session, key: str) -> Optional[Principal]:
+    """
+    Resolve an API key to a principal
+
+    Cache hits cost one dict lookup. Misses cost one indexed join
+    (api_keys.prefix -> users) and an HMAC compare.
+    """
+    cached = api_key_cache.get(key)
+    if cached is not None:
+        return cached
+
+    prefix = _parse_prefix(key)
+    if prefix is None:
+        return None
+
+    row = db.query(ApiKey, User).join(User, ApiKey.user_id == User.id).filter(ApiKey.prefix == prefix).first()
+    if row is None:
+        return None
+    api_key, user = row
+
+    if not hmac.compare_digest(api_key.key_hash, hash_api_key(key)):
+        return None
+    if api_key.revoked_at is not None:
+        return None
+    now = datetime.utcnow()
+    if api_key.expires_at is not None and api_key.expires_at <= now:
+        return None
+
+    principal = Principal(
+        user=user,
+        auth_method='api_key',
+        scopes=frozenset(s for s in api_key.scopes.split(",") if s),
+        api_key_id=api_key.id
+    )
+    expires_at = None
+    if api_key.expires_at is not None:
+        expires_at = api_key.expires_at.replace(tzinfo=timezone.utc).timestamp()
+
+    # Detach before committing so the cached row is not expired
+    db.expunge(user)
+
+    # Only refreshed on cache misses, so hot keys don't write on every call
+    api_key.last_used_at = now
+    db.commit()
+
+    api_key_cache.put(key, user.id, principal, expires_at=expires_at)
+
+    return principal
+
+
+# Revocation (or any change other than the last_used_at bookkeeping)
+# evicts the owner's cached keys
+@event.listens_for(ApiKey, "after_update")
+def _invalidate_updated_api_key(mapper, connection, target):
+    state = inspect(target)
+    changed = [attr.key for attr in state.attrs if attr.history.has_changes()]
+    if changed and changed != ['last_used_at']:
+        api_key_cache.invalidate_user(target.user_id)
+
+
+@event.listens_for(ApiKey, "after_delete")
+def _invalidate_deleted_api_key(mapper, connection, target):
+    api_key_cache.invalidate_user(target.user_id)
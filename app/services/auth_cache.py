@@ -0,0 +1,189 @@
+"""
+Auth Cache Service
+Bounded, TTL-based cache of authenticated principals keyed by token
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+
+from app.config import AUTH_CACHE_TTL_SECONDS, AUTH_CACHE_MAX_ENTRIES
+from app.models import User
+from app.services.metrics_service import metrics
+
+# Scope granted to interactive (JWT) sessions: everything
+ALL_SCOPES = "*"
+
+
+@dataclass(frozen=True)
+class Principal:
+    """An authenticated caller: the (detached) user row plus how they authenticated"""
+    user: User
+    auth_method: str  # 'jwt' or 'api_key'
+    scopes: FrozenSet[str] = frozenset({ALL_SCOPES})
+    claims: Dict[str, Any] = field(default_factory=dict)
+    api_key_id: Optional[int] = None
+
+    def has_scope(self, scope: str) -> bool:
+        return ALL_SCOPES in self.scopes or scope in self.scopes
+
+
+# Every PrincipalCache registers itself here so user changes reach all of them
+_caches: List["PrincipalCache"] = []
+
+
+class PrincipalCache:
+    """
+    LRU + TTL cache mapping a credential (JWT or API key) to its principal
+
+    Entries never outlive the credential itself (`expires_at`) and are
+    dropped as soon as the owning user row changes (see the SQLAlchemy
+    listeners below). Raw credentials are not kept: keys are SHA-256 digests.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, name: str = "principal"):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._keys_by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        _caches.append(self)
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    @staticmethod
+    def _key(credential: str) -> str:
+        return hashlib.sha256(credential.encode('utf-8')).hexdigest()
+
+    def get(self, credential: str) -> Optional[Any]:
+        """Return the cached principal for a credential, or None"""
+        if not self.enabled:
+            return None
+
+        key = self._key(credential)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, user_id, value = entry
+            if expires_at <= now:
+                self._remove(key, user_id)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, credential: str, user_id: int, value: Any, expires_at: Optional[float] = None):
+        """
+        Cache a principal
+
+        Args:
+            credential: Raw token / API key
+            user_id: Owning user (used for invalidation)
+            value: Principal to cache
+            expires_at: Optional UNIX timestamp after which the credential is invalid
+        """
+        if not self.enabled:
+            return
+
+        ttl = self.ttl_seconds
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - time.time())
+            if ttl <= 0:
+                return
+
+        key = self._key(credential)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key, self._entries[key][1])
+            self._entries[key] = (time.monotonic() + ttl, user_id, value)
+            self._keys_by_user.setdefault(user_id, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                old_key, (_, old_user_id, _) = next(iter(self._entries.items()))
+                self._remove(old_key, old_user_id)
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: int):
+        """Drop every cached principal belonging to a user"""
+        with self._lock:
+            keys = self._keys_by_user.pop(user_id, set())
+            for key in keys:
+                self._entries.pop(key, None)
+            self.invalidations += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def _remove(self, key: str, user_id: int):
+        """Remove one entry (caller holds the lock)"""
+        self._entries.pop(key, None)
+        keys = self._keys_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit-rate metrics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+# Singleton instance
+principal_cache = PrincipalCache(AUTH_CACHE_MAX_ENTRIES, AUTH_CACHE_TTL_SECONDS)
+
+
+def _cache_samples(field_name: str):
+    return lambda: [({'cache': cache.name}, cache.stats()[field_name]) for cache in _caches]
+
+
+metrics.callback("auth_cache_hits_total", "Principal cache hits", _cache_samples('hits'), ["cache"], "counter")
+metrics.callback("auth_cache_misses_total", "Principal cache misses", _cache_samples('misses'), ["cache"], "counter")
+metrics.callback("auth_cache_hit_ratio", "Principal cache hit ratio", _cache_samples('hit_rate'), ["cache"])
+metrics.callback("auth_cache_entries", "Principal cache size", _cache_samples('size'), ["cache"])
+
+
+# ============================================
+# INVALIDATION
+# ============================================
+# ORM-level updates/deletes of a user (password rehash, profile edits)
+# evict that user's cached principals from every cache. Bulk `query.update()` bypasses
+# these hooks; call principal_cache.invalidate_user() explicitly there.
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user_principals(mapper, connection, target):
+    for cache in _caches:
+        cache.invalidate_user(target.id)
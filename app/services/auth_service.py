@@ -4,22 +4,26 @@ Password hashing and JWT token generation
 """
 from datetime import datetime, timedelta
 from typing import Optional
-from passlib.context import CryptContext
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
+from fastapi.security import OAuth2PasswordBearer, APIKeyHeader
 from sqlalchemy.orm import Session
 
-from app.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, ADMIN_USERNAMES
 from app.database import get_db
 from app.models import User
 from app.schemas import TokenData
+from app.services.auth_cache import Principal, principal_cache
+from app.services.api_key_service import is_api_key, verify_api_key
+from app.services.password_service import pwd_context, password_hasher
+from app.services.metrics_service import stage_timer
+from app.services.tracing_service import annotate
 
-# Password hashing (using argon2 instead of bcrypt for Python 3.13 compatibility)
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+# OAuth2 scheme (bearer JWT). auto_error is off so API keys can be used instead
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
 
-# OAuth2 scheme
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+# API key scheme for machine clients (also accepted as a bearer token)
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -48,26 +52,55 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-def authenticate_user(db: Session, username: str, password: str):
-    """Authenticate user with username and password"""
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the bounded password executor"""
+    return await password_hasher.run(get_password_hash, password)
+
+
+async def authenticate_user_async(db: Session, username: str, password: str):
+    """
+    Authenticate user without blocking the event loop
+
+    Verification runs on the password executor. If the stored hash was made
+    with outdated argon2 parameters, it is replaced with a fresh one.
+    """
     user = db.query(User).filter(User.username == username).first()
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    
+    valid, new_hash = await password_hasher.run(
+        pwd_context.verify_and_update, password, user.hashed_password
+    )
+    if not valid:
         return False
+    
+    if new_hash:
+        user.hashed_password = new_hash
+        db.commit()
+    
     return user
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get current authenticated user from JWT token"""
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def authenticate_jwt(token: str, db: Session) -> Principal:
+    """
+    Resolve a JWT to a principal
+
+    Recently validated tokens are served from the principal cache, so a hot
+    client pays neither the JWT decode nor the user query.
+    """
+    cached = principal_cache.get(token)
+    if cached is not None:
+        return cached
+    
+    credentials_exception = _credentials_exception()
     
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -82,4 +115,75 @@ async def get_current_user(
     if user is None:
         raise credentials_exception
     
-    return user
+    # Detach so the cached row is not expired by this request's commit
+    db.expunge(user)
+    principal = Principal(user=user, auth_method='jwt', claims=payload)
+    principal_cache.put(token, user.id, principal, expires_at=payload.get("exp"))
+    
+    return principal
+
+
+def authenticate_credential(credential: str, db: Session) -> Principal:
+    """Resolve a bearer credential (JWT or API key) to a principal"""
+    if is_api_key(credential):
+        principal = verify_api_key(db, credential)
+        if principal is None:
+            raise _credentials_exception()
+        return principal
+    return authenticate_jwt(credential, db)
+
+
+async def get_current_principal(
+    token: Optional[str] = Depends(oauth2_scheme),
+    api_key: Optional[str] = Depends(api_key_header),
+    db: Session = Depends(get_db)
+) -> Principal:
+    """
+    Get the authenticated caller
+
+    Accepts `Authorization: Bearer <JWT or API key>` or `X-API-Key: <key>`.
+    """
+    credential = api_key or token
+    if not credential:
+        raise _credentials_exception()
+    with stage_timer("auth.lookup"):
+        principal = authenticate_credential(credential, db)
+    annotate(user=principal.user.username, auth_method=principal.auth_method)
+    return principal
+
+
+async def get_current_user(principal: Principal = Depends(get_current_principal)) -> User:
+    """Get current authenticated user (JWT or API key)"""
+    return principal.user
+
+
+def require_scope(scope: str):
+    """Dependency factory: reject API keys that lack `scope` (JWT sessions have all scopes)"""
+    async def dependency(principal: Principal = Depends(get_current_principal)) -> Principal:
+        if not principal.has_scope(scope):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"API key lacks the '{scope}' scope"
+            )
+        return principal
+    return dependency
+
+
+async def get_session_principal(principal: Principal = Depends(get_current_principal)) -> Principal:
+    """Require an interactive (JWT) session, e.g. for managing API keys"""
+    if principal.auth_method != 'jwt':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="This action requires a user session, not an API key"
+        )
+    return principal
+
+
+async def require_admin(principal: Principal = Depends(get_session_principal)) -> Principal:
+    """Require a user session whose username is listed in ADMIN_USERNAMES"""
+    if principal.user.username not in ADMIN_USERNAMES:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required"
+        )
+    return principal
@@ -0,0 +1,322 @@
+"""
+Cascade Service
+Cheap lexical first tier in front of PhoBERT
+
+A hashed word n-gram logistic regression scores the raw comment (no
+underthesea, no transformer). When its top-class probability reaches the
+threshold the comment is answered right away; everything else goes to
+PhoBERT. The lexical model is distilled from PhoBERT's own labels in
+prediction_history (`python -m app.cli.cascade train`).
+
+A small share of fast-path answers is audited against PhoBERT, so the live
+agreement rate stays honest after the model or the traffic changes.
+"""
+import os
+import random
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import (
+    CASCADE_ENABLED,
+    CASCADE_MODEL_PATH,
+    CASCADE_THRESHOLD,
+    CASCADE_AUDIT_RATE
+)
+from app.services.metrics_service import metrics
+
+NUM_CLASSES = 5
+DEFAULT_THRESHOLD = 0.9
+# Thresholds above 1 switch the fast path off (no confidence reaches them)
+DISABLED_THRESHOLD = 1.01
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+CASCADE_DECISIONS = metrics.counter(
+    "ml_cascade_decisions_total",
+    "Comments answered per cascade tier",
+    ["tier"]
+)
+
+CASCADE_AUDITS = metrics.counter(
+    "ml_cascade_audits_total",
+    "Fast-path answers re-scored by PhoBERT",
+    ["result"]
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased NFC words; Vietnamese diacritics are kept"""
+    return _WORD_RE.findall(unicodedata.normalize("NFC", text).lower())
+
+
+def hashed_features(text: str, n_features: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Word unigrams + bigrams hashed into `n_features` buckets
+
+    Returns:
+        (indices, values): L2-normalised term counts; never empty (a
+        start-of-text feature is always present)
+    """
+    words = tokenize(text)
+    grams = ["<s>"] + words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    counts: Dict[int, float] = {}
+    for gram in grams:
+        index = zlib.crc32(gram.encode("utf-8")) % n_features
+        counts[index] = counts.get(index, 0.0) + 1.0
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    return indices, values / np.linalg.norm(values)
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class SparseBatch:
+    """CSR-style feature matrix for a list of texts"""
+
+    def __init__(self, texts: Sequence[str], n_features: int):
+        features = [hashed_features(text, n_features) for text in texts]
+        lengths = np.array([len(indices) for indices, _ in features], dtype=np.int64)
+        self.n_rows = len(texts)
+        self.indptr = np.concatenate([[0], np.cumsum(lengths)])
+        self.indices = np.concatenate([indices for indices, _ in features]) if features else np.zeros(0, np.int64)
+        self.values = np.concatenate([values for _, values in features]) if features else np.zeros(0, np.float32)
+        self.rows = np.repeat(np.arange(self.n_rows), lengths)
+
+    def dot(self, weights: np.ndarray) -> np.ndarray:
+        """X @ W -> (rows, classes)"""
+        if not self.n_rows:
+            return np.zeros((0, weights.shape[1]), dtype=np.float32)
+        return np.add.reduceat(self.values[:, None] * weights[self.indices], self.indptr[:-1], axis=0)
+
+    def transpose_dot(self, deltas: np.ndarray, n_features: int) -> np.ndarray:
+        """X.T @ D -> (features, classes)"""
+        per_nonzero = deltas[self.rows]
+        return np.stack([
+            np.bincount(self.indices, weights=self.values * per_nonzero[:, k], minlength=n_features)
+            for k in range(deltas.shape[1])
+        ], axis=1)
+
+
+class LexicalClassifier:
+    """Multinomial logistic regression over hashed n-grams (ratings 1-5)"""
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, metadata: Optional[Dict[str, Any]] = None):
+        self.weights = weights.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+        self.n_features = weights.shape[0]
+        self.metadata = metadata or {}
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        return _softmax(SparseBatch(texts, self.n_features).dot(self.weights) + self.bias)
+
+    def predict(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(ratings 1-5, confidences) for each text"""
+        probs = self.predict_proba(texts)
+        return probs.argmax(axis=1) + 1, probs.max(axis=1)
+
+    @classmethod
+    def train(
+        cls,
+        texts: Sequence[str],
+        ratings: Sequence[int],
+        n_features: int = 2 ** 18,
+        epochs: int = 200,
+        learning_rate: float = 0.1,
+        l2: float = 1e-5
+    ) -> "LexicalClassifier":
+        """Full-batch Adam on the softmax cross-entropy"""
+        batch = SparseBatch(texts, n_features)
+        targets = np.eye(NUM_CLASSES, dtype=np.float32)[np.asarray(ratings) - 1]
+        weights = np.zeros((n_features, NUM_CLASSES), dtype=np.float32)
+        bias = np.zeros(NUM_CLASSES, dtype=np.float32)
+
+        moments = [np.zeros_like(weights), np.zeros_like(weights), np.zeros_like(bias), np.zeros_like(bias)]
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+        for step in range(1, epochs + 1):
+            deltas = (_softmax(batch.dot(weights) + bias) - targets) / batch.n_rows
+            grads = (batch.transpose_dot(deltas, n_features) + l2 * weights, deltas.sum(axis=0))
+            for param, grad, m, v in ((weights, grads[0], *moments[:2]), (bias, grads[1], *moments[2:])):
+                m *= beta1
+                m += (1 - beta1) * grad
+                v *= beta2
+                v += (1 - beta2) * grad ** 2
+                m_hat = m / (1 - beta1 ** step)
+                v_hat = v / (1 - beta2 ** step)
+                param -= learning_rate * m_hat / (np.sqrt(v_hat) + eps)
+        return cls(weights, bias)
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(tmp_path, weights=self.weights, bias=self.bias,
+                            metadata=np.array(repr(self.metadata)))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalClassifier":
+        import ast
+
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["weights"], data["bias"], ast.literal_eval(str(data["metadata"])))
+
+
+class Cascade:
+    """
+    Routes comments between the lexical tier and PhoBERT
+
+    Args:
+        model_path: .npz written by LexicalClassifier.save
+        enabled: Master switch (CASCADE_ENABLED)
+        threshold: Minimum lexical confidence to answer (None = the value
+            stored with the model, else DEFAULT_THRESHOLD; above 1 = off)
+        audit_rate: Share of fast answers also sent to PhoBERT for agreement
+    """
+
+    def __init__(self, model_path: str, enabled: bool, threshold: Optional[float], audit_rate: float):
+        self.model_path = model_path
+        self.enabled = enabled
+        self.threshold_override = threshold
+        self.audit_rate = audit_rate
+        self._model: Optional[LexicalClassifier] = None
+        self._model_mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        self.audited = 0
+        self.audit_agreements = 0
+
+    @property
+    def model(self) -> Optional[LexicalClassifier]:
+        """Lexical model, (re)loaded when the file appears or changes"""
+        if not self.enabled:
+            return None
+        try:
+            mtime = os.path.getmtime(self.model_path)
+        except OSError:
+            return None
+        if mtime != self._model_mtime:
+            with self._lock:
+                if mtime != self._model_mtime:
+                    try:
+                        self._model = LexicalClassifier.load(self.model_path)
+                        print(f"⚡ Cascade lexical model loaded ({self.model_path})")
+                    except Exception as e:
+                        print(f"⚠️ Cascade lexical model unusable: {e}")
+                        self._model = None
+                    self._model_mtime = mtime
+        return self._model
+
+    @property
+    def threshold(self) -> float:
+        if self.threshold_override is not None:
+            return self.threshold_override
+        model = self.model
+        if model is not None and "threshold" in model.metadata:
+            return float(model.metadata["threshold"])
+        return DEFAULT_THRESHOLD
+
+    def route(self, texts: Sequence[str]) -> Tuple[Dict[int, Tuple[int, float]], List[int], Dict[int, int]]:
+        """
+        Split a batch between the tiers
+
+        Returns:
+            answered: index -> (rating, confidence) for the fast path
+            pending: indices that need PhoBERT (including audited ones)
+            audits: index -> lexical rating, for pending items that were
+                confident but sampled for auditing
+        """
+        model = self.model
+        threshold = self.threshold if model is not None else DISABLED_THRESHOLD
+        if threshold > 1 or not texts:
+            return {}, list(range(len(texts))), {}
+
+        ratings, confidences = model.predict(texts)
+        answered, pending, audits = {}, [], {}
+        for index, (rating, confidence) in enumerate(zip(ratings.tolist(), confidences.tolist())):
+            if confidence < threshold:
+                pending.append(index)
+            elif self.audit_rate and random.random() < self.audit_rate:
+                pending.append(index)
+                audits[index] = rating
+            else:
+                answered[index] = (rating, confidence)
+
+        CASCADE_DECISIONS.inc(len(answered), tier="lexical")
+        CASCADE_DECISIONS.inc(len(pending), tier="phobert")
+        return answered, pending, audits
+
+    def record_audit(self, lexical_ratings: Sequence[int], phobert_ratings: Sequence[int]):
+        agree = sum(1 for a, b in zip(lexical_ratings, phobert_ratings) if a == b)
+        total = min(len(lexical_ratings), len(phobert_ratings))
+        with self._lock:
+            self.audited += total
+            self.audit_agreements += agree
+        CASCADE_AUDITS.inc(agree, result="agree")
+        CASCADE_AUDITS.inc(total - agree, result="disagree")
+
+    def status(self) -> Dict[str, Any]:
+        model = self.model
+        fast = CASCADE_DECISIONS.value(tier="lexical")
+        slow = CASCADE_DECISIONS.value(tier="phobert")
+        return {
+            "enabled": self.enabled,
+            "model_loaded": model is not None,
+            "model_path": self.model_path,
+            "model": model.metadata if model is not None else None,
+            "threshold": self.threshold,
+            "fast_path_active": model is not None and self.threshold <= 1,
+            "audit_rate": self.audit_rate,
+            "answered_lexical": fast,
+            "answered_phobert": slow,
+            "skipped_share": round(fast / (fast + slow), 4) if fast + slow else None,
+            "audit": {
+                "comments": self.audited,
+                "agreements": self.audit_agreements,
+                "agreement_rate": round(self.audit_agreements / self.audited, 4) if self.audited else None
+            }
+        }
+
+
+def evaluate(model: LexicalClassifier, texts: Sequence[str], labels: Sequence[int],
+             thresholds: Sequence[float]) -> List[Dict[str, Any]]:
+    """
+    Coverage/agreement trade-off against reference (PhoBERT) labels
+
+    For each threshold: share of comments the lexical tier would answer
+    (skipped_share), agreement with PhoBERT on those, and end-to-end
+    agreement of the cascade (the rest is answered by PhoBERT itself).
+    """
+    start = time.perf_counter()
+    ratings, confidences = model.predict(texts)
+    lexical_ms = (time.perf_counter() - start) * 1000 / max(1, len(texts))
+    labels = np.asarray(labels)
+    rows = []
+    for threshold in thresholds:
+        covered = confidences >= threshold
+        n_covered = int(covered.sum())
+        agree = int((ratings[covered] == labels[covered]).sum())
+        rows.append({
+            "threshold": threshold,
+            "skipped_share": round(n_covered / len(labels), 4) if len(labels) else 0.0,
+            "fast_path_agreement": round(agree / n_covered, 4) if n_covered else None,
+            "cascade_agreement": round((agree + len(labels) - n_covered) / len(labels), 4) if len(labels) else None,
+            "lexical_ms_per_comment": round(lexical_ms, 4)
+        })
+    return rows
+
+
+# Singleton instance
+cascade = Cascade(
+    model_path=str(CASCADE_MODEL_PATH),
+    enabled=CASCADE_ENABLED,
+    threshold=CASCADE_THRESHOLD,
+    audit_rate=CASCADE_AUDIT_RATE
+)
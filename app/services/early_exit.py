@@ -0,0 +1,256 @@
+"""
+Early Exit
+Intermediate classifier heads that let confident inputs skip PhoBERT's last layers
+
+A linear head on the <s> token is attached after every few encoder layers
+and distilled from the final layer's predictions (`python -m app.cli.early_exit
+calibrate`). At inference the encoder runs layer by layer; after each head,
+rows whose confidence reaches that head's calibrated threshold leave the
+batch and the remaining rows continue on a smaller batch.
+
+Heads are stored next to the weights as `<version>.exits.pt` and are loaded
+with their model version (restart or re-activate the version to pick up a
+new calibration).
+"""
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+import torch.nn.functional as F
+from torch import nn
+
+from app.config import EARLY_EXIT_ENABLED, EARLY_EXIT_THRESHOLD
+from app.services.metrics_service import metrics
+
+EXIT_LAYER_TOTAL = metrics.counter(
+    "ml_exit_layer_total",
+    "Sequences classified per exit layer (final = full model)",
+    ["layer"]
+)
+
+# Thresholds above 1 disable a head (it never fires)
+DISABLED_THRESHOLD = 1.01
+
+
+def heads_path(weight_path: str) -> str:
+    """`<dir>/<version>.exits.pt` for `<dir>/<version>.pth`"""
+    return os.path.splitext(weight_path)[0] + ".exits.pt"
+
+
+def default_exit_layers(num_layers: int) -> List[int]:
+    """Roughly six evenly spaced exits, never after the last layer"""
+    step = max(1, num_layers // 6)
+    return list(range(step, num_layers, step))
+
+
+class ExitHeads(nn.Module):
+    """One linear head per exit layer plus its calibrated confidence threshold"""
+
+    def __init__(self, hidden_size: int, num_labels: int, layers: List[int],
+                 thresholds: Optional[Dict[int, float]] = None, metadata: Optional[Dict[str, Any]] = None):
+        super().__init__()
+        self.layers = sorted(layers)
+        self.heads = nn.ModuleDict({str(layer): nn.Linear(hidden_size, num_labels) for layer in self.layers})
+        self.thresholds = {layer: DISABLED_THRESHOLD for layer in self.layers}
+        self.thresholds.update(thresholds or {})
+        self.metadata = metadata or {}
+
+    def head(self, layer: int) -> Optional[nn.Linear]:
+        return self.heads[str(layer)] if str(layer) in self.heads else None
+
+    def threshold(self, layer: int) -> float:
+        if EARLY_EXIT_THRESHOLD is not None:
+            return EARLY_EXIT_THRESHOLD
+        return self.thresholds[layer]
+
+    def save(self, path: str):
+        torch.save({
+            "hidden_size": next(iter(self.heads.values())).in_features,
+            "num_labels": next(iter(self.heads.values())).out_features,
+            "layers": self.layers,
+            "thresholds": self.thresholds,
+            "metadata": self.metadata,
+            "state_dict": self.state_dict()
+        }, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ExitHeads":
+        data = torch.load(path, map_location="cpu", weights_only=True)
+        heads = cls(data["hidden_size"], data["num_labels"], data["layers"], data["thresholds"], data["metadata"])
+        heads.load_state_dict(data["state_dict"])
+        heads.eval()
+        return heads
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "layers": self.layers,
+            "thresholds": {str(layer): self.threshold(layer) for layer in self.layers},
+            **self.metadata
+        }
+
+
+def load_exit_heads(weight_path: str) -> Optional[ExitHeads]:
+    """Heads calibrated for this weight file, if any (None when disabled)"""
+    path = heads_path(weight_path)
+    if not EARLY_EXIT_ENABLED or not os.path.exists(path):
+        return None
+    try:
+        heads = ExitHeads.load(path)
+        print(f"🚪 Early-exit heads loaded (layers {heads.layers})")
+        return heads
+    except Exception as e:
+        print(f"⚠️ Early-exit heads unusable ({path}): {e}")
+        return None
+
+
+# ============================================
+# LAYER-BY-LAYER FORWARD
+# ============================================
+def _encoder_mask(roberta, attention_mask: torch.Tensor, embeddings: torch.Tensor, input_ids: torch.Tensor):
+    """Attention mask in the form the installed transformers' encoder layers expect"""
+    if hasattr(roberta, "_create_attention_masks"):  # transformers 5.x
+        mask, _ = roberta._create_attention_masks(
+            attention_mask=attention_mask,
+            encoder_attention_mask=None,
+            embedding_output=embeddings,
+            encoder_hidden_states=None,
+            past_key_values=None,
+        )
+        return mask
+    return roberta.get_extended_attention_mask(attention_mask, input_ids.shape)
+
+
+def _run_layer(layer, hidden: torch.Tensor, mask) -> torch.Tensor:
+    output = layer(hidden, mask)
+    return output[0] if isinstance(output, tuple) else output
+
+
+def _keep_rows(mask, keep: torch.Tensor, batch: int):
+    # Masks may be None (no padding) or broadcast over the batch
+    if isinstance(mask, torch.Tensor) and mask.dim() > 0 and mask.shape[0] == batch:
+        return mask[keep]
+    return mask
+
+
+def early_exit_forward(model, heads: ExitHeads, input_ids: torch.Tensor,
+                       attention_mask: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Classify a padded batch, letting confident rows exit at intermediate heads
+
+    Returns:
+        (logits [batch, labels], exit layer per row; num_hidden_layers = full model)
+    """
+    roberta = model.roberta
+    num_layers = len(roberta.encoder.layer)
+    batch = input_ids.shape[0]
+
+    hidden = roberta.embeddings(input_ids=input_ids)
+    mask = _encoder_mask(roberta, attention_mask, hidden, input_ids)
+
+    logits = hidden.new_zeros((batch, model.config.num_labels))
+    exit_layers = torch.full((batch,), num_layers, dtype=torch.long)
+    active = torch.arange(batch, device=input_ids.device)
+
+    for depth, layer in enumerate(roberta.encoder.layer, start=1):
+        hidden = _run_layer(layer, hidden, mask)
+        head = heads.head(depth) if depth < num_layers else None
+        if head is None:
+            continue
+
+        head_logits = head(hidden[:, 0])
+        done = F.softmax(head_logits, dim=1).max(dim=1).values >= heads.threshold(depth)
+        if not done.any():
+            continue
+        logits[active[done]] = head_logits[done].to(logits.dtype)
+        exit_layers[active[done].cpu()] = depth
+        keep = ~done
+        if not keep.any():
+            return logits, exit_layers
+        mask = _keep_rows(mask, keep, hidden.shape[0])
+        hidden, active = hidden[keep], active[keep]
+
+    logits[active] = model.classifier(hidden).to(logits.dtype)
+    return logits, exit_layers
+
+
+def record_exits(exit_layers: torch.Tensor, num_layers: int):
+    for layer, count in zip(*torch.unique(exit_layers, return_counts=True)):
+        label = "final" if int(layer) >= num_layers else str(int(layer))
+        EXIT_LAYER_TOTAL.inc(int(count), layer=label)
+
+
+def exit_stats(num_layers: Optional[int]) -> Dict[str, Any]:
+    """Live exit distribution and average encoder layers executed"""
+    counts = {labels.get("layer"): value for labels, value in EXIT_LAYER_TOTAL.samples()}
+    total = sum(counts.values())
+    executed = sum(
+        (num_layers if layer == "final" else int(layer)) * count
+        for layer, count in counts.items()
+    ) if num_layers else None
+    return {
+        "sequences": total,
+        "exits": counts,
+        "avg_layers_executed": round(executed / total, 3) if total and executed is not None else None,
+        "num_layers": num_layers
+    }
+
+
+# ============================================
+# CALIBRATION
+# ============================================
+@torch.no_grad()
+def collect_features(model, input_ids: torch.Tensor, attention_mask: torch.Tensor,
+                     layers: List[int]) -> Tuple[Dict[int, torch.Tensor], torch.Tensor]:
+    """<s> hidden state after each exit layer, and the full model's logits"""
+    outputs = model(input_ids=input_ids, attention_mask=attention_mask, output_hidden_states=True)
+    # hidden_states[0] is the embedding output, [i] the output of layer i
+    features = {layer: outputs.hidden_states[layer][:, 0].float().cpu() for layer in layers}
+    return features, outputs.logits.float().cpu()
+
+
+def train_heads(features: Dict[int, torch.Tensor], teacher_logits: torch.Tensor, hidden_size: int,
+                epochs: int = 200, learning_rate: float = 1e-2) -> ExitHeads:
+    """Distil each head from the final layer's probabilities (soft cross-entropy)"""
+    layers = sorted(features)
+    heads = ExitHeads(hidden_size, teacher_logits.shape[1], layers)
+    targets = F.softmax(teacher_logits, dim=1)
+    for layer in layers:
+        head = heads.head(layer)
+        optimizer = torch.optim.Adam(head.parameters(), lr=learning_rate, weight_decay=1e-4)
+        x = features[layer]
+        for _ in range(epochs):
+            optimizer.zero_grad()
+            loss = -(targets * F.log_softmax(head(x), dim=1)).sum(dim=1).mean()
+            loss.backward()
+            optimizer.step()
+    heads.eval()
+    return heads
+
+
+@torch.no_grad()
+def calibrate_thresholds(heads: ExitHeads, features: Dict[int, torch.Tensor], teacher_logits: torch.Tensor,
+                         target_agreement: float, min_exits: int = 20) -> Dict[int, Dict[str, Any]]:
+    """
+    Per head: lowest confidence threshold whose exits agree with the final
+    layer at least `target_agreement` of the time (on held-out rows)
+    """
+    reference = teacher_logits.argmax(dim=1)
+    grid = [round(0.5 + 0.01 * i, 2) for i in range(50)]
+    calibration = {}
+    for layer in heads.layers:
+        probs = F.softmax(heads.head(layer)(features[layer]), dim=1)
+        confidence, predicted = probs.max(dim=1)
+        chosen = None
+        for threshold in grid:
+            exits = confidence >= threshold
+            n_exits = int(exits.sum())
+            if n_exits < min_exits:
+                break
+            agreement = float((predicted[exits] == reference[exits]).float().mean())
+            if agreement >= target_agreement:
+                chosen = {"threshold": threshold, "exit_share": round(n_exits / len(reference), 4),
+                          "agreement": round(agreement, 4)}
+                break
+        heads.thresholds[layer] = chosen["threshold"] if chosen else DISABLED_THRESHOLD
+        calibration[layer] = chosen
+    return calibration
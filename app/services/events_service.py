@@ -0,0 +1,388 @@
+"""
+Event Service
+Per-user push events (new history rows, batch progress) for Server-Sent Events
+
+The EventBroker is an in-process pub/sub: every open stream has a bounded
+queue, and an event published for a user goes to all of that user's
+streams. A stream that falls EVENTS_QUEUE_SIZE events behind stops
+receiving and gets a single "resync" event telling the client to reload.
+
+With several worker processes, a user's stream and the request producing
+its events can be served by different workers. FileBridge is a local
+stand-in for a real broker (Redis pub/sub, Postgres LISTEN/NOTIFY): every
+worker appends its events to one JSONL file and tails it for the events of
+the others. It only spans processes on one host, and events written right
+before the file is truncated may be missed; clients reload their history
+whenever they (re)connect, so a lost event is never a permanent gap.
+
+All state lives on the event loop, so no locks are needed.
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+from app.config import (
+    WEB_CONCURRENCY,
+    EVENTS_BRIDGE,
+    EVENTS_BRIDGE_PATH,
+    EVENTS_BRIDGE_POLL_MS,
+    EVENTS_BRIDGE_MAX_BYTES,
+    EVENTS_QUEUE_SIZE,
+    EVENTS_HISTORY_ROWS,
+    EVENTS_KEEPALIVE_SECONDS,
+    EVENTS_MAX_STREAM_SECONDS,
+    EVENTS_MAX_STREAMS_PER_USER
+)
+from app.services.metrics_service import metrics
+from app.services.prediction_batch import PredictionBatch
+
+# Reconnect delay suggested to EventSource-style clients
+RETRY_MS = 3000
+
+EVENTS_PUBLISHED = metrics.counter(
+    "events_published_total",
+    "Events published to user streams by type",
+    ["event"]
+)
+
+EVENTS_DROPPED = metrics.counter(
+    "events_dropped_total",
+    "Events not delivered because a stream fell behind (the client is told to resync)"
+)
+
+Event = Tuple[str, Dict[str, Any]]
+
+
+def encode_sse(event: str, data: Dict[str, Any]) -> str:
+    """One Server-Sent Events message (JSON data has no raw newlines)"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}\n\n"
+
+
+class Subscription:
+    """One open stream: a bounded queue of events for one user"""
+
+    def __init__(self, user_id: int, queue_size: int):
+        self.user_id = user_id
+        self.queue: "asyncio.Queue[Event]" = asyncio.Queue(max(1, queue_size))
+        self.overflowed = False
+
+    def deliver(self, event: Event):
+        if self.overflowed:
+            EVENTS_DROPPED.inc()
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            EVENTS_DROPPED.inc()
+
+    async def next(self, timeout: float) -> Optional[Event]:
+        """Next event, or None after `timeout` seconds without one"""
+        if self.queue.empty() and self.overflowed:
+            self.overflowed = False
+            return "resync", {}
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class FileBridge:
+    """
+    Cross-worker delivery through an append-only JSONL file
+
+    Each record is written with one O_APPEND write, so lines from different
+    processes never interleave. A tailing worker starts at the current end
+    of the file and skips its own records.
+
+    Args:
+        path: Shared file (all workers must use the same path)
+        poll_ms: How often a worker with open streams checks for new lines
+        max_bytes: The file is truncated before a write once it is this large
+    """
+
+    def __init__(self, path: str, poll_ms: float, max_bytes: int):
+        self.path = path
+        self.poll = poll_ms / 1000
+        self.max_bytes = max_bytes
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._offset: Optional[int] = None
+        self._partial = b""
+
+    def write(self, user_id: int, event: str, data: Dict[str, Any]):
+        record = {"origin": self.origin, "user_id": user_id, "event": event, "data": data}
+        line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size > self.max_bytes:
+                os.ftruncate(fd, 0)
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def pause(self):
+        """Forget the read position; the next read starts at the end again"""
+        self._offset = None
+        self._partial = b""
+
+    def read(self) -> List[Dict[str, Any]]:
+        """Records appended by other workers since the last call"""
+        try:
+            size = os.stat(self.path).st_size
+        except FileNotFoundError:
+            size = 0
+        if self._offset is None:
+            self._offset = size
+            return []
+        if size < self._offset:
+            # Truncated by a writer: everything in the file is new
+            self._offset = 0
+            self._partial = b""
+        if size == self._offset:
+            return []
+
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            chunk = f.read(size - self._offset)
+        self._offset += len(chunk)
+
+        lines = (self._partial + chunk).split(b"\n")
+        self._partial = lines.pop()
+        records = []
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("origin") != self.origin:
+                records.append(record)
+        return records
+
+
+class EventBroker:
+    """
+    Publishes events to the open streams of a user
+
+    Args:
+        queue_size: Events buffered per stream
+        max_streams_per_user: Open streams per user (0 = no limit)
+        keepalive_seconds: Idle time before a keep-alive comment is sent
+        max_stream_seconds: Streams end after this long; clients reconnect
+        bridge: Cross-worker delivery (None = this process only)
+    """
+
+    def __init__(self, queue_size: int, max_streams_per_user: int, keepalive_seconds: float,
+                 max_stream_seconds: float, bridge: Optional[FileBridge] = None):
+        self.queue_size = queue_size
+        self.max_streams_per_user = max_streams_per_user
+        self.keepalive = keepalive_seconds
+        self.max_stream_seconds = max_stream_seconds
+        self.bridge = bridge
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._tail: Optional[asyncio.Task] = None
+
+    # ---------- publishing ----------
+    def publish(self, user_id: int, event: str, data: Dict[str, Any]):
+        """Deliver to this process's streams and hand the event to the bridge"""
+        EVENTS_PUBLISHED.inc(event=event)
+        self._deliver(user_id, event, data)
+        if self.bridge is not None:
+            try:
+                self.bridge.write(user_id, event, data)
+            except OSError as e:
+                print(f"⚠️ Event bridge write failed ({self.bridge.path}): {e}")
+
+    def _deliver(self, user_id: int, event: str, data: Dict[str, Any]):
+        for subscription in self._subscribers.get(user_id, ()):
+            subscription.deliver((event, data))
+
+    # ---------- streams ----------
+    def streams(self, user_id: int) -> int:
+        return len(self._subscribers.get(user_id, ()))
+
+    def can_subscribe(self, user_id: int) -> bool:
+        return not self.max_streams_per_user or self.streams(user_id) < self.max_streams_per_user
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        self._ensure_tail()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self._subscribers.get(subscription.user_id)
+        if subscriptions is None:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscribers[subscription.user_id]
+
+    async def stream(self, user_id: int) -> AsyncIterator[str]:
+        """
+        Server-Sent Events for one client until it disconnects or the
+        stream reaches max_stream_seconds
+        """
+        subscription = self.subscribe(user_id)
+        deadline = time.monotonic() + self.max_stream_seconds
+        try:
+            yield f"retry: {RETRY_MS}\n\n" + encode_sse("ready", {"reconnect_after": self.max_stream_seconds})
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                event = await subscription.next(min(self.keepalive, remaining))
+                if event is not None:
+                    yield encode_sse(*event)
+                elif time.monotonic() < deadline:
+                    yield ": keepalive\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+    # ---------- bridge ----------
+    def _ensure_tail(self):
+        if self.bridge is None:
+            return
+        loop = asyncio.get_running_loop()
+        if self._tail is None or self._tail.done() or self._tail.get_loop() is not loop:
+            self._tail = loop.create_task(self._tail_loop(), name="event-bridge")
+
+    async def _tail_loop(self):
+        # Only tail while this worker has streams to deliver to
+        self.bridge.pause()
+        while self._subscribers:
+            try:
+                records = self.bridge.read()
+            except OSError as e:
+                print(f"⚠️ Event bridge read failed ({self.bridge.path}): {e}")
+                records = []
+            for record in records:
+                self._deliver(record["user_id"], record["event"], record["data"])
+            await asyncio.sleep(self.bridge.poll)
+
+    async def stop(self):
+        """Cancel the bridge tail (application shutdown)"""
+        if self._tail is not None and not self._tail.done():
+            self._tail.cancel()
+            await asyncio.gather(self._tail, return_exceptions=True)
+        self._tail = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "streams": sum(len(subscriptions) for subscriptions in self._subscribers.values()),
+            "users": len(self._subscribers),
+            "bridge": "file" if self.bridge is not None else "off"
+        }
+
+
+def _build_bridge() -> Optional[FileBridge]:
+    mode = EVENTS_BRIDGE
+    if mode == "auto":
+        mode = "file" if WEB_CONCURRENCY > 1 else "off"
+    if mode == "file":
+        return FileBridge(EVENTS_BRIDGE_PATH, EVENTS_BRIDGE_POLL_MS, EVENTS_BRIDGE_MAX_BYTES)
+    if mode != "off":
+        print(f"⚠️ Unknown EVENTS_BRIDGE={EVENTS_BRIDGE!r}; events stay in this process")
+    return None
+
+
+# Singleton instance
+event_broker = EventBroker(
+    queue_size=EVENTS_QUEUE_SIZE,
+    max_streams_per_user=EVENTS_MAX_STREAMS_PER_USER,
+    keepalive_seconds=EVENTS_KEEPALIVE_SECONDS,
+    max_stream_seconds=EVENTS_MAX_STREAM_SECONDS,
+    bridge=_build_bridge()
+)
+
+metrics.callback(
+    "event_streams",
+    "Open Server-Sent Events streams in this process",
+    lambda: [({}, event_broker.stats()["streams"])]
+)
+
+
+# ============================================
+# EVENT PAYLOADS
+# ============================================
+def publish_history(
+    user_id: int,
+    product_names: Union[str, Sequence[str]],
+    predictions: PredictionBatch,
+    prediction_type: str
+):
+    """
+    Announce rows just saved to prediction_history
+
+    Sends the newest EVENTS_HISTORY_ROWS rows, newest first, in the shape of
+    GET /api/predict/history (without ids, which bulk inserts do not return).
+    """
+    if not len(predictions):
+        return
+    newest = predictions[-EVENTS_HISTORY_ROWS:]
+    if isinstance(product_names, str):
+        product_names = [product_names] * len(newest)
+    else:
+        product_names = product_names[-EVENTS_HISTORY_ROWS:]
+
+    created_at = datetime.utcnow().isoformat()
+    texts, ratings, confidences = newest.columns()
+    event_broker.publish(user_id, "history", {
+        "total": len(predictions),
+        "rows": [
+            {
+                "product_name": product_name or "",
+                "comment": text,
+                "predicted_rating": rating,
+                "confidence_score": confidence,
+                "prediction_type": prediction_type,
+                "created_at": created_at
+            }
+            for product_name, text, rating, confidence in reversed(list(zip(product_names, texts, ratings, confidences)))
+        ]
+    })
+
+
+class JobProgress:
+    """
+    batch_progress / batch_complete / batch_failed events for one job
+
+    `scored` is the progress callback for admission.run_chunked; it only
+    publishes when the whole-number percentage changes.
+
+    Args:
+        user_id: Owner of the job
+        kind: 'batch' or 'bulk'
+        job_id: Client-chosen id to match events to its request (generated if None)
+    """
+
+    def __init__(self, user_id: int, kind: str, job_id: Optional[str] = None):
+        self.user_id = user_id
+        self.kind = kind
+        self.job_id = job_id or uuid.uuid4().hex[:12]
+        self.total = 0
+        self._percent = -1
+
+    def _publish(self, event: str, **data):
+        event_broker.publish(self.user_id, event, {"job_id": self.job_id, "kind": self.kind, **data})
+
+    def scored(self, done: int, total: int):
+        self.total = total
+        percent = done * 100 // total if total else 100
+        if percent != self._percent:
+            self._percent = percent
+            self._publish("batch_progress", stage="scoring", done=done, total=total, percent=percent)
+
+    def stage(self, name: str):
+        """Scoring is done and a follow-up step (saving, wordcloud) started"""
+        self._publish("batch_progress", stage=name, done=self.total, total=self.total, percent=100)
+
+    def complete(self, **summary):
+        self._publish("batch_complete", **summary)
+
+    def failed(self, detail: str):
+        self._publish("batch_failed", detail=detail)
@@ -0,0 +1,231 @@
+"""
+Fast Tokenizer
+PhoBERT's BPE rebuilt on the Rust `tokenizers` library, id-for-id identical
+
+PhobertTokenizer (transformers) is pure Python and encodes one string at a
+time. `convert` rebuilds its vocabulary and merges as a `tokenizers` BPE
+model whose `encode_batch` runs natively and in parallel across cores.
+`python -m app.cli.tokenizer convert` checks parity with the slow tokenizer
+before writing the result next to the bundled tokenizer files; the service
+only loads a converted file whose source fingerprint still matches.
+
+fastBPE marks word continuations ("ng@@ " + "ười") while `tokenizers`
+marks word ends ("ng" + "ười</w>"), so every internal piece gets its own id
+and a lookup table maps it back to PhoBERT's id (pieces PhoBERT does not
+know map to <unk>, as in the slow tokenizer).
+"""
+import hashlib
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+FAST_TOKENIZER_FILE = "tokenizer.fast.json"
+FORMAT_VERSION = 1
+
+# Files the conversion is derived from (see fingerprint)
+SOURCE_FILES = ("vocab.txt", "bpe.codes", "added_tokens.json")
+
+END_OF_WORD = "</w>"
+CONTINUATION = "@@"
+
+SPECIAL_ROLES = ("bos_token", "eos_token", "sep_token", "cls_token", "unk_token", "pad_token", "mask_token")
+
+
+def fast_tokenizer_path(tokenizer_dir: str) -> str:
+    return os.path.join(tokenizer_dir, FAST_TOKENIZER_FILE)
+
+
+def fingerprint(tokenizer_dir: str) -> str:
+    """Hash of the vocabulary/merges the conversion was built from"""
+    digest = hashlib.sha256()
+    for name in SOURCE_FILES:
+        path = os.path.join(tokenizer_dir, name)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                digest.update(name.encode() + b"\0" + f.read())
+    return digest.hexdigest()[:16]
+
+
+def _word_regex() -> str:
+    """
+    The slow tokenizer's word pattern `\\S+\\n?` for Oniguruma
+
+    Python's \\s covers exactly the characters where str.isspace() holds
+    (including \\x1c-\\x1f and \\x85); Oniguruma's \\s does not, so the class
+    is spelled out.
+    """
+    spaces = "".join(f"\\x{{{code:x}}}" for code in range(sys.maxunicode + 1) if chr(code).isspace())
+    return f"[^{spaces}]+\\n?"
+
+
+class FastPhobertTokenizer:
+    """
+    The parts of PhobertTokenizer the service uses, backed by `tokenizers`
+
+    Args:
+        tokenizer: tokenizers.Tokenizer with the rebuilt BPE model
+        id_map: Internal token id -> PhoBERT token id
+        special_tokens: Role (bos_token, ...) -> (token, PhoBERT id)
+        vocab_size: len() of the slow tokenizer (vocabulary + added tokens)
+        metadata: Conversion details (source fingerprint, parity check)
+    """
+
+    def __init__(self, tokenizer, id_map: List[int], special_tokens: Dict[str, List[Any]],
+                 vocab_size: int, metadata: Optional[Dict[str, Any]] = None):
+        self._tokenizer = tokenizer
+        self._id_map = id_map
+        self.special_tokens = special_tokens
+        self.vocab_size = vocab_size
+        self.metadata = metadata or {}
+        for role, (token, token_id) in special_tokens.items():
+            setattr(self, role, token)
+            setattr(self, f"{role}_id", token_id)
+
+    def __len__(self) -> int:
+        return self.vocab_size
+
+    def encode_batch(self, texts: Sequence[str], add_special_tokens: bool = False) -> List[List[int]]:
+        """PhoBERT ids per text; the batch is encoded in parallel"""
+        id_map = self._id_map
+        encodings = self._tokenizer.encode_batch(list(texts), add_special_tokens=False)
+        batch = [[id_map[token_id] for token_id in encoding.ids] for encoding in encodings]
+        if add_special_tokens:
+            batch = [[self.bos_token_id] + ids + [self.eos_token_id] for ids in batch]
+        return batch
+
+    def __call__(self, texts: Union[str, Sequence[str]], add_special_tokens: bool = True,
+                 truncation: bool = False, max_length: Optional[int] = None,
+                 verbose: bool = True) -> Dict[str, Any]:
+        """Subset of the transformers call: {"input_ids": ...} without padding or tensors"""
+        single = isinstance(texts, str)
+        batch = self.encode_batch([texts] if single else texts, add_special_tokens=add_special_tokens)
+        if truncation and max_length:
+            batch = [
+                ids[:max_length - 1] + ids[-1:] if add_special_tokens and len(ids) > max_length else ids[:max_length]
+                for ids in batch
+            ]
+        return {"input_ids": batch[0] if single else batch}
+
+    def save(self, path: str):
+        data = {
+            "format": FORMAT_VERSION,
+            "vocab_size": self.vocab_size,
+            "special_tokens": self.special_tokens,
+            "metadata": self.metadata,
+            "id_map": self._id_map,
+            "tokenizer": self._tokenizer.to_str()
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "FastPhobertTokenizer":
+        # Import heavy dependencies only when needed
+        from tokenizers import Tokenizer
+
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format") != FORMAT_VERSION:
+            raise ValueError(f"unsupported format {data.get('format')!r} (expected {FORMAT_VERSION})")
+        return cls(
+            Tokenizer.from_str(data["tokenizer"]),
+            data["id_map"],
+            {role: list(value) for role, value in data["special_tokens"].items()},
+            data["vocab_size"],
+            data["metadata"]
+        )
+
+
+def convert(slow_tokenizer, tokenizer_dir: Optional[str] = None) -> FastPhobertTokenizer:
+    """
+    Rebuild a (slow) PhobertTokenizer as a `tokenizers` BPE model
+
+    Uses the slow tokenizer's own parsed vocabulary and merge ranks, so any
+    quirks of its file parsing carry over unchanged.
+    """
+    # Import heavy dependencies only when needed
+    from tokenizers import AddedToken, Regex, Tokenizer
+    from tokenizers.models import BPE
+    from tokenizers.pre_tokenizers import Split
+
+    encoder = slow_tokenizer.encoder
+    unk_id = slow_tokenizer.unk_token_id
+    added = dict(slow_tokenizer.added_tokens_encoder)
+
+    vocab: Dict[str, int] = {}
+    id_map: List[int] = []
+
+    def add(piece: str, token_id: Optional[int] = None):
+        if piece in vocab:
+            return
+        if token_id is None:
+            if piece.endswith(END_OF_WORD):
+                token_id = encoder.get(piece[:-len(END_OF_WORD)], unk_id)
+            else:
+                token_id = encoder.get(piece + CONTINUATION, unk_id)
+        vocab[piece] = len(id_map)
+        id_map.append(token_id)
+
+    for token, token_id in added.items():
+        add(token, token_id)
+    for token in encoder:
+        if token in added:
+            continue
+        add(token[:-len(CONTINUATION)] if token.endswith(CONTINUATION) else token + END_OF_WORD)
+
+    # Merge ranks as the slow tokenizer sees them; lines it parsed into
+    # anything but a pair (non-breaking spaces in bpe.codes) can never apply
+    merges = [pair for pair, _ in sorted(slow_tokenizer.bpe_ranks.items(), key=lambda item: item[1])
+              if len(pair) == 2]
+    for first, second in merges:
+        add(first)
+        add(second)
+        add(first + second)
+
+    # Every character must exist both inside a word and at its end
+    characters = set()
+    for piece in list(vocab):
+        if piece not in added:
+            characters.update(piece[:-len(END_OF_WORD)] if piece.endswith(END_OF_WORD) else piece)
+    for character in sorted(characters):
+        add(character)
+        add(character + END_OF_WORD)
+
+    tokenizer = Tokenizer(BPE(
+        vocab=vocab,
+        merges=merges,
+        unk_token=slow_tokenizer.unk_token,
+        end_of_word_suffix=END_OF_WORD
+    ))
+    tokenizer.pre_tokenizer = Split(Regex(_word_regex()), behavior="removed", invert=True)
+    tokenizer.add_special_tokens([
+        AddedToken(token, special=True, normalized=False, lstrip=False, rstrip=False) for token in added
+    ])
+
+    special_tokens = {
+        role: [getattr(slow_tokenizer, role), getattr(slow_tokenizer, f"{role}_id")]
+        for role in SPECIAL_ROLES if getattr(slow_tokenizer, role, None) is not None
+    }
+    metadata = {"fingerprint": fingerprint(tokenizer_dir)} if tokenizer_dir else {}
+    return FastPhobertTokenizer(tokenizer, id_map, special_tokens, len(slow_tokenizer), metadata)
+
+
+def load_fast_tokenizer(tokenizer_dir: str) -> Optional[FastPhobertTokenizer]:
+    """Converted tokenizer for this directory, if present and still in sync"""
+    path = fast_tokenizer_path(tokenizer_dir)
+    if not os.path.exists(path):
+        print(f"ℹ️ No fast tokenizer at {path}; run `python -m app.cli.tokenizer convert` for faster encoding")
+        return None
+    try:
+        tokenizer = FastPhobertTokenizer.load(path)
+    except Exception as e:
+        print(f"⚠️ Fast tokenizer unusable ({path}): {e}")
+        return None
+    if tokenizer.metadata.get("fingerprint") != fingerprint(tokenizer_dir):
+        print("⚠️ Fast tokenizer was converted from different vocab/merges files; "
+              "re-run `python -m app.cli.tokenizer convert`")
+        return None
+    return tokenizer
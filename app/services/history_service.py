@@ -0,0 +1,82 @@
+"""
+History Service
+Bulk persistence of predictions into prediction_history
+"""
+from typing import List, Sequence, Tuple, Union
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models import PredictionHistory
+from app.services.prediction_batch import PredictionBatch
+
+
+def save_prediction_history(
+    db: Session,
+    user_id: int,
+    product_names: Union[str, Sequence[str]],
+    predictions: PredictionBatch,
+    prediction_type: str = 'batch',
+    commit: bool = True
+) -> int:
+    """
+    Insert many predictions with one executemany instead of one ORM object per row
+    
+    Args:
+        db: Database session
+        user_id: Owner of the rows
+        product_names: One product name for all rows, or one per prediction
+        predictions: Batch of comments with their rating and confidence
+        prediction_type: 'single', 'batch' or 'bulk'
+        commit: Commit the session after inserting
+        
+    Returns:
+        int: Number of rows inserted
+    """
+    if not predictions:
+        return 0
+    
+    if isinstance(product_names, str):
+        product_names = [product_names] * len(predictions)
+    
+    texts, ratings, confidences = predictions.columns()
+    rows = [
+        {
+            'user_id': user_id,
+            'product_name': product_name or "",
+            'comment': text,
+            'predicted_rating': rating,
+            'confidence_score': confidence,
+            'prediction_type': prediction_type,
+        }
+        for product_name, text, rating, confidence in zip(product_names, texts, ratings, confidences)
+    ]
+    db.execute(insert(PredictionHistory), rows)
+    if commit:
+        db.commit()
+    
+    return len(rows)
+
+
+def recent_distinct_comments(db: Session, limit: int = 0) -> List[Tuple[str, int]]:
+    """
+    Newest distinct comments with their stored rating (for distillation / calibration)
+    
+    Args:
+        db: Database session
+        limit: Newest N rows to scan (0 = all)
+        
+    Returns:
+        list: [(comment, predicted_rating), ...], newest first
+    """
+    query = (
+        db.query(PredictionHistory.comment, PredictionHistory.predicted_rating)
+        .order_by(PredictionHistory.id.desc())
+    )
+    if limit:
+        query = query.limit(limit)
+    latest = {}
+    for comment, rating in query.yield_per(5000):
+        if comment and comment.strip() and 1 <= rating <= 5:
+            latest.setdefault(comment.strip(), rating)
+    return list(latest.items())
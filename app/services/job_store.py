@@ -0,0 +1,341 @@
+"""
+Job Store
+Columnar result files for batch / bulk jobs, memory-mapped when read
+
+Every stored job gets its own directory of flat files:
+
+    ratings.npy        uint8    one per row
+    confidences.npy    float16  one per row
+    comments.bin       UTF-8 comments back to back
+    comments.idx.npy   int64    n + 1 byte offsets into comments.bin
+    products.*         same layout, only when rows have different products
+
+The batch_jobs table only points at the directory. Readers map the files
+instead of loading them, so paging, filtering by rating and exporting
+touch, and build Python objects for, just the rows they return.
+Ratings and confidences of a 1M-row job take 3 MB.
+"""
+import csv
+import io
+import json
+import mmap
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+from fastapi import HTTPException, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import JOB_STORE_DIR, JOB_STORE_ENABLED, JOB_STORE_MAX_JOBS_PER_USER
+from app.models import BatchJob
+from app.services.metrics_service import metrics, stage_timer
+from app.services.prediction_batch import PredictionBatch, rating_distribution
+
+RATINGS_FILE = "ratings.npy"
+CONFIDENCES_FILE = "confidences.npy"
+
+# float16 keeps about three significant digits
+CONFIDENCE_DECIMALS = 3
+
+EXPORT_FORMATS = ("csv", "jsonl")
+# Rows formatted per chunk of an export stream
+EXPORT_CHUNK_ROWS = 4096
+
+JOBS_STORED = metrics.counter(
+    "job_store_jobs_total",
+    "Jobs written to the columnar job store",
+    ["kind"]
+)
+ROWS_STORED = metrics.counter(
+    "job_store_rows_total",
+    "Result rows written to the columnar job store",
+    ["kind"]
+)
+
+
+class StringColumn:
+    """Variable-length UTF-8 strings: one data file plus n + 1 byte offsets"""
+
+    def __init__(self, directory: Path, name: str):
+        # Import heavy dependencies only when needed (numpy)
+        import numpy as np
+
+        self.offsets = np.load(directory / f"{name}.idx.npy", mmap_mode="r")
+        data_path = directory / f"{name}.bin"
+        if os.path.getsize(data_path):
+            with open(data_path, "rb") as f:
+                # The mapping stays valid after the file is closed
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:  # mmap refuses empty files
+            self._data = b""
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def take(self, indices: "np.ndarray") -> List[str]:
+        """Decode the strings at `indices` (only those bytes are read)"""
+        starts = self.offsets[indices].tolist()
+        ends = self.offsets[indices + 1].tolist()
+        data = self._data
+        return [data[start:end].decode("utf-8") for start, end in zip(starts, ends)]
+
+    @staticmethod
+    def write(directory: Path, name: str, values: Sequence[str]):
+        import numpy as np
+
+        lengths = np.empty(len(values) + 1, dtype=np.int64)
+        lengths[0] = 0
+        with open(directory / f"{name}.bin", "wb") as f:
+            for i, value in enumerate(values, start=1):
+                encoded = value.encode("utf-8")
+                f.write(encoded)
+                lengths[i] = len(encoded)
+        np.save(directory / f"{name}.idx.npy", np.cumsum(lengths))
+
+
+class JobColumns:
+    """Read-only, memory-mapped view of one stored job"""
+
+    def __init__(self, directory: Path):
+        import numpy as np
+
+        self.ratings = np.load(directory / RATINGS_FILE, mmap_mode="r")
+        self.confidences = np.load(directory / CONFIDENCES_FILE, mmap_mode="r")
+        self.comments = StringColumn(directory, "comments")
+        self.products = StringColumn(directory, "products") if (directory / "products.bin").exists() else None
+
+    def __len__(self) -> int:
+        return len(self.ratings)
+
+    def matching(self, rating: Optional[int] = None) -> Optional["np.ndarray"]:
+        """Indices of the rows with `rating`, in job order (None = every row)"""
+        if rating is None:
+            return None
+        return (self.ratings == rating).nonzero()[0]
+
+    def _slice(self, matches: Optional["np.ndarray"], start: int, stop: int) -> "np.ndarray":
+        import numpy as np
+
+        if matches is None:
+            return np.arange(min(start, len(self)), min(stop, len(self)))
+        return matches[start:stop]
+
+    def rows(self, indices: "np.ndarray") -> List[Dict[str, Any]]:
+        """Row dicts for `indices` only"""
+        columns = {
+            "index": indices.tolist(),
+            "comment": self.comments.take(indices),
+            "rating": self.ratings[indices].tolist(),
+            "confidence": self.confidences[indices].astype("float64").round(CONFIDENCE_DECIMALS).tolist(),
+        }
+        if self.products is not None:
+            columns["product_name"] = self.products.take(indices)
+        names = list(columns)
+        return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+    def page(self, offset: int, limit: int, rating: Optional[int] = None) -> Dict[str, Any]:
+        matches = self.matching(rating)
+        total = len(self) if matches is None else len(matches)
+        return {
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "rating": rating,
+            "rows": self.rows(self._slice(matches, offset, offset + limit)),
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "rating_distribution": rating_distribution(self.ratings),
+            "average_rating": round(float(self.ratings.mean(dtype="float64")), 3) if len(self) else 0.0,
+            "average_confidence": round(float(self.confidences.mean(dtype="float64")), 3) if len(self) else 0.0,
+        }
+
+    def export(self, fmt: str, rating: Optional[int] = None) -> Iterator[str]:
+        """
+        Stream rows as CSV (same columns as the /batch download) or JSON Lines
+
+        Yields one string per EXPORT_CHUNK_ROWS rows, so memory stays flat
+        however large the job is.
+        """
+        matches = self.matching(rating)
+        total = len(self) if matches is None else len(matches)
+        if fmt == "csv":
+            header = ["Comment", "Predicted_Rating", "Confidence"]
+            if self.products is not None:
+                header.insert(0, "Product_Name")
+            yield _csv_lines([header])
+
+        for start in range(0, total, EXPORT_CHUNK_ROWS):
+            rows = self.rows(self._slice(matches, start, start + EXPORT_CHUNK_ROWS))
+            if fmt == "csv":
+                yield _csv_lines(
+                    ([row["product_name"]] if self.products is not None else [])
+                    + [row["comment"], row["rating"], row["confidence"]]
+                    for row in rows
+                )
+            else:
+                yield "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+
+
+def _csv_lines(rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def write_columns(directory: Path, predictions: PredictionBatch, products: Optional[Sequence[str]] = None):
+    """Write one job's columns into an existing, empty directory"""
+    import numpy as np
+
+    np.save(directory / RATINGS_FILE, predictions.ratings)
+    np.save(directory / CONFIDENCES_FILE, predictions.confidences.astype(np.float16))
+    StringColumn.write(directory, "comments", predictions.texts)
+    if products is not None:
+        StringColumn.write(directory, "products", products)
+
+
+class JobStore:
+    """
+    Job directories under `root`, tracked in the batch_jobs table
+
+    Args:
+        root: Directory holding one `<user_id>/<key>/` directory per job
+        max_jobs_per_user: Older jobs beyond this many are deleted (0 = keep all)
+    """
+
+    def __init__(self, root: Path, max_jobs_per_user: int = 0):
+        self.root = Path(root)
+        self.max_jobs_per_user = max_jobs_per_user
+
+    def save(
+        self,
+        db: Session,
+        user_id: int,
+        kind: str,
+        job_id: str,
+        product_names: Union[str, Sequence[str]],
+        predictions: PredictionBatch
+    ) -> Optional[BatchJob]:
+        """
+        Persist a finished job, replacing an earlier job with the same job_id
+
+        Does file I/O: call it from a worker thread.
+
+        Returns:
+            BatchJob, or None if nothing was stored
+        """
+        if not len(predictions):
+            return None
+
+        products = None
+        product_name = product_names
+        if not isinstance(product_names, str):
+            distinct = set(product_names)
+            product_name = (distinct.pop() or "") if len(distinct) == 1 else ""
+            if len(distinct) > 1:
+                products = [name or "" for name in product_names]
+
+        # Fresh directory per save: readers of a replaced job keep their mapping
+        storage_path = f"{user_id}/{uuid.uuid4().hex}"
+        with stage_timer("jobs.write", rows=len(predictions)):
+            self._write(storage_path, predictions, products)
+
+        stale = []
+        replaced = self.get(db, user_id, job_id)
+        if replaced is not None:
+            db.delete(replaced)
+            db.flush()  # free the (user_id, job_id) pair before the insert
+            stale.append(replaced.storage_path)
+        job = BatchJob(
+            user_id=user_id,
+            job_id=job_id,
+            kind=kind,
+            product_name=product_name,
+            total=len(predictions),
+            storage_path=storage_path
+        )
+        db.add(job)
+        try:
+            db.flush()
+            stale.extend(self._prune(db, user_id))
+            db.commit()
+        except IntegrityError:
+            # Same job_id saved concurrently by another request: it wins
+            db.rollback()
+            self._remove(storage_path)
+            print(f"⚠️ Job {job_id!r} of user {user_id} was stored concurrently; keeping the other copy")
+            return None
+
+        for path in stale:
+            self._remove(path)
+        JOBS_STORED.inc(kind=kind)
+        ROWS_STORED.inc(len(predictions), kind=kind)
+        return job
+
+    def _write(self, storage_path: str, predictions: PredictionBatch, products: Optional[List[str]]):
+        directory = self.root / storage_path
+        tmp = directory.with_name(directory.name + ".tmp")
+        tmp.mkdir(parents=True)
+        try:
+            write_columns(tmp, predictions, products)
+            # Readers never see a half-written job
+            os.replace(tmp, directory)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+    def _prune(self, db: Session, user_id: int) -> List[str]:
+        """Delete the user's jobs beyond max_jobs_per_user; returns their storage paths"""
+        if self.max_jobs_per_user <= 0:
+            return []
+        old = (
+            db.query(BatchJob)
+            .filter(BatchJob.user_id == user_id)
+            .order_by(BatchJob.id.desc())
+            .offset(self.max_jobs_per_user)
+            .all()
+        )
+        for job in old:
+            db.delete(job)
+        return [job.storage_path for job in old]
+
+    def _remove(self, storage_path: str):
+        shutil.rmtree(self.root / storage_path, ignore_errors=True)
+
+    def get(self, db: Session, user_id: int, job_id: str) -> Optional[BatchJob]:
+        return db.query(BatchJob).filter(BatchJob.user_id == user_id, BatchJob.job_id == job_id).first()
+
+    def list_jobs(self, db: Session, user_id: int, limit: int = 50) -> List[BatchJob]:
+        """The user's jobs, newest first"""
+        return (
+            db.query(BatchJob)
+            .filter(BatchJob.user_id == user_id)
+            .order_by(BatchJob.id.desc())
+            .limit(limit)
+            .all()
+        )
+
+    def open(self, job: BatchJob) -> JobColumns:
+        """Map a job's files (FileNotFoundError if they are gone)"""
+        return JobColumns(self.root / job.storage_path)
+
+    def delete(self, db: Session, job: BatchJob):
+        storage_path = job.storage_path
+        db.delete(job)
+        db.commit()
+        self._remove(storage_path)
+
+
+# Singleton instance (None when JOB_STORE_ENABLED is off)
+job_store = JobStore(JOB_STORE_DIR, JOB_STORE_MAX_JOBS_PER_USER) if JOB_STORE_ENABLED else None
+
+
+def get_job_store() -> JobStore:
+    """Dependency to get the job store (404 when it is disabled)"""
+    if job_store is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job store is disabled (JOB_STORE_ENABLED)")
+    return job_store
@@ -0,0 +1,286 @@
+"""
+Live Prediction Service
+Debounced "rate as you type" predictions, batched across WebSocket clients
+
+Each connection (LiveSession) only ever scores its newest text: it waits
+LIVE_DEBOUNCE_MS after the last keystroke, and a newer keystroke cancels
+the older text while it is still waiting or queued. If the older text is
+already in a forward pass, its result is simply not sent.
+
+The shared LiveBatcher collects texts from all connections for
+LIVE_BATCH_WINDOW_MS and scores them with one predict_batch call on the
+interactive admission lane, so many typists cost a few batched forward
+passes instead of one request (auth, DB, forward pass) per prediction.
+Recent results are cached, so retyping or backspacing is free.
+
+All state lives on the event loop, so no locks are needed.
+"""
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from app.config import (
+    INFERENCE_WORKERS,
+    LIVE_DEBOUNCE_MS,
+    LIVE_BATCH_WINDOW_MS,
+    LIVE_MAX_BATCH,
+    LIVE_CACHE_SIZE,
+    LIVE_MAX_CONNECTIONS_PER_USER
+)
+from app.services.admission_service import admission, LANE_INTERACTIVE
+from app.services.metrics_service import metrics
+from app.services.ml_service import ml_service
+
+LIVE_REQUESTS = metrics.counter(
+    "live_requests_total",
+    "Live prediction requests by outcome (debounced/cancelled = superseded by newer text)",
+    ["outcome"]
+)
+
+LIVE_BATCH_SIZE = metrics.histogram(
+    "live_batch_size",
+    "Distinct texts per batched live forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+
+
+class LiveBatcher:
+    """
+    Micro-batches texts from all live connections into predict_batch calls
+
+    Args:
+        window_ms: How long to collect texts before dispatching a batch
+        max_batch: Distinct texts per batch
+        cache_size: Recent results kept per model version (0 = no cache)
+        max_concurrent: Batches in flight at once (one per inference worker)
+        max_connections_per_user: Open live connections per user (0 = no limit)
+    """
+
+    def __init__(self, window_ms: float, max_batch: int, cache_size: int, max_concurrent: int,
+                 max_connections_per_user: int):
+        self.window = window_ms / 1000
+        self.max_batch = max(1, max_batch)
+        self.cache_size = cache_size
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_connections_per_user = max_connections_per_user
+
+        self._cache: "OrderedDict[Tuple[Optional[str], str], Dict[str, Any]]" = OrderedDict()
+        self._connections: Dict[int, int] = {}
+        self._reset()
+
+    def _reset(self):
+        # Loop-bound state, (re)created on the loop that uses it
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[str, List[asyncio.Future]] = {}  # text -> waiters, insertion = FIFO
+        self._wakeup: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._batches: Set[asyncio.Task] = set()  # strong references while running
+
+    def _ensure_dispatcher(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._reset()
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = loop.create_task(self._dispatch_loop(), name="live-batcher")
+
+    # ---------- connections ----------
+    def connect(self, user_id: int) -> bool:
+        """Register a connection; False if the user already has too many"""
+        count = self._connections.get(user_id, 0)
+        if self.max_connections_per_user and count >= self.max_connections_per_user:
+            return False
+        self._connections[user_id] = count + 1
+        return True
+
+    def disconnect(self, user_id: int):
+        self._connections[user_id] -= 1
+        if not self._connections[user_id]:
+            del self._connections[user_id]
+
+    # ---------- cache ----------
+    @staticmethod
+    def _version() -> Optional[str]:
+        active = ml_service.registry.active
+        return active.name if active is not None else None
+
+    def cached(self, text: str) -> Optional[Dict[str, Any]]:
+        key = (self._version(), text)
+        prediction = self._cache.get(key)
+        if prediction is not None:
+            self._cache.move_to_end(key)
+        return prediction
+
+    def _remember(self, version: Optional[str], text: str, prediction: Dict[str, Any]):
+        if not self.cache_size:
+            return
+        self._cache[(version, text)] = prediction
+        self._cache.move_to_end((version, text))
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    # ---------- batching ----------
+    async def predict(self, text: str) -> Dict[str, Any]:
+        """
+        Score one text in the next shared batch
+
+        Cancelling the caller removes the text from the batch if it has not
+        been dispatched yet (identical texts share one slot).
+        """
+        self._ensure_dispatcher()
+        future = self._loop.create_future()
+        self._pending.setdefault(text, []).append(future)
+        self._wakeup.set()
+        try:
+            return await future
+        finally:
+            waiters = self._pending.get(text)
+            if waiters is not None and future in waiters:
+                waiters.remove(future)
+                if not waiters:
+                    del self._pending[text]
+
+    def _take_batch(self) -> Dict[str, List[asyncio.Future]]:
+        batch = {}
+        for text in list(self._pending):
+            waiters = [future for future in self._pending.pop(text) if not future.done()]
+            if waiters:
+                batch[text] = waiters
+            if len(batch) >= self.max_batch:
+                break
+        return batch
+
+    async def _dispatch_loop(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            await self._slots.acquire()
+            # Let other typists join this batch
+            await asyncio.sleep(self.window)
+            batch = self._take_batch()
+            if self._pending:
+                self._wakeup.set()
+            if not batch:
+                self._slots.release()
+                continue
+            task = self._loop.create_task(self._run_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch: Dict[str, List[asyncio.Future]]):
+        texts = list(batch)
+        LIVE_BATCH_SIZE.observe(len(texts))
+        try:
+            predictions = await admission.run(LANE_INTERACTIVE, ml_service.predict_batch, texts)
+        except Exception as e:
+            for waiters in batch.values():
+                for future in waiters:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+
+        version = self._version()
+        for text, prediction in zip(texts, predictions):
+            self._remember(version, text, prediction)
+            for future in batch[text]:
+                # Waiters cancelled mid-flight were superseded; the result stays cached
+                if not future.done():
+                    future.set_result(prediction)
+
+    async def stop(self):
+        """Cancel the dispatcher and any running batches (application shutdown)"""
+        tasks = [task for task in [self._dispatcher, *self._batches] if task is not None and not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._reset()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connections": sum(self._connections.values()),
+            "users": len(self._connections),
+            "pending_texts": len(self._pending),
+            "batches_in_flight": len(self._batches),
+            "cached_results": len(self._cache)
+        }
+
+
+class LiveSession:
+    """
+    One live connection: debounces keystrokes and only scores the newest text
+
+    Args:
+        send: Coroutine sending one JSON message to the client
+        batcher: Shared LiveBatcher
+        debounce_ms: Quiet time after the last keystroke before scoring
+    """
+
+    def __init__(self, send: Callable[[Dict[str, Any]], Awaitable[None]], batcher: LiveBatcher,
+                 debounce_ms: float = LIVE_DEBOUNCE_MS):
+        self.send = send
+        self.batcher = batcher
+        self.debounce = debounce_ms / 1000
+        self._task: Optional[asyncio.Task] = None
+        self._stage = "idle"
+
+    def submit(self, request_id: Any, text: str):
+        """Newest text from the client; supersedes anything still in progress"""
+        self.cancel()
+        if not text.strip():
+            return
+        self._task = asyncio.get_running_loop().create_task(self._score(request_id, text))
+
+    def cancel(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            LIVE_REQUESTS.inc(outcome="debounced" if self._stage == "debounce" else "cancelled")
+        self._task = None
+
+    async def _score(self, request_id: Any, text: str):
+        prediction = self.batcher.cached(text)
+        if prediction is not None:
+            outcome = "cached"
+        else:
+            self._stage = "debounce"
+            await asyncio.sleep(self.debounce)
+            self._stage = "queued"
+            try:
+                prediction = await self.batcher.predict(text)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._stage = "idle"
+                LIVE_REQUESTS.inc(outcome="error")
+                await self.send({"type": "error", "id": request_id, "detail": f"Prediction failed: {e}"})
+                return
+            outcome = "scored"
+        self._stage = "idle"
+        LIVE_REQUESTS.inc(outcome=outcome)
+        await self.send({
+            "type": "prediction",
+            "id": request_id,
+            "rating": prediction["rating"],
+            "confidence": prediction["confidence"],
+            "cached": outcome == "cached"
+        })
+
+
+# Singleton instance
+live_batcher = LiveBatcher(
+    window_ms=LIVE_BATCH_WINDOW_MS,
+    max_batch=LIVE_MAX_BATCH,
+    cache_size=LIVE_CACHE_SIZE,
+    max_concurrent=INFERENCE_WORKERS,
+    max_connections_per_user=LIVE_MAX_CONNECTIONS_PER_USER
+)
+
+metrics.callback(
+    "live_connections",
+    "Open live-prediction WebSocket connections",
+    lambda: [({}, live_batcher.stats()["connections"])]
+)
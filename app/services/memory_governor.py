@@ -0,0 +1,191 @@
+"""
+Memory Governor
+Idle model unloading and RSS-budget load shedding for small instances
+
+A background thread unloads the model after MODEL_IDLE_UNLOAD_SECONDS
+without traffic and compares process RSS against MEMORY_BUDGET_MB:
+
+- ok:   everything runs
+- soft: the optional word cloud is skipped
+- hard: new batch/bulk jobs wait for memory to come back, then get 503
+"""
+import asyncio
+import ctypes
+import gc
+import math
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException, status
+
+from app.config import (
+    MODEL_IDLE_UNLOAD_SECONDS,
+    MEMORY_BUDGET_MB,
+    MEMORY_SOFT_LIMIT_RATIO,
+    MEMORY_ADMIT_WAIT_SECONDS,
+    MEMORY_CHECK_INTERVAL_SECONDS
+)
+from app.services.metrics_service import metrics, get_rss_bytes
+from app.services.ml_service import ml_service, MLPredictionService
+
+STATE_OK = "ok"
+STATE_SOFT = "soft"
+STATE_HARD = "hard"
+
+SHED_TOTAL = metrics.counter(
+    "memory_shed_total",
+    "Work skipped or rejected because of memory pressure",
+    ["action"]
+)
+
+try:
+    # glibc only: hand freed heap pages back to the OS after an unload
+    _libc = ctypes.CDLL("libc.so.6")
+except OSError:  # pragma: no cover - non-glibc platforms
+    _libc = None
+
+
+def release_memory():
+    """Run the GC and return free heap pages to the OS where supported"""
+    gc.collect()
+    if _libc is not None:
+        try:
+            _libc.malloc_trim(0)
+        except AttributeError:  # pragma: no cover - musl etc.
+            pass
+
+
+class MemoryGovernor:
+    """Watches RSS and model idleness for one MLPredictionService"""
+
+    def __init__(
+        self,
+        service: MLPredictionService,
+        budget_mb: float,
+        soft_ratio: float,
+        idle_unload_seconds: float,
+        admit_wait_seconds: float,
+        interval_seconds: float
+    ):
+        self.service = service
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.soft_bytes = int(self.budget_bytes * soft_ratio)
+        self.idle_unload_seconds = idle_unload_seconds
+        self.admit_wait_seconds = admit_wait_seconds
+        self.interval_seconds = interval_seconds
+        self.unloads = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget_bytes > 0 or self.idle_unload_seconds > 0
+
+    def state(self, rss: Optional[int] = None) -> str:
+        """Current pressure level: ok, soft or hard"""
+        if not self.budget_bytes:
+            return STATE_OK
+        rss = get_rss_bytes() if rss is None else rss
+        if rss >= self.budget_bytes:
+            return STATE_HARD
+        if rss >= self.soft_bytes:
+            return STATE_SOFT
+        return STATE_OK
+
+    def allow_optional_work(self, action: str) -> bool:
+        """False when an optional artifact (word cloud) should be skipped"""
+        if self.state() == STATE_OK:
+            return True
+        SHED_TOTAL.inc(action=action)
+        return False
+
+    async def admit_batch(self):
+        """
+        Dependency for batch/bulk endpoints
+
+        Under hard pressure the request is paused until memory drops back
+        below the budget; after MEMORY_ADMIT_WAIT_SECONDS it gets 503.
+        """
+        if self.state() != STATE_HARD:
+            return
+        release_memory()
+        deadline = time.monotonic() + self.admit_wait_seconds
+        while self.state() == STATE_HARD:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                SHED_TOTAL.inc(action="batch_rejected")
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server is low on memory, please retry shortly",
+                    headers={"Retry-After": str(max(1, math.ceil(self.interval_seconds)))},
+                )
+            await asyncio.sleep(min(0.5, remaining))
+
+    def check(self):
+        """One governor pass: idle unload, then reclaim memory under pressure"""
+        if self.idle_unload_seconds > 0 and self.service.unload(self.idle_unload_seconds):
+            self.unloads += 1
+            release_memory()
+        elif self.state() != STATE_OK:
+            release_memory()
+
+    def start(self):
+        """Start the background thread (no-op when nothing is configured)"""
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="memory-governor", daemon=True)
+        self._thread.start()
+        print(f"🧮 Memory governor started (budget={self.budget_bytes // (1024 * 1024)} MB, "
+              f"idle unload={self.idle_unload_seconds:g}s)")
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"⚠️ Memory governor check failed: {e}")
+
+    def status(self) -> Dict[str, Any]:
+        rss = get_rss_bytes()
+        idle_for = time.monotonic() - self.service.last_used
+        return {
+            "state": self.state(rss),
+            "rss_mb": round(rss / (1024 * 1024), 1),
+            "budget_mb": round(self.budget_bytes / (1024 * 1024), 1) or None,
+            "soft_limit_mb": round(self.soft_bytes / (1024 * 1024), 1) or None,
+            "model_loaded": self.service.model_loaded,
+            "model_in_use": self.service.in_use,
+            "model_idle_seconds": round(idle_for, 1),
+            "idle_unload_seconds": self.idle_unload_seconds or None,
+            "unloads": self.unloads,
+            "shed": {
+                action: SHED_TOTAL.value(action=action)
+                for action in ("wordcloud", "batch_rejected")
+            }
+        }
+
+
+# Singleton instance
+memory_governor = MemoryGovernor(
+    ml_service,
+    budget_mb=MEMORY_BUDGET_MB,
+    soft_ratio=MEMORY_SOFT_LIMIT_RATIO,
+    idle_unload_seconds=MODEL_IDLE_UNLOAD_SECONDS,
+    admit_wait_seconds=MEMORY_ADMIT_WAIT_SECONDS,
+    interval_seconds=MEMORY_CHECK_INTERVAL_SECONDS
+)
+
+metrics.callback(
+    "memory_pressure_state",
+    "0 = ok, 1 = soft limit (optional work skipped), 2 = over budget",
+    lambda: [({}, {STATE_OK: 0, STATE_SOFT: 1, STATE_HARD: 2}[memory_governor.state()])]
+)
+
+
+def get_memory_governor() -> MemoryGovernor:
+    """Dependency to get the memory governor"""
+    return memory_governor
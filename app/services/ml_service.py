@@ -2,8 +2,48 @@
 ML Prediction Service with LAZY LOADING
 Model loads on first request to reduce memory usage on startup
 """
+import math
 import os
-from typing import List, Dict, Any, Optional
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple
+
+from app.config import (
+    FAST_TOKENIZER_ENABLED,
+    INFERENCE_BATCH_SIZE,
+    INFERENCE_TOKEN_BUDGET,
+    MAX_SEQUENCE_LENGTH,
+    WINDOW_OVERLAP,
+    MAX_WINDOWS_PER_TEXT,
+    ML_STANDIN_MODEL,
+    MODEL_VERSION,
+    RUNTIME_PROFILE,
+    TOKENIZER_THREADS,
+    TORCH_NUM_THREADS,
+    TORCH_INTEROP_THREADS,
+    WEB_CONCURRENCY
+)
+from app.services.metrics_service import metrics, stage_timer
+from app.services.model_registry import ModelRegistry, ModelVersion, VERSION_SECONDS
+
+PREDICTIONS_TOTAL = metrics.counter(
+    "ml_predictions_total",
+    "Comments scored by the model"
+)
+
+TOKENS_TOTAL = metrics.counter(
+    "ml_tokens_total",
+    "Token positions sent through the model (real vs padding)",
+    ["kind"]
+)
+
+# Scored on a freshly loaded version before it takes traffic
+WARMUP_TEXTS = [
+    "Sản phẩm rất tốt, giao hàng nhanh",
+    "Chất lượng kém, không giống mô tả"
+]
 
 # Only set HF cache for local development
 if not os.getenv("RENDER"):
@@ -18,56 +58,249 @@ class MLPredictionService:
     def __init__(self):
         """Initialize service without loading model (lazy loading)"""
         # Model components (loaded on first request)
-        self.model: Optional[Any] = None
         self.tokenizer: Optional[Any] = None
         self.device: Optional[str] = None
-        self.model_loaded = False
+        self.batch_size = INFERENCE_BATCH_SIZE
+        self.max_length = MAX_SEQUENCE_LENGTH
+        # Padded tokens per forward pass (default: batch_size full-length rows)
+        self.token_budget = INFERENCE_TOKEN_BUDGET or INFERENCE_BATCH_SIZE * MAX_SEQUENCE_LENGTH
+        self.standin = ML_STANDIN_MODEL
+        self.threads_configured = False
+        
+        # Load/unload bookkeeping (the memory governor unloads idle models)
+        self._lock = threading.RLock()
+        self.in_use = 0
+        self.last_used = time.monotonic()
         
         # Paths to model files
         CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
         self.TOKENIZER_DIR = os.path.join(CURRENT_DIR, "Model", "phoBERT_multi_class_tokenizer")
-        self.WEIGHT_PATH = os.path.join(CURRENT_DIR, "Model", "best_phoBER.pth")
+        self.MODEL_DIR = os.path.join(CURRENT_DIR, "Model")
+        
+        # Each .pth in MODEL_DIR is a version; MODEL_VERSION is served first
+        self.registry = ModelRegistry(
+            self.MODEL_DIR,
+            MODEL_VERSION,
+            loader=self._build_model,
+            warmup=self._warm_up
+        )
         
         print("✅ ML Service initialized (model will load on first request)")
     
+    @property
+    def model_loaded(self) -> bool:
+        return self.registry.active is not None
+    
+    @property
+    def model(self) -> Optional[Any]:
+        """Model of the active version (None until loaded)"""
+        active = self.registry.active
+        return active.model if active is not None else None
+    
     def _load_model(self):
-        """Load model and tokenizer (called on first request)"""
+        """Load model and tokenizer (called on first request, or after an idle unload)"""
         if self.model_loaded:
             return
         
-        print("🔄 Loading ML model (first request)...")
+        with self._lock:
+            if self.model_loaded:
+                return
+            
+            print("🔄 Loading ML model (first request)...")
+            
+            with stage_timer("ml.load_model"):
+                self._load_model_components()
+            
+            self.last_used = time.monotonic()
+            print("✅ Model loaded successfully!")
+    
+    @contextmanager
+    def _acquire(self):
+        """
+        Load the model if needed and hold a version while the caller uses it
+        
+        Yields:
+            (serving ModelVersion, shadow ModelVersion or None)
+        """
+        with self._lock:
+            self._load_model()
+            self.in_use += 1
+        try:
+            with self.registry.acquire() as versions:
+                yield versions
+        finally:
+            with self._lock:
+                self.in_use -= 1
+                self.last_used = time.monotonic()
+    
+    def unload(self, idle_seconds: float = 0.0) -> bool:
+        """
+        Free the model and tokenizer if nothing is using them
+        
+        Args:
+            idle_seconds: Only unload if unused for at least this long
+            
+        Returns:
+            bool: True if the model was unloaded; the next request reloads it
+        """
+        with self._lock:
+            if not self.model_loaded or self.in_use:
+                return False
+            if time.monotonic() - self.last_used < idle_seconds:
+                return False
+            # Never unload in the middle of a hot swap
+            if not self.registry.unload_all():
+                return False
+            
+            self.tokenizer = None
+        
+        print("💤 ML model unloaded")
+        return True
+    
+    def _load_model_components(self):
+        """Load tokenizer + the default model version"""
+        self._load_tokenizer()
+        self.registry.load_default()
+    
+    def _load_tokenizer(self):
+        """Pick the device and load the tokenizer (shared by all versions)"""
+        with self._lock:
+            if self.tokenizer is not None:
+                return
+            
+            # Import heavy dependencies only when needed
+            import torch
+            from transformers import AutoTokenizer
+            
+            self.configure_threads(TORCH_NUM_THREADS, TORCH_INTEROP_THREADS)
+            
+            # Determine device
+            self.device = "cuda" if torch.cuda.is_available() else "cpu"
+            print(f"📍 Using device: {self.device}")
+            
+            # Load tokenizer (the converted fast one when available)
+            print("📦 Loading tokenizer...")
+            if FAST_TOKENIZER_ENABLED:
+                self.tokenizer = self._load_fast_tokenizer()
+            if self.tokenizer is None:
+                self.tokenizer = AutoTokenizer.from_pretrained(self.TOKENIZER_DIR, use_fast=False)
+    
+    def _load_fast_tokenizer(self) -> Optional[Any]:
+        """Converted Rust tokenizer, with its encoding threads sized for this process"""
+        from app.services.fast_tokenizer import load_fast_tokenizer
+        
+        threads = TOKENIZER_THREADS
+        if not threads and WEB_CONCURRENCY > 1:
+            threads = max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY)
+        if threads:
+            # Read once, when `tokenizers` starts its thread pool
+            os.environ.setdefault("RAYON_NUM_THREADS", str(threads))
+        
+        tokenizer = load_fast_tokenizer(self.TOKENIZER_DIR)
+        if tokenizer is not None:
+            print(f"⚡ Fast tokenizer loaded ({os.environ.get('RAYON_NUM_THREADS', 'all')} encoding threads)")
+        return tokenizer
+    
+    def configure_threads(self, intra_op: int = 0, inter_op: int = 0):
+        """
+        Set torch thread counts once per process, before the first forward pass
+        
+        Args:
+            intra_op: Threads per operator (0 = torch default, or the cores
+                split across WEB_CONCURRENCY workers)
+            inter_op: Threads running independent operators (0 = torch default)
+        """
+        if self.threads_configured:
+            return
+        self.threads_configured = True
         
         # Import heavy dependencies only when needed
         import torch
-        from transformers import AutoTokenizer, RobertaForSequenceClassification
         
-        # Determine device
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        print(f"📍 Using device: {self.device}")
+        if not intra_op and WEB_CONCURRENCY > 1:
+            # Several workers on one box: split the cores instead of oversubscribing
+            intra_op = max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY)
+        if intra_op:
+            torch.set_num_threads(intra_op)
+        if inter_op:
+            try:
+                torch.set_num_interop_threads(inter_op)
+            except RuntimeError as e:
+                # Only allowed before any inter-op parallel work has started
+                print(f"⚠️ Could not set inter-op threads: {e}")
         
-        # Load tokenizer
-        print("📦 Loading tokenizer...")
-        self.tokenizer = AutoTokenizer.from_pretrained(self.TOKENIZER_DIR, use_fast=False)
+        tuned_for = RUNTIME_PROFILE.get("web_concurrency")
+        if tuned_for and tuned_for != WEB_CONCURRENCY:
+            print(f"⚠️ Runtime profile was tuned for WEB_CONCURRENCY={tuned_for}, running with {WEB_CONCURRENCY}")
+        print(f"🧵 Torch threads: intra-op={torch.get_num_threads()}, inter-op={torch.get_num_interop_threads()}")
+    
+    def _build_model(self, weight_path: str):
+        """Build the model for one weight file and move it to the device (registry loader)"""
+        # Import heavy dependencies only when needed
+        import torch
+        from transformers import RobertaForSequenceClassification
         
-        # Load model architecture
-        print("🧠 Loading PhoBERT model...")
-        self.model = RobertaForSequenceClassification.from_pretrained(
-            "vinai/phobert-base",
-            num_labels=5,
-            problem_type="single_label_classification"
-        )
+        self._load_tokenizer()
+        
+        if self.standin:
+            print("🧪 Building tiny stand-in model (ML_STANDIN_MODEL)...")
+            # Seeded per weight file so stand-in versions disagree like real ones would
+            model = self._build_standin_model(seed=zlib.crc32(os.path.basename(weight_path).encode()))
+        else:
+            # Load model architecture
+            print("🧠 Loading PhoBERT model...")
+            model = RobertaForSequenceClassification.from_pretrained(
+                "vinai/phobert-base",
+                num_labels=5,
+                problem_type="single_label_classification"
+            )
+            
+            # Load fine-tuned weights
+            print(f"⚙️ Loading trained weights ({os.path.basename(weight_path)})...")
+            state_dict = torch.load(weight_path, map_location=self.device, weights_only=False)
+            model.load_state_dict(state_dict)
         
-        # Load fine-tuned weights
-        print("⚙️ Loading trained weights...")
-        state_dict = torch.load(self.WEIGHT_PATH, map_location=self.device, weights_only=False)
-        self.model.load_state_dict(state_dict)
+        # Calibrated early-exit heads for this weight file, if any
+        from app.services.early_exit import load_exit_heads
+        model.exit_heads = load_exit_heads(weight_path)
         
         # Set to evaluation mode and move to device
-        self.model.eval()
-        self.model.to(self.device)
+        model.eval()
+        model.to(self.device)
+        return model
+    
+    def _warm_up(self, version: ModelVersion):
+        """Run a few predictions on a new version before it takes traffic"""
+        processed = [self.preprocess(text) for text in WARMUP_TEXTS]
+        for _ in range(2):
+            self._infer(processed, version, record=False)
+            
+    def _build_standin_model(self, seed: int = 0):
+        """
+        Tiny randomly initialised Roberta sharing PhoBERT's vocabulary
+        
+        Needs no network and no weight files, so benchmarks and load tests
+        can exercise the real tokenizer/model code paths at a fraction of
+        the cost. Seeded, so runs are reproducible.
+        """
+        import torch
+        from transformers import RobertaConfig, RobertaForSequenceClassification
         
-        self.model_loaded = True
-        print("✅ Model loaded successfully!")
+        config = RobertaConfig(
+            vocab_size=len(self.tokenizer),
+            hidden_size=64,
+            num_hidden_layers=2,
+            num_attention_heads=2,
+            intermediate_size=128,
+            max_position_embeddings=self.max_length + 2,  # + Roberta's padding offset
+            num_labels=5,
+            pad_token_id=self.tokenizer.pad_token_id,
+            bos_token_id=self.tokenizer.bos_token_id,
+            eos_token_id=self.tokenizer.eos_token_id,
+            problem_type="single_label_classification"
+        )
+        torch.manual_seed(seed)
+        return RobertaForSequenceClassification(config)
             
     def predict_single(self, text: str) -> Dict[str, Any]:
         """
@@ -82,67 +315,262 @@ class MLPredictionService:
                 'confidence': float (0-1)
             }
         """
-        # Lazy load model on first request
-        self._load_model()
+        # 0. Lexical fast path (skips underthesea and PhoBERT when confident)
+        answered, pending, audits = self._route_cascade([text])
+        if answered:
+            rating, confidence = answered[0]
+            return {
+                'rating': rating,
+                'confidence': confidence
+            }
         
-        # Import torch here (already loaded in _load_model)
-        import torch
-        import torch.nn.functional as F
-
-        # 1. Vietnamese preprocessing
-        processed_text = self.preprocess(text)
+        # Lazy load model on first request
+        with self._acquire() as (version, shadow):
+            # 1. Vietnamese preprocessing
+            with stage_timer("ml.preprocess"):
+                processed_text = self.preprocess(text)
 
-        # 2. Tokenize
-        encoded = self.tokenizer(
-            processed_text,
-            padding=True,
-            truncation=True,
-            max_length=256,
-            return_tensors="pt"
-        )
+            # 2-4. Tokenize, inference, prediction + confidence
+            rating, confidence = self._infer([processed_text], version)[0]
+            
+            if shadow is not None:
+                self._score_shadow(shadow, [processed_text], [rating])
         
-        # Move tensors to device (CPU or CUDA)
-        encoded = {k: v.to(self.device) for k, v in encoded.items()}
-
-        # 3. Inference
-        with torch.no_grad():
-            outputs = self.model(**encoded)
-            logits = outputs.logits
-            probs = F.softmax(logits, dim=1)
-
-        # 4. Get prediction + confidence
-        predicted_class = torch.argmax(probs, dim=1).item()
-        confidence = probs[0][predicted_class].item()
-
-        # 5. Convert 0-based label → rating 1-5
-        rating = predicted_class + 1
+        if audits:
+            self._record_cascade_audits(audits, {0: rating})
 
         return {
             'rating': rating,
             'confidence': confidence
         }
     
-    def predict_batch(self, texts: List[str]) -> List[Dict[str, any]]:
+    def predict_batch(self, texts: List[str]) -> "PredictionBatch":
         """
         Predict ratings for multiple comments
         
+        Texts are scored in padded batches of `batch_size` (one forward
+        pass per batch instead of one per comment). Comments the lexical
+        cascade tier is confident about never reach PhoBERT.
+        
         Args:
             texts: List of Vietnamese product comments
             
         Returns:
-            list: List of prediction dictionaries
+            PredictionBatch: `texts` with a rating and confidence per comment
+        """
+        # Import heavy dependencies only when needed (numpy)
+        import numpy as np
+        from app.services.prediction_batch import PredictionBatch
+        
+        answered, pending, audits = self._route_cascade(texts)
+        if not answered:
+            return self._predict_batch_phobert(texts)
+        
+        ratings = np.empty(len(texts), dtype=np.uint8)
+        confidences = np.empty(len(texts), dtype=np.float32)
+        for index, (rating, confidence) in answered.items():
+            ratings[index] = rating
+            confidences[index] = confidence
+        if pending:
+            scored = self._predict_batch_phobert([texts[index] for index in pending])
+            ratings[pending] = scored.ratings
+            confidences[pending] = scored.confidences
+            if audits:
+                self._record_cascade_audits(audits, dict(zip(pending, scored.ratings.tolist())))
+        return PredictionBatch(texts, ratings, confidences)
+    
+    def _route_cascade(self, texts: List[str]):
+        """Answer confident comments with the lexical tier (see cascade_service.Cascade.route)"""
+        # Import heavy dependencies only when needed (numpy)
+        from app.services.cascade_service import cascade
+        
+        with stage_timer("ml.cascade"):
+            return cascade.route(texts)
+    
+    def _record_cascade_audits(self, audits: Dict[int, int], phobert_ratings: Dict[int, int]):
+        from app.services.cascade_service import cascade
+        
+        indices = list(audits)
+        cascade.record_audit([audits[i] for i in indices], [phobert_ratings[i] for i in indices])
+    
+    def _predict_batch_phobert(self, texts: List[str]) -> "PredictionBatch":
+        """PhoBERT path of predict_batch (no cascade)"""
+        from app.services.prediction_batch import PredictionBatch
+        
+        # Lazy load model on first request
+        with self._acquire() as (version, shadow):
+            with stage_timer("ml.preprocess"):
+                processed = [self.preprocess(text) for text in texts]
+            
+            # Forward passes are formed by token budget inside _infer
+            ratings, confidences = self._infer_arrays(processed, version)
+            
+            if shadow is not None:
+                self._score_shadow(shadow, processed, ratings.tolist())
+        
+        return PredictionBatch(texts, ratings, confidences)
+    
+    def _score_shadow(self, shadow: ModelVersion, processed_texts: List[str], ratings: List[int]):
+        """Queue the candidate version on the same inputs (off the request path)"""
+        def job():
+            return [rating for rating, _ in self._infer(processed_texts, shadow)]
+        
+        self.registry.submit_shadow(shadow, job, ratings)
+    
+    def _windows(self, token_ids: List[int]) -> List[List[int]]:
+        """
+        Split one text's tokens into model-sized windows (special tokens added)
+        
+        Texts longer than one window get evenly spaced windows from start
+        to end, overlapping by at least WINDOW_OVERLAP tokens (up to
+        MAX_WINDOWS_PER_TEXT windows; beyond that the overlap shrinks and
+        very long texts are sampled rather than fully covered).
+        """
+        size = self.max_length - 2  # room for <s> and </s>
+        if len(token_ids) <= size:
+            starts = [0]
+        else:
+            step = max(1, size - WINDOW_OVERLAP)
+            last = len(token_ids) - size
+            count = min(max(2, MAX_WINDOWS_PER_TEXT), math.ceil(last / step) + 1)
+            starts = [round(i * last / (count - 1)) for i in range(count)]
+        bos, eos = self.tokenizer.bos_token_id, self.tokenizer.eos_token_id
+        return [[bos] + token_ids[start:start + size] + [eos] for start in starts]
+    
+    def _token_batches(self, lengths: List[int]) -> List[List[int]]:
+        """
+        Group sequence indices so each padded batch stays within the token budget
+        
+        Longest first, so every batch pads to its own first sequence; a new
+        batch also starts when a sequence is under half the batch width, so
+        no row is more than half padding.
+        """
+        batches, current, current_width = [], [], 0
+        for index in sorted(range(len(lengths)), key=lambda i: -lengths[i]):
+            width = current_width or lengths[index]
+            if current and ((len(current) + 1) * width > self.token_budget or lengths[index] * 2 < width):
+                batches.append(current)
+                current, width = [], lengths[index]
+            current.append(index)
+            current_width = width
+        if current:
+            batches.append(current)
+        return batches
+    
+    def _pad(self, sequences: List[List[int]]):
+        """(input_ids, attention_mask) tensors padded to the longest sequence"""
+        import torch
+        
+        width = max(len(sequence) for sequence in sequences)
+        input_ids = torch.full((len(sequences), width), self.tokenizer.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(sequences), width), dtype=torch.long)
+        for row, sequence in enumerate(sequences):
+            input_ids[row, :len(sequence)] = torch.tensor(sequence)
+            attention_mask[row, :len(sequence)] = 1
+        return input_ids, attention_mask
+    
+    def _forward(self, model, input_ids, attention_mask):
+        """Logits for one padded batch; confident rows exit early when heads are calibrated"""
+        heads = getattr(model, "exit_heads", None)
+        if heads is None:
+            return model(input_ids=input_ids, attention_mask=attention_mask).logits
+        
+        from app.services.early_exit import early_exit_forward, record_exits
+        logits, exit_layers = early_exit_forward(model, heads, input_ids, attention_mask)
+        record_exits(exit_layers, model.config.num_hidden_layers)
+        return logits
+    
+    def _infer(
+        self,
+        processed_texts: List[str],
+        version: Optional[ModelVersion] = None,
+        record: bool = True
+    ) -> List[Tuple[int, float]]:
+        """[(rating 1-5, confidence 0-1), ...] in input order (see _infer_arrays)"""
+        ratings, confidences = self._infer_arrays(processed_texts, version, record)
+        return list(zip(ratings.tolist(), confidences.tolist()))
+    
+    def _infer_arrays(
+        self,
+        processed_texts: List[str],
+        version: Optional[ModelVersion] = None,
+        record: bool = True
+    ):
+        """
+        Score already-preprocessed texts with token-budget batching
+        
+        Long texts are split into overlapping windows that share the same
+        padded forward passes as everything else; a text's window logits
+        are averaged (weighted by window length) into one prediction.
+        
+        Args:
+            processed_texts: Output of preprocess()
+            version: Model version to run (default: the active one)
+            record: Count towards per-version latency stats (off for warm-up)
+        
+        Returns:
+            tuple: (uint8 ratings 1-5, float32 confidences 0-1) arrays in input order
         """
-        # DUMMY BATCH PREDICTION
-        results = []
-        for text in texts:
-            prediction = self.predict_single(text)
-            results.append({
-                'text': text,
-                'rating': prediction['rating'],
-                'confidence': prediction['confidence']
-            })
+        # Import torch here (already loaded in _load_model)
+        import numpy as np
+        import torch
+        import torch.nn.functional as F
+        
+        if not processed_texts:
+            return np.empty(0, dtype=np.uint8), np.empty(0, dtype=np.float32)
+        version = version or self.registry.active
         
-        return results
+        # Tokenize without truncation, then cut into windows
+        with stage_timer("ml.tokenize"):
+            token_ids = self.tokenizer(
+                processed_texts,
+                add_special_tokens=False,
+                truncation=False,
+                verbose=False
+            )["input_ids"]
+            sequences, owners = [], []
+            for text_index, ids in enumerate(token_ids):
+                for window in self._windows(ids):
+                    sequences.append(window)
+                    owners.append(text_index)
+        
+        lengths = [len(sequence) for sequence in sequences]
+        logits = [None] * len(sequences)
+        for batch in self._token_batches(lengths):
+            input_ids, attention_mask = self._pad([sequences[index] for index in batch])
+            real_tokens = int(attention_mask.sum())
+            TOKENS_TOTAL.inc(real_tokens, kind="real")
+            TOKENS_TOTAL.inc(input_ids.numel() - real_tokens, kind="padding")
+            
+            # Inference
+            start = time.perf_counter()
+            with stage_timer("ml.forward", version=version.name, rows=len(batch), tokens=input_ids.numel()), \
+                    torch.no_grad():
+                batch_logits = self._forward(version.model, input_ids.to(self.device), attention_mask.to(self.device))
+            batch_logits = batch_logits.float().cpu()
+            for row, index in enumerate(batch):
+                logits[index] = batch_logits[row]
+            
+            if record:
+                elapsed = time.perf_counter() - start
+                version.stats.record(elapsed, len(batch))
+                VERSION_SECONDS.observe(elapsed, version=version.name)
+        
+        if record:
+            PREDICTIONS_TOTAL.inc(len(processed_texts))
+        
+        # Length-weighted mean of window logits per text
+        stacked = torch.stack(logits)
+        weights = torch.tensor(lengths, dtype=stacked.dtype).unsqueeze(1)
+        owner_index = torch.tensor(owners)
+        summed = torch.zeros((len(processed_texts), stacked.shape[1]), dtype=stacked.dtype)
+        summed.index_add_(0, owner_index, stacked * weights)
+        totals = torch.zeros(len(processed_texts), dtype=stacked.dtype).index_add_(0, owner_index, weights.squeeze(1))
+        probs = F.softmax(summed / totals.unsqueeze(1), dim=1)
+        
+        # Prediction + confidence, 0-based label → rating 1-5
+        confidences, predicted_classes = probs.max(dim=1)
+        return (predicted_classes + 1).to(torch.uint8).numpy(), confidences.to(torch.float32).numpy()
     
     def preprocess(self, text: str) -> str:
         """
@@ -169,6 +597,12 @@ class MLPredictionService:
 # Singleton instance
 ml_service = MLPredictionService()
 
+metrics.callback(
+    "ml_model_loaded",
+    "1 if the model is resident in memory",
+    lambda: [({}, 1 if ml_service.model_loaded else 0)]
+)
+
 
 def get_ml_service() -> MLPredictionService:
     """Dependency to get ML service"""
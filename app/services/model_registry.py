@@ -0,0 +1,355 @@
+"""
+Model Registry
+Versioned weight files with background loading and zero-downtime hot swap
+
+Every `*.pth` file in the model directory is a version (named after the
+file stem). Exactly one version is active. A new version is loaded and
+warmed in a background thread, then swapped in atomically. Requests hold a
+reference to the version they started on, so the old version keeps
+serving in-flight work and is only freed once its reference count drains.
+
+An optional candidate version can run next to the active one:
+
+- shadow: the active version answers, the candidate scores the same
+  comments in the background and agreement is recorded
+- split:  `percent` of requests are answered by the candidate
+"""
+import gc
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from app.services.metrics_service import metrics
+
+MODE_SHADOW = "shadow"
+MODE_SPLIT = "split"
+
+# Shadow work is best-effort: beyond this many queued jobs it is dropped
+MAX_PENDING_SHADOW_JOBS = 8
+
+VERSION_SECONDS = metrics.histogram(
+    "ml_version_inference_seconds",
+    "Forward-pass latency per model version",
+    ["version"]
+)
+
+SHADOW_COMPARISONS = metrics.counter(
+    "ml_shadow_comparisons_total",
+    "Comments scored by both the active and the candidate version",
+    ["result"]
+)
+
+
+class VersionStats:
+    """Latency and traffic counters for one loaded version"""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._latencies_ms: deque = deque(maxlen=window)
+        self.calls = 0
+        self.comments = 0
+
+    def record(self, seconds: float, comments: int):
+        with self._lock:
+            self.calls += 1
+            self.comments += comments
+            self._latencies_ms.append(seconds * 1000)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies_ms)
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 2)
+        return {
+            "calls": self.calls,
+            "comments": self.comments,
+            "latency_ms_p50": percentile(0.50),
+            "latency_ms_p95": percentile(0.95)
+        }
+
+
+class ModelVersion:
+    """A loaded set of weights plus the requests currently using it"""
+
+    def __init__(self, name: str, path: str, model: Any):
+        self.name = name
+        self.path = path
+        self.model = model
+        self.loaded_at = time.time()
+        self.refs = 0
+        self.stats = VersionStats()
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.name,
+            "loaded_at": self.loaded_at,
+            "in_flight": self.refs,
+            **self.stats.summary()
+        }
+
+
+class ModelRegistry:
+    """
+    Tracks available weight files and the active/candidate versions
+
+    Args:
+        model_dir: Directory scanned for `*.pth` weight files
+        default_version: Version loaded on first use
+        loader: Builds a ready-to-serve model for a weight path
+        warmup: Runs a few predictions on a freshly loaded ModelVersion
+    """
+
+    def __init__(
+        self,
+        model_dir: str,
+        default_version: str,
+        loader: Callable[[str], Any],
+        warmup: Callable[[ModelVersion], None]
+    ):
+        self.model_dir = model_dir
+        self.default_version = default_version
+        self._loader = loader
+        self._warmup = warmup
+        self._lock = threading.Lock()
+
+        self.active: Optional[ModelVersion] = None
+        self.candidate: Optional[ModelVersion] = None
+        self.mode: Optional[str] = None
+        self.split_percent = 0.0
+        self._draining: List[ModelVersion] = []
+
+        # Last background operation (load / activate / candidate)
+        self.operation: Optional[Dict[str, Any]] = None
+        self._busy = False
+
+        self._shadow_pool: Optional[ThreadPoolExecutor] = None
+        self._shadow_pending = 0
+        self.shadow_dropped = 0
+        self.agreements = 0
+        self.comparisons = 0
+
+    # ---------- discovery ----------
+    def available(self) -> Dict[str, str]:
+        """Version name -> weight file path"""
+        try:
+            names = sorted(f for f in os.listdir(self.model_dir) if f.endswith(".pth"))
+        except OSError:
+            return {}
+        return {os.path.splitext(f)[0]: os.path.join(self.model_dir, f) for f in names}
+
+    def _path_for(self, version: str) -> str:
+        path = self.available().get(version)
+        if path is None:
+            raise ValueError(f"Unknown model version '{version}'")
+        return path
+
+    @property
+    def busy(self) -> bool:
+        """True while a load/swap is running or an old version is still draining"""
+        return self._busy or bool(self._draining)
+
+    # ---------- loading ----------
+    def _load(self, version: str) -> ModelVersion:
+        path = self._path_for(version)
+        loaded = ModelVersion(version, path, self._loader(path))
+        self._warmup(loaded)
+        return loaded
+
+    def load_default(self):
+        """Load the default version synchronously (first request / after unload)"""
+        if self.active is not None:
+            return
+        loaded = self._load(self.default_version)
+        with self._lock:
+            # A background activate may have won the race
+            if self.active is None:
+                self.active = loaded
+
+    def unload_all(self) -> bool:
+        """Drop every version (memory governor idle unload); False if busy"""
+        with self._lock:
+            if self.busy or (self.active and self.active.refs) or (self.candidate and self.candidate.refs):
+                return False
+            self.active = None
+            self.candidate = None
+            self.mode = None
+        return True
+
+    def _run_operation(self, action: str, version: str, work: Callable[[], None]):
+        """Run `work` in a background thread, recording its progress in self.operation"""
+        with self._lock:
+            if self._busy:
+                raise RuntimeError("Another model operation is in progress")
+            self._busy = True
+            self.operation = {"action": action, "version": version, "status": "loading",
+                              "started_at": time.time(), "finished_at": None, "error": None}
+
+        def run():
+            try:
+                work()
+                self.operation["status"] = "done"
+            except Exception as e:
+                self.operation["status"] = "failed"
+                self.operation["error"] = str(e)
+                print(f"❌ Model {action} ({version}) failed: {e}")
+            finally:
+                self.operation["finished_at"] = time.time()
+                self._busy = False
+
+        threading.Thread(target=run, name=f"model-{action}", daemon=True).start()
+
+    def activate(self, version: str):
+        """
+        Load + warm `version` in the background, then make it the active version
+
+        If `version` is the current candidate it is promoted without reloading.
+        """
+        self._path_for(version)
+
+        def work():
+            with self._lock:
+                promoted = self.candidate if self.candidate and self.candidate.name == version else None
+            new = promoted or self._load(version)
+            with self._lock:
+                old, self.active = self.active, new
+                if promoted is not None:
+                    self.candidate = None
+                    self.mode = None
+            print(f"🔀 Active model version: {version}")
+            if old is not None and old is not new:
+                self._retire(old)
+
+        self._run_operation("activate", version, work)
+
+    def set_candidate(self, version: str, mode: str, percent: float = 0.0):
+        """Load + warm `version` in the background and start shadowing/splitting traffic to it"""
+        if mode not in (MODE_SHADOW, MODE_SPLIT):
+            raise ValueError(f"Unknown mode '{mode}'")
+        self._path_for(version)
+
+        def work():
+            with self._lock:
+                reuse = self.candidate if self.candidate and self.candidate.name == version else None
+            new = reuse or self._load(version)
+            with self._lock:
+                old, self.candidate = self.candidate, new
+                self.mode = mode
+                self.split_percent = percent if mode == MODE_SPLIT else 0.0
+                self.agreements = self.comparisons = 0
+            print(f"🧪 Candidate model version: {version} ({mode})")
+            if old is not None and old is not new:
+                self._retire(old)
+
+        self._run_operation("candidate", version, work)
+
+    def clear_candidate(self) -> bool:
+        with self._lock:
+            old, self.candidate, self.mode = self.candidate, None, None
+        if old is None:
+            return False
+        threading.Thread(target=self._retire, args=(old,), name="model-drain", daemon=True).start()
+        return True
+
+    def _retire(self, version: ModelVersion):
+        """Wait for in-flight requests on `version` to finish, then free it"""
+        with self._lock:
+            self._draining.append(version)
+        while version.refs > 0:
+            time.sleep(0.05)
+        version.model = None
+        with self._lock:
+            self._draining.remove(version)
+        gc.collect()
+        print(f"🗑️ Model version {version.name} drained and freed")
+
+    # ---------- request routing ----------
+    @contextmanager
+    def acquire(self):
+        """
+        Pick the version that serves this request (and an optional shadow)
+
+        Both are reference-counted until the block exits, so a concurrent
+        swap cannot free them mid-request.
+        """
+        with self._lock:
+            serving, shadow = self.active, None
+            if self.candidate is not None:
+                if self.mode == MODE_SPLIT and random.random() * 100 < self.split_percent:
+                    serving = self.candidate
+                elif self.mode == MODE_SHADOW:
+                    shadow = self.candidate
+            serving.refs += 1
+            if shadow is not None:
+                shadow.refs += 1
+        try:
+            yield serving, shadow
+        finally:
+            with self._lock:
+                serving.refs -= 1
+                if shadow is not None:
+                    shadow.refs -= 1
+
+    def submit_shadow(self, shadow: ModelVersion, job: Callable[[], Sequence[int]], primary: Sequence[int]):
+        """
+        Score the same comments on the shadow version off the request path
+
+        `job` returns the shadow ratings; they are compared with `primary`.
+        The shadow reference is held until the job finishes.
+        """
+        with self._lock:
+            if self._shadow_pending >= MAX_PENDING_SHADOW_JOBS:
+                self.shadow_dropped += 1
+                return
+            self._shadow_pending += 1
+            shadow.refs += 1
+            if self._shadow_pool is None:
+                self._shadow_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-shadow")
+
+        def run():
+            try:
+                self.record_agreement(primary, job())
+            except Exception as e:
+                print(f"⚠️ Shadow prediction failed: {e}")
+            finally:
+                with self._lock:
+                    self._shadow_pending -= 1
+                    shadow.refs -= 1
+
+        self._shadow_pool.submit(run)
+
+    def record_agreement(self, primary: Sequence[int], shadow: Sequence[int]):
+        agree = sum(1 for a, b in zip(primary, shadow) if a == b)
+        total = min(len(primary), len(shadow))
+        with self._lock:
+            self.agreements += agree
+            self.comparisons += total
+        SHADOW_COMPARISONS.inc(agree, result="agree")
+        SHADOW_COMPARISONS.inc(total - agree, result="disagree")
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            active, candidate = self.active, self.candidate
+            draining = [v.name for v in self._draining]
+        return {
+            "available": list(self.available()),
+            "default_version": self.default_version,
+            "active": active.describe() if active else None,
+            "candidate": candidate.describe() if candidate else None,
+            "mode": self.mode,
+            "split_percent": self.split_percent if self.mode == MODE_SPLIT else None,
+            "agreement": {
+                "comparisons": self.comparisons,
+                "agreements": self.agreements,
+                "rate": round(self.agreements / self.comparisons, 4) if self.comparisons else None,
+                "shadow_dropped": self.shadow_dropped
+            },
+            "draining": draining,
+            "operation": self.operation
+        }
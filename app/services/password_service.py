@@ -0,0 +1,121 @@
+"""
+Password Service
+Argon2 hashing/verification on a dedicated, bounded thread pool
+
+Argon2 is deliberately slow and memory hungry. Running it inline in an
+`async def` route blocks the event loop (and every prediction on the same
+worker), so login/register hand the work to a small executor instead.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from app.config import (
+    ARGON2_TIME_COST,
+    ARGON2_MEMORY_COST,
+    ARGON2_PARALLELISM,
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_MAX_PENDING
+)
+from app.services.metrics_service import metrics
+
+
+def _build_crypt_context() -> CryptContext:
+    """
+    Build the argon2 CryptContext
+
+    Cost parameters left unset keep passlib's defaults. When they change,
+    existing hashes are flagged by `needs_update` and rehashed on next login.
+    """
+    settings = {}
+    if ARGON2_TIME_COST is not None:
+        settings['argon2__time_cost'] = ARGON2_TIME_COST
+    if ARGON2_MEMORY_COST is not None:
+        settings['argon2__memory_cost'] = ARGON2_MEMORY_COST
+    if ARGON2_PARALLELISM is not None:
+        settings['argon2__parallelism'] = ARGON2_PARALLELISM
+    return CryptContext(schemes=["argon2"], deprecated="auto", **settings)
+
+
+# Password hashing (using argon2 instead of bcrypt for Python 3.13 compatibility)
+pwd_context = _build_crypt_context()
+
+
+class PasswordHasher:
+    """
+    Bounded executor for password work
+
+    At most `max_workers` hashes run at once; at most `max_pending` calls
+    may be queued or running. Beyond that, callers get 503 + Retry-After
+    instead of piling up behind a login storm.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pwhash")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, func: Callable, *args) -> Any:
+        """Run a hashing/verification callable on the password executor"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Authentication service busy, please retry",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+
+        succeeded = False
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.executor, partial(func, *args))
+            succeeded = True
+            return result
+        finally:
+            with self._lock:
+                self._pending -= 1
+                # Calls that raised are not counted as completed
+                if succeeded:
+                    self.completed += 1
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'workers': self.max_workers,
+            'max_pending': self.max_pending,
+            'pending': self._pending,
+            'completed': self.completed,
+            'rejected': self.rejected,
+        }
+
+
+# Singleton instance
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
+
+metrics.callback(
+    "password_hash_queue_depth",
+    "Password hash/verify calls queued or running",
+    lambda: [({}, password_hasher.pending)]
+)
+metrics.callback(
+    "password_hash_rejected_total",
+    "Password calls rejected because the queue was full",
+    lambda: [({}, password_hasher.rejected)],
+    type_name="counter"
+)
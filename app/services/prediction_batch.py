@@ -0,0 +1,124 @@
+"""
+Prediction Batch
+Column-oriented results of one batch: comments, ratings and confidences
+
+A batch holds the caller's comment list as is, plus a uint8 rating array and
+a float32 confidence array, so a row costs 5 bytes plus a list slot instead
+of a dict, a float object and a second copy in a results list. It is
+handed from MLPredictionService through history, events, the job store,
+distribution / summary statistics and the PDF report, and each of them
+reads the columns directly.
+
+It is still a sequence of `{'text', 'rating', 'confidence'}` dicts (built
+on access), so code that indexes or iterates predictions keeps working.
+"""
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+RATINGS = range(1, 6)
+
+
+def rating_distribution(ratings: "np.ndarray") -> Dict[int, int]:
+    """{rating: count} for every rating 1-5"""
+    # Import heavy dependencies only when needed (numpy)
+    import numpy as np
+
+    counts = np.bincount(np.asarray(ratings, dtype=np.intp), minlength=6)
+    return {rating: int(counts[rating]) for rating in RATINGS}
+
+
+class PredictionBatch:
+    """
+    Ratings and confidences of `texts[i]` at index i
+
+    Args:
+        texts: Comments (kept by reference, not copied)
+        ratings: Ratings 1-5 (stored as uint8)
+        confidences: Confidences 0-1 (stored as float32)
+    """
+
+    __slots__ = ("texts", "ratings", "confidences")
+
+    def __init__(self, texts: Sequence[str], ratings: Sequence[int], confidences: Sequence[float]):
+        import numpy as np
+
+        self.texts = texts
+        self.ratings = np.asarray(ratings, dtype=np.uint8)
+        self.confidences = np.asarray(confidences, dtype=np.float32)
+        if not (len(texts) == len(self.ratings) == len(self.confidences)):
+            raise ValueError("texts, ratings and confidences must have the same length")
+
+    @classmethod
+    def empty(cls) -> "PredictionBatch":
+        return cls([], (), ())
+
+    @classmethod
+    def from_dicts(cls, predictions: Sequence[Dict[str, Any]]) -> "PredictionBatch":
+        """From prediction dicts ('text', 'rating', 'confidence'), e.g. a client's JSON"""
+        return cls(
+            [str(pred.get('text', '')) for pred in predictions],
+            [int(pred.get('rating', 0)) for pred in predictions],
+            [float(pred.get('confidence', 0)) for pred in predictions]
+        )
+
+    @classmethod
+    def concat(cls, batches: Sequence["PredictionBatch"], texts: Optional[Sequence[str]] = None) -> "PredictionBatch":
+        """
+        One batch from consecutive chunks (e.g. admission.run_chunked)
+
+        Pass the list the chunks were cut from as `texts` to keep sharing it
+        instead of building a new one.
+        """
+        import numpy as np
+
+        if len(batches) == 1 and texts is None:
+            return batches[0]
+        if not batches:
+            return cls.empty()
+        if texts is None:
+            texts = [text for batch in batches for text in batch.texts]
+        return cls(
+            texts,
+            np.concatenate([batch.ratings for batch in batches]),
+            np.concatenate([batch.confidences for batch in batches])
+        )
+
+    def __len__(self) -> int:
+        return len(self.ratings)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Dict[str, Any], "PredictionBatch"]:
+        if isinstance(index, slice):
+            return PredictionBatch(self.texts[index], self.ratings[index], self.confidences[index])
+        return {
+            'text': self.texts[index],
+            'rating': int(self.ratings[index]),
+            'confidence': float(self.confidences[index])
+        }
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for text, rating, confidence in zip(self.texts, self.ratings.tolist(), self.confidences.tolist()):
+            yield {'text': text, 'rating': rating, 'confidence': confidence}
+
+    def columns(self, decimals: Optional[int] = None) -> Tuple[Sequence[str], List[int], List[float]]:
+        """(texts, ratings, confidences) as plain lists, confidences optionally rounded"""
+        confidences = self.confidences
+        if decimals is not None:
+            confidences = confidences.astype("float64").round(decimals)
+        return self.texts, self.ratings.tolist(), confidences.tolist()
+
+    def distribution(self) -> Dict[int, int]:
+        return rating_distribution(self.ratings)
+
+    def average_confidence(self) -> float:
+        if not len(self):
+            return 0.0
+        return float(self.confidences.mean(dtype="float64"))
+
+    def __repr__(self):
+        return f"<PredictionBatch {len(self)} rows>"
+
+
+def as_batch(predictions: Union[PredictionBatch, Sequence[Dict[str, Any]]]) -> PredictionBatch:
+    """Accept a PredictionBatch or a list of prediction dicts"""
+    if isinstance(predictions, PredictionBatch):
+        return predictions
+    return PredictionBatch.from_dicts(predictions)
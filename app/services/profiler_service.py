@@ -0,0 +1,247 @@
+"""
+Profiler Service
+On-demand sampling profiler and allocation diff for a running worker
+
+Nothing is installed until an admin starts a session: no trace or profile
+hooks, no sampling thread, no tracemalloc. A session then runs in one of
+two modes:
+
+- cpu:    a daemon thread reads every thread's Python stack via
+          sys._current_frames() each `interval_ms`. That covers the event
+          loop, the inference executor, the threadpool and background
+          threads. Counts come back as collapsed stacks
+          ("thread;outer;...;inner count"), the input of flamegraph.pl,
+          speedscope and inferno.
+- memory: tracemalloc runs for the session and the allocations that grew
+          between its first and last snapshot are reported with their
+          tracebacks, optionally only those passing through given files.
+
+One session runs at a time per process. With several workers only the
+worker that received the request is profiled (its pid is reported).
+Native frames (torch kernels, intra-op threads) are not visible; their
+time is attributed to the Python frame that called them.
+"""
+import asyncio
+import os
+import sys
+import sysconfig
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from app.config import BASE_DIR, PROFILER_TRACEMALLOC_FRAMES
+
+# Deeper stacks are cut at the root end
+MAX_STACK_DEPTH = 128
+
+# Innermost frames of a thread that is waiting, not working
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),  # ThreadPoolExecutor worker blocked on its queue
+}
+
+_PATH_PREFIXES = sorted(
+    {str(BASE_DIR) + os.sep}
+    | {path + os.sep for path in (sysconfig.get_paths().get(key) for key in ("purelib", "platlib", "stdlib")) if path},
+    key=len,
+    reverse=True
+)
+
+
+def _short_path(filename: str) -> str:
+    """Path relative to the project, site-packages or the stdlib"""
+    for prefix in _PATH_PREFIXES:
+        if filename.startswith(prefix):
+            return filename[len(prefix):]
+    return filename
+
+
+class SamplingProfiler:
+    """
+    Counts the Python stacks of all other threads every `interval` seconds
+
+    Args:
+        interval: Seconds between samples
+        include_idle: Also count threads whose innermost frame is a wait
+    """
+
+    def __init__(self, interval: float, include_idle: bool = False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        self.elapsed = 0.0
+        self._labels: Dict[Any, str] = {}
+        self._thread_names: Dict[int, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        started = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self._record(thread_id, frame)
+            self.samples += 1
+        self.elapsed = time.perf_counter() - started
+
+    def _record(self, thread_id: int, frame):
+        if not self.include_idle:
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES:
+                self.idle_samples += 1
+                return
+        labels = []
+        while frame is not None and len(labels) < MAX_STACK_DEPTH:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        labels.append(self._thread_name(thread_id))
+        self.stacks[tuple(reversed(labels))] += 1
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            name = getattr(code, "co_qualname", code.co_name)
+            # ';' separates frames in the collapsed format
+            label = f"{name} ({_short_path(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+            self._labels[code] = label
+        return label
+
+    def _thread_name(self, thread_id: int) -> str:
+        name = self._thread_names.get(thread_id)
+        if name is None:
+            self._thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            name = self._thread_names.get(thread_id, f"thread-{thread_id}")
+        return name.replace(";", ",").replace(" ", "_")
+
+    def collapsed(self) -> str:
+        """One `frame;frame;... count` line per distinct stack, most frequent first"""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self, top: int = 30) -> Dict[str, Any]:
+        """Sample counts per thread, and functions by self and total samples"""
+        threads: Counter = Counter()
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        for stack, count in self.stacks.items():
+            threads[stack[0]] += count
+            self_counts[stack[-1]] += count
+            for label in set(stack[1:]):
+                total_counts[label] += count
+        return {
+            "samples": self.samples,
+            "idle_samples": self.idle_samples,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "distinct_stacks": len(self.stacks),
+            "threads": dict(threads.most_common()),
+            "top_self": [{"function": label, "samples": count} for label, count in self_counts.most_common(top)],
+            "top_total": [{"function": label, "samples": count} for label, count in total_counts.most_common(top)],
+        }
+
+
+def _allocation_diff(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot,
+                     match: Optional[str], top: int) -> List[Dict[str, Any]]:
+    """Largest positive size differences, grouped by allocation traceback"""
+    if match:
+        # Keep allocations with any frame in the matching files
+        file_filter = [tracemalloc.Filter(True, str(BASE_DIR / match), all_frames=True)]
+        before, after = before.filter_traces(file_filter), after.filter_traces(file_filter)
+    growth = [stat for stat in after.compare_to(before, "traceback") if stat.size_diff > 0]
+    return [
+        {
+            "size_diff_kb": round(stat.size_diff / 1024, 1),
+            "count_diff": stat.count_diff,
+            "size_kb": round(stat.size / 1024, 1),
+            # Most recent call first
+            "traceback": [
+                f"{_short_path(frame.filename)}:{frame.lineno}"
+                for frame in reversed(stat.traceback)
+            ],
+        }
+        for stat in growth[:top]
+    ]
+
+
+class Profiler:
+    """Runs at most one profiling session at a time in this process"""
+
+    def __init__(self):
+        self._session = threading.Lock()
+        self.active: Optional[str] = None
+
+    def _begin(self, mode: str):
+        if not self._session.acquire(blocking=False):
+            raise RuntimeError(f"A {self.active} profiling session is already running")
+        self.active = mode
+
+    def _end(self):
+        self.active = None
+        self._session.release()
+
+    async def cpu(self, seconds: float, interval_ms: float, include_idle: bool = False) -> SamplingProfiler:
+        """Sample all threads for `seconds` (the event loop keeps serving meanwhile)"""
+        self._begin("cpu")
+        sampler = SamplingProfiler(interval_ms / 1000, include_idle)
+        try:
+            sampler.start()
+            await asyncio.sleep(seconds)
+        finally:
+            sampler.stop()
+            self._end()
+        return sampler
+
+    async def memory(self, seconds: float, top: int = 30, match: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Allocation growth over `seconds`
+
+        Args:
+            seconds: Session length
+            top: Number of tracebacks to return
+            match: Only allocations passing through these files (glob relative
+                to the project root, e.g. "app/services/ml_service.py")
+        """
+        self._begin("memory")
+        started_here = not tracemalloc.is_tracing()
+        try:
+            if started_here:
+                tracemalloc.start(PROFILER_TRACEMALLOC_FRAMES)
+            before = tracemalloc.take_snapshot()
+            await asyncio.sleep(seconds)
+            after = tracemalloc.take_snapshot()
+            overhead = tracemalloc.get_tracemalloc_memory()
+        finally:
+            if started_here:
+                tracemalloc.stop()
+            self._end()
+
+        # Snapshot comparison is CPU-heavy: keep it off the event loop
+        growth = await asyncio.to_thread(_allocation_diff, before, after, match, top)
+        return {
+            "pid": os.getpid(),
+            "seconds": seconds,
+            "match": match,
+            "traceback_frames": after.traceback_limit,
+            "tracemalloc_overhead_kb": round(overhead / 1024, 1),
+            "total_growth_kb": round(sum(item["size_diff_kb"] for item in growth), 1),
+            "growth": growth,
+        }
+
+
+# Singleton instance
+profiler = Profiler()
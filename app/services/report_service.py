@@ -1,82 +1,202 @@
 """
 Report Service
 Generate PDF reports for batch predictions
+
+Fonts, paragraph styles and table styles are built once per process and
+shared (read-only) by every render, so per-report setup is close to zero.
+ReportLab itself is only imported when the first report is built.
 """
 import io
-from typing import List, Dict
+import threading
+from typing import Dict, Optional, Sequence, Tuple, Union
+from xml.sax.saxutils import escape
 from datetime import datetime
 from pathlib import Path
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import (
-    SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, 
-    PageBreak, Image, Preformatted
-)
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from io import BytesIO
-from PIL import Image as PILImage
-
-from app.config import WORDCLOUD_DIR
+
+from app.config import WORDCLOUD_DIR, REPORT_FONT_PATH, REPORT_FONT_BOLD_PATH
+from app.services.metrics_service import stage_timer
+from app.services.prediction_batch import PredictionBatch, as_batch
+from app.static_files import split_digest
+
+
+# ============================================
+# FONT REGISTRY
+# ============================================
+# Fallback chain: the first (regular, bold) pair found on disk is registered.
+# DejaVu/Arial support Vietnamese; Helvetica is built into ReportLab and
+# always works, but renders Vietnamese diacritics poorly.
+FONT_CANDIDATES = [
+    ("DejaVu", "DejaVuBold",
+     "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+     "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"),
+    ("DejaVu", "DejaVuBold",
+     "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+     "/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf"),
+    ("Arial", "ArialBold",
+     "C:/Windows/Fonts/arial.ttf",
+     "C:/Windows/Fonts/arialbd.ttf"),
+]
+BUILTIN_FONTS = ("Helvetica", "Helvetica-Bold")
+
+# Left/right padding of results table cells (points)
+RESULTS_CELL_PADDING = 8
+
+_fonts: Optional[Tuple[str, str]] = None
+_fonts_lock = threading.Lock()
+
+
+def register_fonts() -> Tuple[str, str]:
+    """
+    Register report fonts once per process
+
+    Returns:
+        tuple: (regular font name, bold font name)
+    """
+    global _fonts
+    if _fonts is not None:
+        return _fonts
+
+    with _fonts_lock:
+        if _fonts is not None:
+            return _fonts
+
+        # Import heavy dependencies only when needed
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        from reportlab.lib.fonts import addMapping
+
+        candidates = list(FONT_CANDIDATES)
+        if REPORT_FONT_PATH and REPORT_FONT_BOLD_PATH:
+            candidates.insert(0, ("ReportFont", "ReportFontBold", REPORT_FONT_PATH, REPORT_FONT_BOLD_PATH))
+
+        for regular_name, bold_name, regular_path, bold_path in candidates:
+            if not (Path(regular_path).exists() and Path(bold_path).exists()):
+                continue
+            try:
+                pdfmetrics.registerFont(TTFont(regular_name, regular_path))
+                pdfmetrics.registerFont(TTFont(bold_name, bold_path))
+                # Let <b>/<i> markup inside paragraphs resolve to these faces
+                addMapping(regular_name, 0, 0, regular_name)
+                addMapping(regular_name, 1, 0, bold_name)
+                addMapping(regular_name, 0, 1, regular_name)
+                addMapping(regular_name, 1, 1, bold_name)
+                _fonts = (regular_name, bold_name)
+                break
+            except Exception as e:
+                print(f"Warning: Could not load font {regular_path}: {e}")
+
+        if _fonts is None:
+            print("Warning: Could not load Vietnamese fonts, falling back to Helvetica")
+            _fonts = BUILTIN_FONTS
+
+        return _fonts
+
+
+def _build_styles(font_name: str, font_name_bold: str) -> "StyleSheet1":
+    """Build the shared paragraph style sheet"""
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+    styles = getSampleStyleSheet()
+
+    styles.add(ParagraphStyle(
+        name='CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#4F46E5'),
+        spaceAfter=30,
+        alignment=TA_CENTER,
+        fontName=font_name_bold
+    ))
+
+    styles.add(ParagraphStyle(
+        name='CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=14,
+        textColor=colors.HexColor('#4F46E5'),
+        spaceAfter=12,
+        fontName=font_name_bold
+    ))
+
+    styles.add(ParagraphStyle(
+        name='CustomNormal',
+        parent=styles['Normal'],
+        fontSize=10,
+        spaceAfter=6,
+        fontName=font_name
+    ))
+
+    return styles
+
+
+def _build_table_styles(font_name: str, font_name_bold: str) -> Dict[str, "TableStyle"]:
+    """Build the shared table styles (summary, distribution, results)"""
+    from reportlab.lib import colors
+    from reportlab.platypus import TableStyle
+
+    return {
+        'summary': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4F46E5')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), font_name_bold),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTNAME', (0, 1), (-1, -1), font_name),
+            ('FONTSIZE', (0, 1), (-1, -1), 10)
+        ]),
+        'distribution': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4F46E5')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), font_name_bold),
+            ('FONTSIZE', (0, 0), (-1, 0), 11),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.lightgrey),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTNAME', (0, 1), (-1, -1), font_name),
+            ('FONTSIZE', (0, 1), (-1, -1), 10)
+        ]),
+        'results': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4F46E5')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), font_name_bold),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.lightgrey),
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+            ('FONTNAME', (0, 1), (-1, -1), font_name),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            # Plain-string comments match the CustomNormal paragraphs
+            ('FONTSIZE', (0, 1), (0, -1), 10),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),  # Top alignment for wrapped text
+            ('LEFTPADDING', (0, 0), (-1, -1), RESULTS_CELL_PADDING),
+            ('RIGHTPADDING', (0, 0), (-1, -1), RESULTS_CELL_PADDING),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ]),
+    }
 
 
 class ReportService:
-    """Service for generating PDF reports"""
+    """
+    Service for generating PDF reports
+
+    One instance is shared by all requests (see get_report_service). Styles
+    are never mutated after __init__, and every render builds its own
+    document and story, so concurrent renders are safe.
+    """
     
     def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self._setup_custom_styles()
-        self._setup_fonts()
-    
-    def _setup_fonts(self):
-        """Setup fonts for Vietnamese character support"""
-        try:
-            # Try to use DejaVu font which supports Vietnamese characters
-            pdfmetrics.registerFont(TTFont('DejaVu', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'))
-            # Register bold variant
-            pdfmetrics.registerFont(TTFont('DejaVuBold', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'))
-        except Exception as e:
-            # If fonts not found, continue with default fonts
-            print(f"Warning: Could not load Vietnamese fonts: {e}")
-    
-    def _setup_custom_styles(self):
-        """Setup custom paragraph styles"""
-        # Use DejaVu font for Vietnamese support, fallback to Helvetica
-        font_name = 'DejaVu'
-        font_name_bold = 'DejaVuBold'
-        
-        self.styles.add(ParagraphStyle(
-            name='CustomTitle',
-            parent=self.styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#4F46E5'),
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            fontName=font_name_bold
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='CustomHeading',
-            parent=self.styles['Heading2'],
-            fontSize=14,
-            textColor=colors.HexColor('#4F46E5'),
-            spaceAfter=12,
-            fontName=font_name_bold
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='CustomNormal',
-            parent=self.styles['Normal'],
-            fontSize=10,
-            spaceAfter=6,
-            fontName=font_name
-        ))
+        self.font_name, self.font_name_bold = register_fonts()
+        self.styles = _build_styles(self.font_name, self.font_name_bold)
+        self.table_styles = _build_table_styles(self.font_name, self.font_name_bold)
     
     def generate_rating_distribution_chart(self) -> tuple:
         """
@@ -89,7 +209,7 @@ class ReportService:
     
     def generate_pdf_report(
         self,
-        predictions: List[Dict],
+        predictions: Union[PredictionBatch, Sequence[Dict]],
         distribution: Dict[int, int],
         wordcloud_path: str,
         username: str,
@@ -99,7 +219,7 @@ class ReportService:
         Generate comprehensive PDF report for batch predictions
         
         Args:
-            predictions: List of prediction results with 'text', 'rating', 'confidence'
+            predictions: PredictionBatch (or prediction dicts with 'text', 'rating', 'confidence')
             distribution: Rating distribution dict {rating: count}
             wordcloud_path: Path to generated wordcloud image (URL or file path)
             username: Username for the report
@@ -108,6 +228,13 @@ class ReportService:
         Returns:
             bytes: PDF file content
         """
+        # Import heavy dependencies only when needed (cached after the first report)
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.units import inch
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, PageBreak, Image
+        
+        predictions = as_batch(predictions)
+        
         # Create PDF in memory
         pdf_buffer = io.BytesIO()
         
@@ -140,7 +267,7 @@ class ReportService:
         
         # Summary section
         total_predictions = len(predictions)
-        avg_confidence = sum(p.get('confidence', 0) for p in predictions) / total_predictions if predictions else 0
+        avg_confidence = predictions.average_confidence()
         
         summary_heading = Paragraph("Summary", self.styles['CustomHeading'])
         story.append(summary_heading)
@@ -152,18 +279,7 @@ class ReportService:
         ]
         
         summary_table = Table(summary_data, colWidths=[3*inch, 2*inch])
-        summary_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4F46E5')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'DejaVuBold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTNAME', (0, 1), (-1, -1), 'DejaVu'),
-            ('FONTSIZE', (0, 1), (-1, -1), 10)
-        ]))
+        summary_table.setStyle(self.table_styles['summary'])
         story.append(summary_table)
         story.append(Spacer(1, 0.3*inch))
         
@@ -196,18 +312,7 @@ class ReportService:
             ])
         
         dist_table = Table(dist_data, colWidths=[1.5*inch, 1.5*inch, 1.5*inch])
-        dist_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4F46E5')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'DejaVuBold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.lightgrey),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTNAME', (0, 1), (-1, -1), 'DejaVu'),
-            ('FONTSIZE', (0, 1), (-1, -1), 10)
-        ]))
+        dist_table.setStyle(self.table_styles['distribution'])
         story.append(dist_table)
         story.append(Spacer(1, 0.3*inch))
         
@@ -220,8 +325,8 @@ class ReportService:
                 # Convert URL to file path if needed
                 file_path = wordcloud_path
                 if wordcloud_path.startswith('/'):
-                    # It's a URL path, convert to file path
-                    file_path = str(WORDCLOUD_DIR / wordcloud_path.split('/')[-1])
+                    # It's a (content-hashed) URL path, convert to file path
+                    file_path = str(WORDCLOUD_DIR / split_digest(wordcloud_path.split('/')[-1])[0])
                 
                 if Path(file_path).exists():
                     img = Image(file_path, width=5*inch, height=2.5*inch)
@@ -247,55 +352,57 @@ class ReportService:
         
         # Results table
         results_data = [['Comment', 'Rating', 'Confidence']]
+        comment_width = 3.5*inch
         
-        for pred in predictions:
-            comment = pred.get('text', '')
-            rating = pred.get('rating', 0)
-            confidence = pred.get('confidence', 0)
-            
-            # Create wrapped comment - let ReportLab handle wrapping
-            comment_paragraph = Paragraph(comment, self.styles['CustomNormal'])
-            
-            # Use star character ★ instead of emoji
-            stars = "★" * rating
-            
+        texts, ratings, confidences = predictions.columns()
+        for comment, rating, confidence in zip(texts, ratings, confidences):
             results_data.append([
-                comment_paragraph,
-                f"{stars}",
+                self._comment_cell(comment, comment_width),
+                # Use star character ★ instead of emoji
+                "★" * rating,
                 f"{confidence:.2%}"
             ])
         
         # Create table with adjusted column widths - wider comment column for wrapping
-        results_table = Table(results_data, colWidths=[3.5*inch, 0.8*inch, 1.2*inch])
-        results_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4F46E5')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'DejaVuBold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.lightgrey),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-            ('FONTNAME', (0, 1), (-1, -1), 'DejaVu'),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),  # Top alignment for wrapped text
-            ('LEFTPADDING', (0, 0), (-1, -1), 8),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ]))
+        results_table = Table(results_data, colWidths=[comment_width, 0.8*inch, 1.2*inch])
+        results_table.setStyle(self.table_styles['results'])
         story.append(results_table)
         
         # Build PDF
-        doc.build(story)
+        with stage_timer("report.build_pdf"):
+            doc.build(story)
         
         # Get PDF bytes
         pdf_buffer.seek(0)
         return pdf_buffer.getvalue()
+    
+    def _comment_cell(self, comment: str, column_width: float):
+        """
+        Plain string for comments that fit on one line, a wrapping Paragraph otherwise
+        
+        A Paragraph parses its text into styled fragments and costs far more
+        memory than a string cell; most review comments are short.
+        """
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+        from reportlab.platypus import Paragraph
+        
+        style = self.styles['CustomNormal']
+        available = column_width - 2 * RESULTS_CELL_PADDING
+        if "\n" not in comment and stringWidth(comment, style.fontName, style.fontSize) <= available:
+            return comment
+        # Paragraph text is markup: escape <, > and & in user comments
+        return Paragraph(escape(comment), style)
+
+
+_report_service: Optional[ReportService] = None
+_report_service_lock = threading.Lock()
 
 
 def get_report_service() -> ReportService:
-    """Dependency injection for report service"""
-    return ReportService()
+    """Dependency injection for report service (built once per process)"""
+    global _report_service
+    if _report_service is None:
+        with _report_service_lock:
+            if _report_service is None:
+                _report_service = ReportService()
+    return _report_service
@@ -0,0 +1,323 @@
+"""
+Tracing Service
+Lightweight per-request span trees and slow-request log
+
+A trace is opened per HTTP request by TracingMiddleware; `span()` (and
+every `stage_timer`) attaches a child span to whatever is active in the
+current context. DB queries are recorded through SQLAlchemy cursor events,
+so each trace also knows how many statements it ran and which ones repeat
+(the usual sign of an N+1 pattern). Outside a request `span()` is a no-op.
+"""
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from app.config import (
+    TRACING_ENABLED,
+    SLOW_REQUEST_THRESHOLD_MS,
+    SLOW_REQUEST_LOG,
+    TRACE_EXPORTER,
+    TRACE_EXPORT_PATH,
+    TRACE_BUFFER_SIZE
+)
+
+# Cap per trace so a 10k-row batch doesn't build a 10k-node tree;
+# DB query counts keep counting past the cap
+MAX_SPANS_PER_TRACE = 500
+MAX_STATEMENT_LENGTH = 200
+
+
+class Span:
+    """One timed operation inside a trace"""
+    __slots__ = ("name", "start", "end", "attributes", "children")
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attributes = attributes or {}
+        self.children: List["Span"] = []
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        data = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration_ms, 3)
+        }
+        if self.attributes:
+            data["attributes"] = self.attributes
+        if self.children:
+            data["children"] = [child.to_dict(origin) for child in list(self.children)]
+        return data
+
+
+class Trace:
+    """Span tree plus per-request counters for one HTTP request"""
+
+    def __init__(self, method: str, path: str):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.timestamp = time.time()
+        self.method = method
+        self.path = path
+        self.route: Optional[str] = None
+        self.status: Optional[int] = None
+        self.attributes: Dict[str, Any] = {}
+        self.root = Span(f"{method} {path}")
+        self.span_count = 1
+        self.dropped_spans = 0
+        self.db_queries = 0
+        self.db_time_ms = 0.0
+        self.statements: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def new_span(self, parent: Span, name: str, attributes: Optional[Dict[str, Any]]) -> Optional[Span]:
+        with self._lock:
+            if self.span_count >= MAX_SPANS_PER_TRACE:
+                self.dropped_spans += 1
+                return None
+            self.span_count += 1
+        span = Span(name, attributes)
+        parent.children.append(span)
+        return span
+
+    def record_query(self, statement: str, duration_ms: float):
+        with self._lock:
+            self.db_queries += 1
+            self.db_time_ms += duration_ms
+            self.statements[statement] += 1
+
+    def finish(self, status: Optional[int]):
+        self.status = status
+        self.root.end = time.perf_counter()
+
+    @property
+    def duration_ms(self) -> float:
+        return self.root.duration_ms
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "timestamp": self.timestamp,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "duration_ms": round(self.duration_ms, 3),
+            "db_queries": self.db_queries,
+            "db_time_ms": round(self.db_time_ms, 3),
+            **self.attributes
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = self.summary()
+        with self._lock:
+            repeated = [
+                {"statement": statement, "count": count}
+                for statement, count in self.statements.most_common(5) if count > 1
+            ]
+        if repeated:
+            data["repeated_queries"] = repeated
+        if self.dropped_spans:
+            data["dropped_spans"] = self.dropped_spans
+        data["spans"] = self.root.to_dict(self.root.start)
+        return data
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time `name` as a child of the active span (no-op outside a traced request)"""
+    trace = _current_trace.get()
+    parent = _current_span.get()
+    child = trace.new_span(parent, name, attributes) if trace is not None and parent is not None else None
+    if child is None:
+        yield None
+        return
+    token = _current_span.set(child)
+    try:
+        yield child
+    finally:
+        child.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+def annotate(**attributes):
+    """Attach request-level attributes (e.g. user) to the active trace"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attributes.update(attributes)
+
+
+def start_trace(method: str, path: str):
+    """Open a trace for the current context; returns a token for end_trace"""
+    if not TRACING_ENABLED:
+        return None
+    trace = Trace(method, path)
+    return trace, _current_trace.set(trace), _current_span.set(trace.root)
+
+
+def end_trace(handle, status: Optional[int], route: Optional[str] = None, export: bool = True) -> Optional[Trace]:
+    """Close the trace opened by start_trace and hand it to the exporters"""
+    if handle is None:
+        return None
+    trace, trace_token, span_token = handle
+    _current_span.reset(span_token)
+    _current_trace.reset(trace_token)
+    trace.route = route
+    trace.finish(status)
+    if export:
+        tracer.export(trace)
+    return trace
+
+
+# ============================================
+# EXPORTERS
+# ============================================
+class JsonlWriter:
+    """Append JSON lines from a background thread so requests never wait on disk"""
+
+    def __init__(self, path: str, max_pending: int = 1000):
+        self.path = path
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def write(self, record: Dict[str, Any]):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        while True:
+            record = self._queue.get()
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                    # Drain whatever queued up meanwhile with the same handle
+                    while not self._queue.empty():
+                        f.write(json.dumps(self._queue.get_nowait(), ensure_ascii=False, default=str) + "\n")
+            except Exception as e:
+                print(f"⚠️ Trace writer failed ({self.path}): {e}")
+
+
+class MemoryCollector:
+    """Keeps the most recent traces in a ring buffer (served at /debug/traces)"""
+
+    def __init__(self, max_traces: int):
+        self._traces: deque = deque(maxlen=max_traces)
+        self._lock = threading.Lock()
+
+    def add(self, trace: Trace):
+        with self._lock:
+            self._traces.append(trace)
+
+    def recent(self, limit: int = 50, min_duration_ms: float = 0.0) -> List[Dict[str, Any]]:
+        with self._lock:
+            traces = list(self._traces)
+        matching = [t for t in reversed(traces) if t.duration_ms >= min_duration_ms]
+        return [t.summary() for t in matching[:limit]]
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        with self._lock:
+            for trace in self._traces:
+                if trace.trace_id == trace_id:
+                    return trace
+        return None
+
+
+class Tracer:
+    """Routes finished traces to the slow-request log and the configured exporter"""
+
+    def __init__(self):
+        self.slow_threshold_ms = SLOW_REQUEST_THRESHOLD_MS
+        self.slow_log = JsonlWriter(SLOW_REQUEST_LOG) if SLOW_REQUEST_LOG else None
+        self.collector = MemoryCollector(TRACE_BUFFER_SIZE) if TRACE_EXPORTER == "memory" else None
+        self.file_exporter = JsonlWriter(TRACE_EXPORT_PATH) if TRACE_EXPORTER == "file" else None
+        self.slow_requests = 0
+
+    def export(self, trace: Trace):
+        if self.collector is not None:
+            self.collector.add(trace)
+        slow = trace.duration_ms >= self.slow_threshold_ms
+        if not slow and self.file_exporter is None:
+            return
+        record = trace.to_dict()
+        if self.file_exporter is not None:
+            self.file_exporter.write(record)
+        if slow:
+            self.slow_requests += 1
+            if self.slow_log is not None:
+                self.slow_log.write(record)
+
+
+# Singleton instance
+tracer = Tracer()
+
+
+# ============================================
+# SQLALCHEMY INSTRUMENTATION
+# ============================================
+def instrument_engine(engine):
+    """Record every cursor execution as a db.query span on the active trace"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        trace = _current_trace.get()
+        if trace is None:
+            return
+        statement = " ".join(statement.split())[:MAX_STATEMENT_LENGTH]
+        query_span = None
+        parent = _current_span.get()
+        if parent is not None:
+            query_span = trace.new_span(parent, "db.query", {"statement": statement})
+        conn.info.setdefault("trace_query_stack", []).append((statement, query_span, time.perf_counter()))
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get("trace_query_stack")
+        if not stack:
+            return
+        statement, query_span, start = stack.pop()
+        end = time.perf_counter()
+        if query_span is not None:
+            query_span.end = end
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.record_query(statement, (end - start) * 1000)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        # after_cursor_execute doesn't fire on failure; don't leak the entry
+        # onto the pooled connection
+        conn = exception_context.connection
+        stack = conn.info.get("trace_query_stack") if conn is not None else None
+        if stack:
+            stack.pop()
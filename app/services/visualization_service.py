@@ -3,16 +3,15 @@ Visualization Service
 WordCloud generation and data visualization utilities
 """
 import os
-from typing import List, Dict
+from typing import List, Dict, Sequence
 from collections import Counter
-from wordcloud import WordCloud
-import matplotlib
-matplotlib.use('Agg')  # Use non-GUI backend
-import matplotlib.pyplot as plt
 from datetime import datetime
 from pathlib import Path
 
 from app.config import WORDCLOUD_DIR
+from app.services.metrics_service import stage_timer
+from app.services.prediction_batch import rating_distribution
+from app.static_files import static_url
 
 
 class VisualizationService:
@@ -50,6 +49,25 @@ class VisualizationService:
         
         filepath = WORDCLOUD_DIR / filename
         
+        with stage_timer("viz.wordcloud"):
+            self._render_wordcloud(combined_text, filepath)
+        
+        # Content-hashed URL: browsers may cache the image for good
+        return static_url(f"uploads/wordclouds/{filename}")
+    
+    def preload(self):
+        """Import the word cloud / plotting libraries ahead of the first request"""
+        import wordcloud  # noqa: F401
+        import matplotlib.figure  # noqa: F401
+    
+    def _render_wordcloud(self, combined_text: str, filepath: Path):
+        """Render the word cloud image to `filepath`"""
+        # Import heavy dependencies only when needed (~0.7 s at import time)
+        from wordcloud import WordCloud
+        # Figure API instead of pyplot: no global state, so renders can run
+        # concurrently in the threadpool (and no GUI backend is involved)
+        from matplotlib.figure import Figure
+        
         # Create word cloud
         wordcloud = WordCloud(
             width=800,
@@ -63,34 +81,24 @@ class VisualizationService:
         ).generate(combined_text)
         
         # Save to file
-        plt.figure(figsize=(10, 5))
-        plt.imshow(wordcloud, interpolation='bilinear')
-        plt.axis('off')
-        plt.tight_layout(pad=0)
-        plt.savefig(filepath, dpi=150, bbox_inches='tight')
-        plt.close()
-        
-        # Return relative URL path
-        return f"/static/uploads/wordclouds/{filename}"
+        fig = Figure(figsize=(10, 5))
+        ax = fig.add_subplot()
+        ax.imshow(wordcloud, interpolation='bilinear')
+        ax.axis('off')
+        fig.tight_layout(pad=0)
+        fig.savefig(filepath, dpi=150, bbox_inches='tight')
     
-    def calculate_rating_distribution(self, ratings: List[int]) -> Dict[int, int]:
+    def calculate_rating_distribution(self, ratings: Sequence[int]) -> Dict[int, int]:
         """
         Calculate distribution of ratings
         
         Args:
-            ratings: List of ratings (1-5)
+            ratings: Ratings (1-5), e.g. PredictionBatch.ratings
             
         Returns:
-            dict: {rating: count}
+            dict: {rating: count} for every rating 1-5
         """
-        distribution = Counter(ratings)
-        
-        # Ensure all ratings 1-5 are present
-        for rating in range(1, 6):
-            if rating not in distribution:
-                distribution[rating] = 0
-        
-        return dict(sorted(distribution.items()))
+        return rating_distribution(ratings)
     
     def get_top_words(self, texts: List[str], top_n: int = 20) -> List[tuple]:
         """
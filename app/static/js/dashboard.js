@@ -0,0 +1,556 @@
+// Check authentication
+const token = localStorage.getItem('access_token');
+const username = localStorage.getItem('username');
+
+if (!token) {
+    window.location.href = '/login';
+}
+
+document.getElementById('current-username').textContent = username || 'User';
+
+// Global variables
+let currentResults = [];
+let currentDistribution = {};
+let currentWordcloudUrl = '';
+let chartInstance = null;
+let historyRows = [];
+
+// The event stream loads history on connect and pushes new rows
+document.addEventListener('DOMContentLoaded', () => {
+    connectEvents();
+    connectLive();
+});
+
+// ============================================
+// EVENT STREAM (new history rows, batch progress)
+// ============================================
+// Server-Sent Events read with fetch() so the token goes in the
+// Authorization header; history is reloaded on every (re)connect
+let eventsConnected = false;
+let eventsRetryDelay = 1000;
+let batchJobId = null;
+const BATCH_STAGES = {
+    scoring: 'Scoring comments...',
+    saving: 'Saving to history...',
+    wordcloud: 'Generating word cloud...',
+    report: 'Generating PDF report...'
+};
+
+async function connectEvents() {
+    try {
+        const response = await fetch('/api/predict/events', {
+            headers: {
+                'Authorization': `Bearer ${token}`,
+                'Accept': 'text/event-stream'
+            }
+        });
+        if (response.status === 401) {
+            loadHistory();
+            return;
+        }
+        if (!response.ok || !response.body) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += value;
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) >= 0) {
+                handleServerEvent(buffer.slice(0, boundary));
+                buffer = buffer.slice(boundary + 2);
+            }
+        }
+        // The server ends streams periodically: reconnect right away
+        eventsRetryDelay = 1000;
+    } catch (error) {
+        console.error('Event stream error:', error);
+        // Without the stream, at least show the current history
+        if (!eventsConnected) loadHistory();
+        eventsRetryDelay = Math.min(eventsRetryDelay * 2, 30000);
+    }
+    eventsConnected = false;
+    setTimeout(connectEvents, eventsRetryDelay);
+}
+
+function handleServerEvent(block) {
+    let type = 'message';
+    const data = [];
+    block.split('\n').forEach(line => {
+        if (line.startsWith('event:')) type = line.slice(6).trim();
+        else if (line.startsWith('data:')) data.push(line.slice(5).trim());
+    });
+    // Keep-alive comments and retry hints carry no data
+    if (!data.length) return;
+    const payload = JSON.parse(data.join('\n'));
+    
+    if (type === 'ready') {
+        eventsConnected = true;
+        loadHistory();
+    } else if (type === 'resync') {
+        loadHistory();
+    } else if (type === 'history') {
+        historyRows = payload.rows.concat(historyRows).slice(0, 50);
+        displayHistory(historyRows);
+    } else if (payload.job_id === batchJobId) {
+        if (type === 'batch_progress') {
+            displayBatchProgress(payload);
+        } else if (type === 'batch_complete' || type === 'batch_failed') {
+            document.getElementById('batch-progress').classList.add('hidden');
+        }
+    }
+}
+
+function displayBatchProgress(progress) {
+    document.getElementById('batch-progress-stage').textContent = BATCH_STAGES[progress.stage] || progress.stage;
+    document.getElementById('batch-progress-percent').textContent =
+        `${progress.percent}% (${progress.done.toLocaleString()}/${progress.total.toLocaleString()})`;
+    document.getElementById('batch-progress-bar').style.width = `${progress.percent}%`;
+    document.getElementById('batch-progress').classList.remove('hidden');
+}
+
+// ============================================
+// LIVE PREDICTION (rate as you type)
+// ============================================
+// One authenticated WebSocket; the server debounces, drops superseded
+// text and batches with other users, so every edit can be sent
+let liveSocket = null;
+let liveRequestId = 0;
+let liveRetryDelay = 1000;
+
+function setLiveStatus(state) {
+    const colors = { connected: 'text-green-500', connecting: 'text-yellow-500', offline: 'text-gray-400' };
+    const status = document.getElementById('live-status');
+    status.className = colors[state] || colors.offline;
+    status.title = `Live prediction: ${state}`;
+}
+
+function connectLive() {
+    if (!('WebSocket' in window)) return;
+    const scheme = window.location.protocol === 'https:' ? 'wss' : 'ws';
+    liveSocket = new WebSocket(`${scheme}://${window.location.host}/api/predict/live`);
+    setLiveStatus('connecting');
+    
+    liveSocket.onopen = () => {
+        liveSocket.send(JSON.stringify({ type: 'auth', token: token }));
+    };
+    
+    liveSocket.onmessage = (event) => {
+        const message = JSON.parse(event.data);
+        if (message.type === 'ready') {
+            setLiveStatus('connected');
+            liveRetryDelay = 1000;
+            sendLiveText();
+        } else if (message.type === 'prediction' && message.id === liveRequestId) {
+            // Older ids were superseded by newer text: ignore them
+            displayLiveResult(message);
+        }
+    };
+    
+    liveSocket.onclose = (event) => {
+        setLiveStatus('offline');
+        liveSocket = null;
+        // 1008 = rejected credentials: the HTTP flow will send the user to /login
+        if (event.code !== 1008) {
+            setTimeout(connectLive, liveRetryDelay);
+            liveRetryDelay = Math.min(liveRetryDelay * 2, 30000);
+        }
+    };
+}
+
+function sendLiveText() {
+    const text = document.getElementById('single-comment').value;
+    liveRequestId += 1;
+    if (!text.trim()) {
+        document.getElementById('live-result').classList.add('hidden');
+    }
+    if (liveSocket && liveSocket.readyState === WebSocket.OPEN) {
+        liveSocket.send(JSON.stringify({ type: 'predict', id: liveRequestId, text: text }));
+    }
+}
+
+function displayLiveResult(message) {
+    document.getElementById('live-stars').textContent = '⭐'.repeat(message.rating);
+    document.getElementById('live-confidence').textContent = `${(message.confidence * 100).toFixed(1)}%`;
+    document.getElementById('live-result').classList.remove('hidden');
+}
+
+document.getElementById('single-comment').addEventListener('input', sendLiveText);
+
+// Logout function
+function logout() {
+    localStorage.removeItem('access_token');
+    localStorage.removeItem('username');
+    window.location.href = '/login';
+}
+
+// Tab switching
+function switchTab(tab) {
+    const tabs = ['single', 'batch'];
+    tabs.forEach(t => {
+        const button = document.getElementById(`tab-${t}`);
+        const content = document.getElementById(`${t}-form`);
+        
+        if (t === tab) {
+            button.classList.add('border-indigo-600', 'text-indigo-600');
+            button.classList.remove('text-gray-500');
+            content.classList.remove('hidden');
+        } else {
+            button.classList.remove('border-indigo-600', 'text-indigo-600');
+            button.classList.add('text-gray-500');
+            content.classList.add('hidden');
+        }
+    });
+    
+    // Hide results when switching
+    document.getElementById('single-result').classList.add('hidden');
+    document.getElementById('batch-results').classList.add('hidden');
+}
+
+// Display selected file name
+function displayFileName(input) {
+    const fileName = input.files[0]?.name || '';
+    document.getElementById('file-name').textContent = fileName ? `Selected: ${fileName}` : '';
+}
+
+// Single Prediction
+document.getElementById('singlePredictionForm').addEventListener('submit', async (e) => {
+    e.preventDefault();
+    
+    const comment = document.getElementById('single-comment').value;
+    
+    if (!comment.trim()) {
+        alert('Please enter a comment!');
+        return;
+    }
+    
+    try {
+        const response = await fetch('/api/predict/single', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Authorization': `Bearer ${token}`
+            },
+            body: JSON.stringify({
+                product_name: '',
+                comment: comment
+            })
+        });
+        
+        if (response.ok) {
+            const data = await response.json();
+            displaySingleResult(data);
+            // New rows arrive over the event stream; reload only without it
+            if (!eventsConnected) loadHistory();
+        } else {
+            const error = await response.json();
+            alert(error.detail || 'Prediction failed');
+        }
+    } catch (error) {
+        alert('An error occurred: ' + error.message);
+    }
+});
+
+function displaySingleResult(data) {
+    document.getElementById('predicted-rating').textContent = data.predicted_rating;
+    document.getElementById('confidence-score').textContent = (data.confidence_score * 100).toFixed(1) + '%';
+    
+    // Display stars
+    const stars = '⭐'.repeat(data.predicted_rating);
+    document.getElementById('rating-stars').textContent = stars;
+    
+    document.getElementById('single-result').classList.remove('hidden');
+}
+
+// Batch Prediction
+document.getElementById('batchPredictionForm').addEventListener('submit', async (e) => {
+    e.preventDefault();
+    
+    const productName = document.getElementById('batch-product-name').value || '';
+    const fileInput = document.getElementById('csv-file');
+    const file = fileInput.files[0];
+    
+    if (!file) {
+        alert('Please select a CSV file!');
+        return;
+    }
+    
+    batchJobId = Date.now().toString(36) + Math.random().toString(36).slice(2, 8);
+    const formData = new FormData();
+    formData.append('product_name', productName);
+    formData.append('file', file);
+    formData.append('job_id', batchJobId);
+    
+    try {
+        const response = await fetch('/api/predict/batch', {
+            method: 'POST',
+            headers: {
+                'Authorization': `Bearer ${token}`
+            },
+            body: formData
+        });
+        
+        if (response.ok) {
+            const data = await response.json();
+            displayBatchResults(data);
+            // New rows arrive over the event stream; reload only without it
+            if (!eventsConnected) loadHistory();
+        } else {
+            const error = await response.json();
+            alert(error.detail || 'Prediction failed');
+        }
+    } catch (error) {
+        alert('An error occurred: ' + error.message);
+    } finally {
+        batchJobId = null;
+        document.getElementById('batch-progress').classList.add('hidden');
+    }
+});
+
+function displayBatchResults(data) {
+    currentResults = data.results;
+    currentDistribution = data.rating_distribution;
+    currentWordcloudUrl = data.wordcloud_url;
+    
+    // Display word cloud (empty when the server skipped it under memory pressure)
+    const wordcloudImage = document.getElementById('wordcloud-image');
+    wordcloudImage.src = data.wordcloud_url || '';
+    wordcloudImage.classList.toggle('hidden', !data.wordcloud_url);
+    
+    // Create chart
+    createRatingChart(data.rating_distribution);
+    
+    // Populate table
+    const tbody = document.getElementById('results-tbody');
+    tbody.innerHTML = '';
+    
+    data.results.forEach(result => {
+        const row = `
+            <tr class="hover:bg-gray-50">
+                <td class="px-4 py-3 text-sm text-gray-700">${result.Comment}</td>
+                <td class="px-4 py-3 text-center">
+                    <span class="inline-block bg-indigo-100 text-indigo-800 px-3 py-1 rounded-full font-semibold">
+                        ${result.Predicted_Rating}⭐
+                    </span>
+                </td>
+                <td class="px-4 py-3 text-center text-sm text-gray-600">
+                    ${(result.Confidence * 100).toFixed(1)}%
+                </td>
+            </tr>
+        `;
+        tbody.innerHTML += row;
+    });
+    
+    document.getElementById('batch-results').classList.remove('hidden');
+}
+
+function createRatingChart(distribution) {
+    const ctx = document.getElementById('ratingChart').getContext('2d');
+    
+    // Destroy existing chart
+    if (chartInstance) {
+        chartInstance.destroy();
+    }
+    
+    chartInstance = new Chart(ctx, {
+        type: 'bar',
+        data: {
+            labels: ['1⭐', '2⭐', '3⭐', '4⭐', '5⭐'],
+            datasets: [{
+                label: 'Number of Reviews',
+                data: [
+                    distribution[1] || 0,
+                    distribution[2] || 0,
+                    distribution[3] || 0,
+                    distribution[4] || 0,
+                    distribution[5] || 0
+                ],
+                backgroundColor: [
+                    'rgba(239, 68, 68, 0.8)',
+                    'rgba(251, 146, 60, 0.8)',
+                    'rgba(250, 204, 21, 0.8)',
+                    'rgba(132, 204, 22, 0.8)',
+                    'rgba(34, 197, 94, 0.8)'
+                ],
+                borderColor: [
+                    'rgba(239, 68, 68, 1)',
+                    'rgba(251, 146, 60, 1)',
+                    'rgba(250, 204, 21, 1)',
+                    'rgba(132, 204, 22, 1)',
+                    'rgba(34, 197, 94, 1)'
+                ],
+                borderWidth: 2
+            }]
+        },
+        options: {
+            responsive: true,
+            maintainAspectRatio: true,
+            plugins: {
+                legend: {
+                    display: false
+                }
+            },
+            scales: {
+                y: {
+                    beginAtZero: true,
+                    ticks: {
+                        stepSize: 1
+                    }
+                }
+            }
+        }
+    });
+}
+
+function downloadCSV() {
+    if (currentResults.length === 0) {
+        alert('No results to download');
+        return;
+    }
+    
+    // Create CSV content
+    const headers = ['Comment', 'Predicted_Rating', 'Confidence'];
+    const csvContent = [
+        headers.join(','),
+        ...currentResults.map(r => 
+            `"${r.Comment.replace(/"/g, '""')}",${r.Predicted_Rating},${r.Confidence}`
+        )
+    ].join('\n');
+    
+    // Create download link
+    const blob = new Blob([csvContent], { type: 'text/csv;charset=utf-8;' });
+    const link = document.createElement('a');
+    const url = URL.createObjectURL(blob);
+    
+    link.setAttribute('href', url);
+    link.setAttribute('download', `predictions_${new Date().getTime()}.csv`);
+    link.style.visibility = 'hidden';
+    
+    document.body.appendChild(link);
+    link.click();
+    document.body.removeChild(link);
+}
+
+function downloadPDF() {
+    if (currentResults.length === 0) {
+        alert('No results to download');
+        return;
+    }
+    
+    try {
+        // Prepare data
+        const predictions = currentResults.map(r => ({
+            text: r.Comment,
+            rating: r.Predicted_Rating,
+            confidence: r.Confidence
+        }));
+        
+        // Send request to generate PDF
+        fetch('/api/predict/download-pdf', {
+            method: 'POST',
+            headers: {
+                'Authorization': `Bearer ${token}`,
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                predictions: predictions,
+                distribution: currentDistribution,
+                wordcloud_path: currentWordcloudUrl
+            })
+        })
+        .then(response => {
+            if (response.ok) {
+                return response.blob();
+            }
+            throw new Error('Failed to generate PDF');
+        })
+        .then(blob => {
+            const url = URL.createObjectURL(blob);
+            const link = document.createElement('a');
+            link.href = url;
+            link.download = `predictions_report_${new Date().getTime()}.pdf`;
+            document.body.appendChild(link);
+            link.click();
+            document.body.removeChild(link);
+            URL.revokeObjectURL(url);
+        })
+        .catch(error => {
+            console.error('Error downloading PDF:', error);
+            alert('Error generating PDF report. Please try again.');
+        });
+    } catch (error) {
+        console.error('Error preparing PDF download:', error);
+        alert('Error preparing PDF report');
+    }
+}
+
+// Load and display prediction history
+async function loadHistory() {
+    try {
+        const response = await fetch('/api/predict/history', {
+            headers: {
+                'Authorization': `Bearer ${token}`
+            }
+        });
+        
+        if (response.ok) {
+            historyRows = await response.json();
+            displayHistory(historyRows);
+        } else {
+            console.error('Failed to load history');
+        }
+    } catch (error) {
+        console.error('Error loading history:', error);
+    }
+}
+
+function displayHistory(history) {
+    const tbody = document.getElementById('history-tbody');
+    
+    if (history.length === 0) {
+        tbody.innerHTML = `
+            <tr class="text-center text-gray-500">
+                <td colspan="5" class="px-4 py-8">
+                    <i class="fas fa-inbox text-3xl text-gray-300 mb-2"></i>
+                    <p>No prediction history yet</p>
+                </td>
+            </tr>
+        `;
+        return;
+    }
+    
+    tbody.innerHTML = '';
+    history.forEach(item => {
+        const date = new Date(item.created_at).toLocaleString();
+        const shortComment = item.comment.length > 50 
+            ? item.comment.substring(0, 50) + '...' 
+            : item.comment;
+        const row = `
+            <tr class="hover:bg-gray-50">
+                <td class="px-4 py-3 text-sm text-gray-600">${date}</td>
+                <td class="px-4 py-3 text-sm text-gray-700" title="${item.comment}">${shortComment}</td>
+                <td class="px-4 py-3 text-center">
+                    <span class="inline-block bg-indigo-100 text-indigo-800 px-3 py-1 rounded-full font-semibold text-sm">
+                        ${item.predicted_rating}⭐
+                    </span>
+                </td>
+                <td class="px-4 py-3 text-center text-sm text-gray-600">
+                    ${(item.confidence_score * 100).toFixed(1)}%
+                </td>
+                <td class="px-4 py-3 text-center text-sm">
+                    <span class="inline-block ${item.prediction_type === 'single' ? 'bg-blue-100 text-blue-800' : 'bg-green-100 text-green-800'} px-2 py-1 rounded text-xs font-semibold">
+                        ${item.prediction_type}
+                    </span>
+                </td>
+            </tr>
+        `;
+        tbody.innerHTML += row;
+    });
+}
+
+function refreshHistory() {
+    loadHistory();
+}
@@ -0,0 +1,136 @@
+"""
+Static Files
+Content-hashed URLs, long-lived cache headers and precompressed variants
+
+`static_url("js/dashboard.js")` (a Jinja global) returns
+`/static/js/dashboard.<hash>.js`, the hash being taken from the file's
+content. CachedStaticFiles serves such URLs as immutable for a year, so a
+browser never asks for them again until the file, and with it the URL,
+changes. Plain and outdated URLs still work but are revalidated on every
+use (ETag / Last-Modified -> 304).
+
+If the client accepts it and an up-to-date `<file>.br` or `<file>.gz` sits
+next to the file (see `python -m app.cli.static compress`), that variant is
+sent as is, leaving nothing for the compression middleware to do.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from app.config import BASE_DIR
+from app.http_cache import IMMUTABLE, REVALIDATE
+from app.middleware import accepted_encodings
+
+STATIC_DIR = BASE_DIR / "app" / "static"
+STATIC_PREFIX = "/static/"
+
+DIGEST_LENGTH = 10
+
+# Precompressed variants in order of preference: (Content-Encoding, suffix)
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+_HASHED_NAME = re.compile(rf"^(?P<stem>.+)\.(?P<digest>[0-9a-f]{{{DIGEST_LENGTH}}})(?P<suffix>\.[^./]+)$")
+
+
+@lru_cache(maxsize=1024)
+def _digest(path: str, mtime_ns: int, size: int) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            sha.update(block)
+    return sha.hexdigest()[:DIGEST_LENGTH]
+
+
+def file_digest(path: str) -> str:
+    """Content hash of a file (recomputed only when its mtime or size changes)"""
+    stat_result = os.stat(path)
+    return _digest(str(path), stat_result.st_mtime_ns, stat_result.st_size)
+
+
+def hashed_name(path: str, digest: str) -> str:
+    root, suffix = os.path.splitext(path)
+    return f"{root}.{digest}{suffix}"
+
+
+def split_digest(path: str) -> Tuple[str, Optional[str]]:
+    """('css/style.css', 'ab12…') for 'css/style.ab12….css'; (path, None) if unhashed"""
+    directory, name = os.path.split(path)
+    match = _HASHED_NAME.match(name)
+    if match is None:
+        return path, None
+    return os.path.join(directory, match["stem"] + match["suffix"]), match["digest"]
+
+
+def static_url(path: str) -> str:
+    """Cache-busting URL of a file under app/static (plain URL if it is missing)"""
+    path = path.lstrip("/")
+    try:
+        digest = file_digest(os.path.join(STATIC_DIR, path))
+    except OSError:
+        return STATIC_PREFIX + path
+    return STATIC_PREFIX + hashed_name(path, digest)
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles with hashed-URL caching and precompressed variants"""
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        immutable = False
+        original, digest = split_digest(path)
+        if digest is not None:
+            _, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path)
+            if stat_result is None:
+                full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, original)
+                if stat_result is not None:
+                    # An outdated hash still gets the current file, just not as immutable
+                    immutable = await anyio.to_thread.run_sync(file_digest, full_path) == digest
+                    path = original
+
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = IMMUTABLE if immutable else REVALIDATE
+        return response
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope,
+                      status_code: int = 200) -> Response:
+        full_path = os.fspath(full_path)
+        variants = [
+            (encoding, full_path + suffix)
+            for encoding, suffix in PRECOMPRESSED
+            if _is_fresh(full_path + suffix, stat_result)
+        ]
+        if not variants:
+            return super().file_response(full_path, stat_result, scope, status_code)
+
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        encoding, variant_path = next(((e, p) for e, p in variants if e in accepted), (None, None))
+        if encoding is None:
+            response = super().file_response(full_path, stat_result, scope, status_code)
+        else:
+            response = super().file_response(variant_path, os.stat(variant_path), scope, status_code)
+            if response.status_code != 304:
+                response.headers["Content-Encoding"] = encoding
+                response.headers["Content-Type"] = _media_type(full_path)
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+
+def _media_type(path: str) -> str:
+    media_type = mimetypes.guess_type(path)[0] or "text/plain"
+    return f"{media_type}; charset=utf-8" if media_type.startswith("text/") else media_type
+
+
+def _is_fresh(variant_path: str, source: os.stat_result) -> bool:
+    try:
+        return os.stat(variant_path).st_mtime_ns >= source.st_mtime_ns
+    except OSError:
+        return False
@@ -0,0 +1,117 @@
+"""
+Benchmark Harness
+Timing, machine-readable results and run-to-run comparison
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+
+def measure(
+    name: str,
+    func: Callable[[], Any],
+    repeat: int = 10,
+    warmup: int = 1,
+    items: int = 1,
+    **params
+) -> Dict[str, Any]:
+    """
+    Time `func` and summarise
+
+    Args:
+        name: Benchmark id (stable across runs, used for comparison)
+        func: Zero-argument callable to time
+        repeat: Timed iterations
+        warmup: Untimed iterations first
+        items: Work items per call (for throughput)
+        params: Extra parameters recorded with the result (batch size, ...)
+    """
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarize(name, samples, items=items, **params)
+
+
+def summarize(name: str, samples: List[float], items: int = 1, **params) -> Dict[str, Any]:
+    """Summarise pre-collected samples (seconds) in the same format as measure()"""
+    samples = sorted(samples)
+    repeat = len(samples)
+    mean = statistics.mean(samples)
+    result = {
+        'name': name,
+        'params': params,
+        'repeat': repeat,
+        'items': items,
+        'mean_ms': mean * 1000,
+        'p50_ms': samples[len(samples) // 2] * 1000,
+        'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+        'min_ms': samples[0] * 1000,
+        'stdev_ms': (statistics.stdev(samples) * 1000) if len(samples) > 1 else 0.0,
+        'items_per_sec': items / mean if mean > 0 else 0.0,
+    }
+    print(f"  {name:<45} p50 {result['p50_ms']:10.3f} ms   {result['items_per_sec']:12.1f} items/s")
+    return result
+
+
+def environment() -> Dict[str, Any]:
+    """Describe the machine/software so results are comparable"""
+    info = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+    try:
+        import torch
+        info['torch'] = torch.__version__
+        info['torch_threads'] = torch.get_num_threads()
+    except ImportError:
+        pass
+    try:
+        info['git_commit'] = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5
+        ).stdout.strip()
+    except Exception:
+        pass
+    return info
+
+
+def write_results(path: str, results: List[Dict[str, Any]]):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2)
+    print(f"📝 Results written to {path}")
+
+
+def compare(baseline_path: str, results: List[Dict[str, Any]], threshold: float) -> List[Dict[str, Any]]:
+    """
+    Compare p50 latencies against a previous run
+
+    Returns:
+        list: Benchmarks whose p50 grew by more than `threshold` (0.2 = 20%)
+    """
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {r['name']: r for r in json.load(f)['results']}
+
+    regressions = []
+    print(f"\n📊 Comparison with {baseline_path} (threshold {threshold:.0%})")
+    for result in results:
+        before: Optional[Dict[str, Any]] = baseline.get(result['name'])
+        if before is None or before['p50_ms'] <= 0:
+            continue
+        change = result['p50_ms'] / before['p50_ms'] - 1
+        flag = "❌ REGRESSION" if change > threshold else ("✅ faster" if change < -threshold else "")
+        print(f"  {result['name']:<45} {before['p50_ms']:10.3f} → {result['p50_ms']:10.3f} ms  {change:+7.1%} {flag}")
+        if change > threshold:
+            regressions.append({'name': result['name'], 'before_ms': before['p50_ms'],
+                                'after_ms': result['p50_ms'], 'change': change})
+    return regressions
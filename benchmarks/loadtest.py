@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+HTTP Load Test
+Replays a realistic traffic mix against a running app and ramps concurrency
+
+Per stage and endpoint it reports throughput, p50/p95/p99 latency, 429
+rejections and error rate. To separate web/DB/rendering overhead from
+inference cost, run the server once normally and once with the tiny
+stand-in model:
+
+    ML_STANDIN_MODEL=1 USER_RATE_COMMENTS_PER_SEC=0 uvicorn main:app --port 8000 --workers 1
+    python -m benchmarks.loadtest --base-url http://localhost:8000 \\
+        --stages 1:20,4:20,16:30 --output load.json
+
+Admission control limits each user (USER_MAX_CONCURRENT_REQUESTS,
+USER_RATE_*), so by default every client logs in as its own user
+(`loadtest-0`, `loadtest-1`, ...). With `--users` below the client count,
+start the server with USER_MAX_CONCURRENT_REQUESTS=0. The comment rate
+limit is per user too: turn it off (0) when measuring capacity, otherwise
+batch-heavy mixes measure the limiter. Rejected (429) requests are counted
+separately and left out of the latency percentiles and req/s.
+
+Traffic mix weights are configurable, e.g.
+    --mix single=70,batch_20=8,batch_200=2,history=15,pdf=5
+"""
+import argparse
+import csv
+import io
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import requests
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+SAMPLE_CSV = PROJECT_ROOT / "sample_comments.csv"
+
+DEFAULT_MIX = "single=70,batch_20=8,batch_200=2,history=15,pdf=5"
+
+
+def load_comments() -> List[str]:
+    with open(SAMPLE_CSV, newline='', encoding='utf-8') as f:
+        return [row['Comment'] for row in csv.DictReader(f) if row['Comment'].strip()]
+
+
+def build_csv(comments: List[str], size: int) -> bytes:
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['Comment'])
+    for i in range(size):
+        writer.writerow([comments[i % len(comments)]])
+    return output.getvalue().encode('utf-8')
+
+
+def parse_mix(mix: str) -> List[Tuple[str, float]]:
+    weights = []
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights.append((name.strip(), float(weight or 1)))
+    return weights
+
+
+def parse_stages(stages: str) -> List[Tuple[int, float]]:
+    """'1:20,4:20' -> [(concurrency 1, 20 s), (concurrency 4, 20 s)]"""
+    return [(int(c), float(d)) for c, d in (part.split(":") for part in stages.split(","))]
+
+
+def get_token(base_url: str, username: str, password: str) -> str:
+    """Log in, registering the load-test user first if needed"""
+    requests.post(f"{base_url}/api/auth/register", json={
+        'username': username, 'email': f"{username}@example.com", 'password': password
+    }, timeout=30)
+    response = requests.post(f"{base_url}/api/auth/login",
+                             data={'username': username, 'password': password}, timeout=30)
+    response.raise_for_status()
+    return response.json()['access_token']
+
+
+class TrafficMix:
+    """Builds and sends one request of a given kind"""
+
+    def __init__(self, base_url: str, comments: List[str]):
+        self.base_url = base_url
+        self.comments = comments
+        self.csv_cache: Dict[int, bytes] = {}
+        self.pdf_payload = {
+            'predictions': [{'text': c, 'rating': i % 5 + 1, 'confidence': 0.9} for i, c in enumerate(comments)],
+            'distribution': {str(r): 4 for r in range(1, 6)},
+            'wordcloud_path': "",
+        }
+
+    def send(self, session: requests.Session, kind: str) -> requests.Response:
+        if kind == 'single':
+            return session.post(f"{self.base_url}/api/predict/single", json={
+                'product_name': 'loadtest', 'comment': random.choice(self.comments)
+            }, timeout=300)
+
+        if kind.startswith('batch_'):
+            size = int(kind.split('_', 1)[1])
+            if size not in self.csv_cache:
+                self.csv_cache[size] = build_csv(self.comments, size)
+            return session.post(
+                f"{self.base_url}/api/predict/batch",
+                data={'product_name': 'loadtest'},
+                files={'file': ('loadtest.csv', self.csv_cache[size], 'text/csv')},
+                timeout=600
+            )
+
+        if kind == 'history':
+            return session.get(f"{self.base_url}/api/predict/history?limit=50", timeout=60)
+
+        if kind == 'pdf':
+            return session.post(f"{self.base_url}/api/predict/download-pdf", json=self.pdf_payload, timeout=300)
+
+        if kind.startswith('bulk_'):
+            size = int(kind.split('_', 1)[1])
+            items = [{'product_name': 'loadtest', 'comment': self.comments[i % len(self.comments)]}
+                     for i in range(size)]
+            return session.post(f"{self.base_url}/api/predict/bulk", json={'items': items}, timeout=600)
+
+        raise ValueError(f"Unknown traffic kind: {kind}")
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def run_stage(mix: TrafficMix, tokens: List[str], weights, concurrency: int, duration: float, think_time: float):
+    """Run `concurrency` closed-loop clients for `duration` seconds (client i uses tokens[i % len])"""
+    samples = defaultdict(list)  # kind -> [(latency_s, status code or 0 on connection error)]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    kinds = [k for k, _ in weights]
+    kind_weights = [w for _, w in weights]
+
+    def client(token: str):
+        session = requests.Session()
+        session.headers['Authorization'] = f"Bearer {token}"
+        while time.monotonic() < deadline:
+            kind = random.choices(kinds, kind_weights)[0]
+            start = time.perf_counter()
+            try:
+                status_code = mix.send(session, kind).status_code
+            except requests.RequestException:
+                status_code = 0
+            latency = time.perf_counter() - start
+            with lock:
+                samples[kind].append((latency, status_code))
+            if think_time:
+                time.sleep(random.expovariate(1 / think_time))
+
+    started = time.monotonic()
+    threads = [
+        threading.Thread(target=client, args=(tokens[i % len(tokens)],), daemon=True)
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    endpoints = {}
+    for kind, values in sorted(samples.items()):
+        # 429s return immediately: keep them out of latency and throughput
+        served = [v for v in values if v[1] != 429]
+        latencies = sorted(v[0] * 1000 for v in served)
+        rejected = len(values) - len(served)
+        errors = sum(1 for v in served if not 0 < v[1] < 400)
+        endpoints[kind] = {
+            'requests': len(values),
+            'rejected': rejected,
+            'throughput_rps': len(served) / elapsed,
+            'p50_ms': percentile(latencies, 0.50),
+            'p95_ms': percentile(latencies, 0.95),
+            'p99_ms': percentile(latencies, 0.99),
+            'rejection_rate': rejected / len(values) if values else 0.0,
+            'error_rate': errors / len(values) if values else 0.0,
+        }
+    total = sum(e['requests'] for e in endpoints.values())
+    served = total - sum(e['rejected'] for e in endpoints.values())
+    return {
+        'concurrency': concurrency,
+        'duration_s': elapsed,
+        'total_requests': total,
+        'total_rejected': total - served,
+        'total_rps': served / elapsed if elapsed else 0.0,
+        'endpoints': endpoints,
+    }
+
+
+def print_stage(stage: dict):
+    print(f"\n▶ concurrency {stage['concurrency']}: {stage['total_requests']} requests "
+          f"({stage['total_rejected']} rejected), {stage['total_rps']:.1f} req/s")
+    print(f"  {'endpoint':<12} {'req':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'429':>7} {'errors':>7}")
+    for kind, e in stage['endpoints'].items():
+        print(f"  {kind:<12} {e['requests']:>6} {e['throughput_rps']:>8.1f} {e['p50_ms']:>9.1f} "
+              f"{e['p95_ms']:>9.1f} {e['p99_ms']:>9.1f} {e['rejection_rate']:>7.1%} {e['error_rate']:>7.1%}")
+    if stage['total_rejected']:
+        print("  ⚠️ 429s: per-user admission limits were hit (see --users, USER_MAX_CONCURRENT_REQUESTS, USER_RATE_*)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP load test with latency percentiles")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--username", default="loadtest", help="Prefix of the load-test users")
+    parser.add_argument("--password", default="loadtest-password")
+    parser.add_argument("--stages", default="1:15,4:15,16:30", help="concurrency:seconds,... (ramp)")
+    parser.add_argument("--users", type=int, default=0,
+                        help="Distinct users shared round-robin by the clients (0 = one per client)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="kind=weight,... (single, batch_N, bulk_N, history, pdf)")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean seconds between a client's requests")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    base_url = args.base_url.rstrip("/")
+    stages_spec = parse_stages(args.stages)
+    users = args.users or max(concurrency for concurrency, _ in stages_spec)
+    tokens = [get_token(base_url, f"{args.username}-{i}", args.password) for i in range(users)]
+    mix = TrafficMix(base_url, load_comments())
+    weights = parse_mix(args.mix)
+
+    # Warm-up: the first prediction pays the lazy model load
+    warmup = requests.Session()
+    warmup.headers['Authorization'] = f"Bearer {tokens[0]}"
+    mix.send(warmup, 'single').raise_for_status()
+
+    health = requests.get(f"{base_url}/health", timeout=30).json()
+    stages = []
+    for concurrency, duration in stages_spec:
+        stage = run_stage(mix, tokens, weights, concurrency, duration, args.think_time)
+        print_stage(stage)
+        stages.append(stage)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'base_url': base_url, 'mix': args.mix, 'users': users, 'health': health, 'stages': stages}, f, indent=2)
+        print(f"\n📝 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Login Throughput Benchmark
+Simulates a login storm and measures verify throughput plus event-loop stall
+
+Compares argon2 verification run inline in the event loop (old behaviour)
+with the bounded password executor. Event-loop lag is sampled by a
+heartbeat task; high lag is what freezes prediction traffic.
+
+Usage (from the project root):
+    python -m benchmarks.login_throughput --logins 64 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.services.password_service import pwd_context, password_hasher
+
+
+async def heartbeat(lags: list, stop: asyncio.Event, interval: float = 0.01):
+    """Record how late each 10 ms tick fires"""
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - expected) * 1000)
+
+
+async def storm(verify, hashed: str, logins: int, concurrency: int) -> dict:
+    """Run `logins` verifications, at most `concurrency` at a time"""
+    semaphore = asyncio.Semaphore(concurrency)
+    lags = []
+    stop = asyncio.Event()
+
+    async def one_login():
+        async with semaphore:
+            await verify("correct-horse", hashed)
+
+    ticker = asyncio.create_task(heartbeat(lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(one_login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+
+    lags.sort()
+    return {
+        'logins': logins,
+        'seconds': elapsed,
+        'logins_per_sec': logins / elapsed,
+        'loop_lag_p50_ms': lags[len(lags) // 2] if lags else 0.0,
+        'loop_lag_p99_ms': lags[int(len(lags) * 0.99)] if lags else 0.0,
+        'loop_lag_max_ms': lags[-1] if lags else 0.0,
+    }
+
+
+async def inline_verify(password: str, hashed: str):
+    """Old behaviour: argon2 runs on the event loop thread"""
+    return pwd_context.verify_and_update(password, hashed)
+
+
+async def executor_verify(password: str, hashed: str):
+    """New behaviour: argon2 runs on the bounded password executor"""
+    return await password_hasher.run(pwd_context.verify_and_update, password, hashed)
+
+
+async def run(args) -> dict:
+    hashed = pwd_context.hash("correct-horse")
+    return {
+        'workers': password_hasher.max_workers,
+        'inline': await storm(inline_verify, hashed, args.logins, args.concurrency),
+        'executor': await storm(executor_verify, hashed, args.logins, args.concurrency),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login throughput benchmark")
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    # Keep the storm below the rejection threshold; we measure throughput here
+    password_hasher.max_pending = max(password_hasher.max_pending, args.concurrency)
+
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"Password executor workers: {results['workers']}")
+    for mode in ('inline', 'executor'):
+        stats = results[mode]
+        print(
+            f"{mode:<9} {stats['logins_per_sec']:7.1f} logins/s   "
+            f"loop lag p50 {stats['loop_lag_p50_ms']:7.1f} ms   "
+            f"p99 {stats['loop_lag_p99_ms']:7.1f} ms   max {stats['loop_lag_max_ms']:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
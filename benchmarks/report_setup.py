@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Report Setup Benchmark
+Compares per-request ReportService setup before/after the shared singleton
+
+Usage (from the project root):
+    python -m benchmarks.report_setup --runs 50
+"""
+import argparse
+import json
+import statistics
+import time
+
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+from app.services import report_service as report_module
+from app.services.report_service import get_report_service, _build_styles
+
+
+SAMPLE_PREDICTIONS = [
+    {'text': 'Sản phẩm rất tốt, giao hàng nhanh', 'rating': 5, 'confidence': 0.97},
+    {'text': 'Chất lượng kém, không giống mô tả', 'rating': 1, 'confidence': 0.91},
+    {'text': 'Tạm được so với giá tiền', 'rating': 3, 'confidence': 0.64},
+] * 10
+SAMPLE_DISTRIBUTION = {1: 10, 2: 0, 3: 10, 4: 0, 5: 10}
+
+
+def legacy_setup():
+    """Per-request work done by the old `get_report_service()` (new instance each call)"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot  # noqa: F401  (was imported but never used)
+    from PIL import Image  # noqa: F401
+
+    styles = getSampleStyleSheet()
+    for name, parent in (('CustomTitle', 'Heading1'), ('CustomHeading', 'Heading2'), ('CustomNormal', 'Normal')):
+        styles.add(ParagraphStyle(name=name, parent=styles[parent]))
+
+    # Re-parse and re-register the TTF files exactly like the old _setup_fonts()
+    for regular_name, bold_name, regular_path, bold_path in report_module.FONT_CANDIDATES:
+        try:
+            pdfmetrics.registerFont(TTFont(regular_name, regular_path))
+            pdfmetrics.registerFont(TTFont(bold_name, bold_path))
+            break
+        except Exception:
+            continue
+    return styles
+
+
+def time_call(func, runs: int) -> dict:
+    """Run func `runs` times and return timing statistics in milliseconds"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'runs': runs,
+        'mean_ms': statistics.mean(samples),
+        'p50_ms': samples[len(samples) // 2],
+        'max_ms': samples[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ReportService setup benchmark")
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    service = get_report_service()  # warm the singleton once
+
+    results = {
+        'fonts': [service.font_name, service.font_name_bold],
+        'before_setup': time_call(legacy_setup, args.runs),
+        'after_setup': time_call(get_report_service, args.runs),
+        'style_rebuild': time_call(lambda: _build_styles(service.font_name, service.font_name_bold), args.runs),
+        'render_30_rows': time_call(
+            lambda: service.generate_pdf_report(SAMPLE_PREDICTIONS, SAMPLE_DISTRIBUTION, None, 'bench'),
+            max(1, args.runs // 3)
+        ),
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"Fonts: {results['fonts'][0]} / {results['fonts'][1]}")
+    for name in ('before_setup', 'after_setup', 'style_rebuild', 'render_30_rows'):
+        stats = results[name]
+        print(f"{name:<16} mean {stats['mean_ms']:9.3f} ms   p50 {stats['p50_ms']:9.3f} ms   max {stats['max_ms']:9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Inference Micro-Benchmark Suite
+Hot paths of the prediction pipeline, runnable fully offline
+
+Uses the bundled PhoBERT tokenizer with a tiny randomly initialised Roberta
+(ML_STANDIN_MODEL), so no network access or weight files are needed.
+Forward-pass numbers therefore measure framework/padding overhead and
+scaling with batch size / sequence length, not PhoBERT's absolute cost.
+
+Usage (from the project root):
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --output new.json --compare bench.json --threshold 0.2
+    python -m benchmarks.run --only forward --quick
+"""
+import os
+
+# Must be set before app modules read their configuration
+os.environ.setdefault("ML_STANDIN_MODEL", "1")
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+import argparse
+import csv
+import sys
+from pathlib import Path
+
+from benchmarks.harness import measure, write_results, compare
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+SAMPLE_CSV = PROJECT_ROOT / "sample_comments.csv"
+
+
+def load_comments(n: int):
+    """Sample comments repeated up to n"""
+    with open(SAMPLE_CSV, newline='', encoding='utf-8') as f:
+        base = [row['Comment'] for row in csv.DictReader(f) if row['Comment'].strip()]
+    return (base * (n // len(base) + 1))[:n]
+
+
+def bench_preprocess(ml_service, repeat):
+    comments = load_comments(20)
+    return [measure("preprocess", lambda: [ml_service.preprocess(c) for c in comments],
+                    repeat=repeat, items=len(comments))]
+
+
+def bench_tokenize(ml_service, repeat):
+    from transformers import AutoTokenizer
+    from app.services.fast_tokenizer import convert
+
+    processed = [ml_service.preprocess(c) for c in load_comments(64)]
+    slow = AutoTokenizer.from_pretrained(ml_service.TOKENIZER_DIR, use_fast=False)
+    results = []
+    # Same call as MLPredictionService._infer, for both tokenizer backends
+    for backend, tokenizer in (("slow", slow), ("fast", convert(slow))):
+        for batch_size in (1, 16, 64):
+            texts = processed[:batch_size]
+            results.append(measure(
+                f"tokenize[{backend},bs={batch_size}]",
+                lambda: tokenizer(texts, add_special_tokens=False, truncation=False, verbose=False),
+                repeat=repeat, items=batch_size, batch_size=batch_size, backend=backend
+            ))
+    return results
+
+
+def bench_forward(ml_service, repeat):
+    import torch
+
+    results = []
+    vocab = len(ml_service.tokenizer)
+    generator = torch.Generator().manual_seed(0)
+    for seq_len in (32, 128, 256):
+        for batch_size in (1, 8, 32):
+            input_ids = torch.randint(4, vocab, (batch_size, seq_len), generator=generator)
+            input_ids[:, 0] = ml_service.tokenizer.bos_token_id
+            input_ids[:, -1] = ml_service.tokenizer.eos_token_id
+            attention_mask = torch.ones_like(input_ids)
+
+            def forward():
+                with torch.no_grad():
+                    ml_service.model(input_ids=input_ids, attention_mask=attention_mask)
+
+            results.append(measure(
+                f"forward[bs={batch_size},len={seq_len}]", forward,
+                repeat=repeat, items=batch_size, batch_size=batch_size, seq_len=seq_len
+            ))
+    return results
+
+
+def bench_predict(ml_service, repeat):
+    comments = load_comments(32)
+    mixed = comments[:31] + [" ".join(load_comments(60))]
+    return [
+        measure("predict_single", lambda: ml_service.predict_single(comments[0]), repeat=repeat),
+        measure("predict_batch[n=32]", lambda: ml_service.predict_batch(comments),
+                repeat=max(1, repeat // 2), items=len(comments), n=len(comments)),
+        # One long review (several model windows) among short ones
+        measure("predict_batch[mixed,n=32]", lambda: ml_service.predict_batch(mixed),
+                repeat=max(1, repeat // 2), items=len(mixed), n=len(mixed)),
+    ]
+
+
+def bench_wordcloud(repeat):
+    from app.services.visualization_service import get_viz_service
+    from app.config import WORDCLOUD_DIR
+
+    viz_service = get_viz_service()
+    comments = load_comments(200)
+    filename = "benchmark_wordcloud.png"
+    try:
+        return [measure("generate_wordcloud[n=200]", lambda: viz_service.generate_wordcloud(comments, filename),
+                        repeat=max(1, repeat // 3), items=len(comments), n=len(comments))]
+    finally:
+        (WORDCLOUD_DIR / filename).unlink(missing_ok=True)
+
+
+def bench_report(repeat):
+    from app.services.report_service import get_report_service
+    from app.services.prediction_batch import PredictionBatch
+
+    report_service = get_report_service()
+    results = []
+    for n in (20, 200):
+        predictions = PredictionBatch(load_comments(n), [i % 5 + 1 for i in range(n)], [0.9] * n)
+        distribution = predictions.distribution()
+        results.append(measure(
+            f"generate_pdf_report[n={n}]",
+            lambda: report_service.generate_pdf_report(predictions, distribution, None, "bench"),
+            repeat=max(1, repeat // 3), items=n, n=n
+        ))
+    return results
+
+
+def bench_history(repeat):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.database import Base
+    from app.models import User, PredictionHistory
+    from app.services.history_service import save_prediction_history
+    from app.services.prediction_batch import PredictionBatch
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add(User(username="bench", email="bench@example.com", hashed_password="x"))
+        db.commit()
+
+    n = 1000
+    predictions = PredictionBatch(load_comments(n), [5] * n, [0.9] * n)
+
+    def orm_per_row():
+        with Session() as db:
+            for pred in predictions:
+                db.add(PredictionHistory(user_id=1, product_name="p", comment=pred['text'],
+                                         predicted_rating=pred['rating'], confidence_score=pred['confidence'],
+                                         prediction_type='batch'))
+            db.commit()
+
+    def bulk_insert():
+        with Session() as db:
+            save_prediction_history(db, 1, "p", predictions)
+
+    return [
+        measure(f"history_insert_orm[n={n}]", orm_per_row, repeat=max(1, repeat // 2), items=n, n=n),
+        measure(f"history_insert_bulk[n={n}]", bulk_insert, repeat=max(1, repeat // 2), items=n, n=n),
+    ]
+
+
+SUITES = ['preprocess', 'tokenize', 'forward', 'predict', 'wordcloud', 'report', 'history']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline inference micro-benchmarks")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Regression threshold (0.2 = +20%% p50)")
+    parser.add_argument("--only", action="append", choices=SUITES, help="Run only these suites (repeatable)")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--quick", action="store_true", help="Fewer repetitions (smoke run)")
+    args = parser.parse_args()
+
+    repeat = 3 if args.quick else args.repeat
+    suites = args.only or SUITES
+
+    from app.services.ml_service import ml_service
+    if not ml_service.standin:
+        print("⚠️  ML_STANDIN_MODEL is disabled - benchmarking the real PhoBERT weights")
+    ml_service._load_model()
+
+    results = []
+    for suite in suites:
+        print(f"\n▶ {suite}")
+        if suite == 'preprocess':
+            results += bench_preprocess(ml_service, repeat)
+        elif suite == 'tokenize':
+            results += bench_tokenize(ml_service, repeat)
+        elif suite == 'forward':
+            results += bench_forward(ml_service, repeat)
+        elif suite == 'predict':
+            results += bench_predict(ml_service, repeat)
+        elif suite == 'wordcloud':
+            results += bench_wordcloud(repeat)
+        elif suite == 'report':
+            results += bench_report(repeat)
+        elif suite == 'history':
+            results += bench_history(repeat)
+
+    if args.output:
+        write_results(args.output, results)
+
+    if args.compare:
+        regressions = compare(args.compare, results, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) above {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Startup-Time Benchmark
+Import time of `main` and time-to-first-byte of a freshly started server
+
+Every sample runs in a new interpreter, so module caches never leak between
+runs. Results use the same JSON format as benchmarks.run, so boot-time
+regressions can be caught with --compare.
+
+Usage (from the project root):
+    python -m benchmarks.startup_time --output startup.json
+    python -m benchmarks.startup_time --compare startup.json --threshold 0.2
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from benchmarks.harness import measure, summarize, write_results, compare
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _env():
+    env = dict(os.environ)
+    # Keep main.py away from the Windows-only HF cache path and the network
+    env.setdefault("RENDER", "1")
+    env.setdefault("HF_HUB_OFFLINE", "1")
+    env.setdefault("PRELOAD_HEAVY_MODULES", "false")
+    return env
+
+
+def _python(code: str):
+    subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, env=_env(), check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_byte(path: str = "/health", timeout: float = 60.0) -> float:
+    """Start uvicorn and poll `path` until it answers; returns seconds since spawn"""
+    port = _free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=PROJECT_ROOT, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        url = f"http://127.0.0.1:{port}{path}"
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited with code {server.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    response.read(1)
+                    return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError, socket.timeout):
+                time.sleep(0.01)
+        raise TimeoutError(f"No response from {url} within {timeout:.0f}s")
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def top_imports(limit: int):
+    """Print the slowest top-level imports of `main` (python -X importtime)"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            cwd=PROJECT_ROOT, env=_env(), capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # Indentation = nesting depth; keep direct imports of main and app modules
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth <= 2 or name.strip().startswith("app."):
+            rows.append((int(cumulative) / 1000, depth, name.strip()))
+    print("\n🐢 Slowest imports under main (cumulative ms)")
+    for ms, depth, name in sorted(rows, reverse=True)[:limit]:
+        print(f"  {ms:9.1f}  {'  ' * depth}{name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time and time-to-first-byte benchmark")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Regression threshold (0.2 = +20%% p50)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Show the N slowest imports (0 = skip)")
+    args = parser.parse_args()
+
+    print("\n▶ startup")
+    results = [
+        measure("interpreter_startup", lambda: _python("pass"), repeat=args.repeat, warmup=1),
+        measure("import_main", lambda: _python("import main"), repeat=args.repeat, warmup=1),
+    ]
+    # Measured from spawn to first byte; server shutdown is excluded
+    time_to_first_byte()
+    results.append(summarize("ttfb_health", [time_to_first_byte() for _ in range(args.repeat)]))
+
+    if args.top:
+        top_imports(args.top)
+
+    if args.output:
+        write_results(args.output, results)
+
+    if args.compare:
+        regressions = compare(args.compare, results, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) above {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@ Main FastAPI Application
 Sentiment Rating Prediction System
 """
 import os
+import threading
+from contextlib import asynccontextmanager
 
 # OPTIONAL: Set HuggingFace cache directory (only for local dev)
 # Comment this out for production to use default cache
@@ -10,22 +12,54 @@ if not os.getenv("RENDER"):  # Only for local development
     os.environ['HF_HOME'] = 'G:/huggingface_cache'
 
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
 
-from app.database import engine, Base
-from app.routers import auth, prediction, dashboard
+from app.config import COMPRESSION_MIN_SIZE, AUTO_CREATE_TABLES, PRELOAD_HEAVY_MODULES
+from app.database import engine
+from app.middleware import CompressionMiddleware, MetricsMiddleware, TracingMiddleware
+from app.static_files import CachedStaticFiles
+from app.routers import auth, prediction, jobs, dashboard, system
+from app.services.auth_cache import principal_cache
+from app.services.api_key_service import api_key_cache
+from app.services.tracing_service import instrument_engine
+from app.services.memory_governor import memory_governor
+from app.services.admission_service import admission
+from app.services.live_service import live_batcher
+from app.services.events_service import event_broker
+from app.services.visualization_service import viz_service
+from app.services.report_service import get_report_service
+from app.cli.init_db import create_tables
 
 # ============================================
-# DATABASE AUTO-MIGRATION
+# STARTUP / SHUTDOWN
 # ============================================
-# This creates all tables automatically on first deploy
-# Critical for PostgreSQL on Render (no manual migrations needed)
-print("🔄 Creating database tables...")
-Base.metadata.create_all(bind=engine)
-print("✅ Database tables created successfully!")
+def preload_heavy_modules():
+    """Import word cloud / matplotlib / reportlab off the request path"""
+    try:
+        viz_service.preload()
+        get_report_service()
+        print("✅ Visualization and report libraries preloaded")
+    except Exception as e:
+        print(f"⚠️ Preloading failed (will load on first use): {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create tables and start background workers for the app's lifetime"""
+    # DATABASE AUTO-MIGRATION
+    # Creates all tables automatically on first deploy (outside the import
+    # path, so tools importing `main` don't touch the database)
+    # Critical for PostgreSQL on Render (no manual migrations needed)
+    if AUTO_CREATE_TABLES:
+        create_tables()
+    
+    if PRELOAD_HEAVY_MODULES:
+        threading.Thread(target=preload_heavy_modules, name="preload", daemon=True).start()
+    memory_governor.start()
+    yield
+    await live_batcher.stop()
+    await event_broker.stop()
+    memory_governor.stop()
 
 # ============================================
 # INITIALIZE FASTAPI APP
@@ -35,7 +69,8 @@ app = FastAPI(
     description="ML-powered sentiment analysis for Vietnamese product reviews (1-5 stars)",
     version="1.0.0",
     docs_url="/docs",  # Swagger UI
-    redoc_url="/redoc"  # ReDoc
+    redoc_url="/redoc",  # ReDoc
+    lifespan=lifespan
 )
 
 # ============================================
@@ -50,10 +85,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ============================================
+# RESPONSE COMPRESSION (zstd / brotli / gzip)
+# ============================================
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+
+# ============================================
+# PER-REQUEST TRACING (span tree + slow-request log)
+# ============================================
+instrument_engine(engine)
+app.add_middleware(TracingMiddleware)
+
+# ============================================
+# REQUEST METRICS (outermost: sees total latency)
+# ============================================
+app.add_middleware(MetricsMiddleware)
+
 # ============================================
 # STATIC FILES & TEMPLATES
 # ============================================
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+# Hashed URLs (static_url) are cached for a year; precompressed .br/.gz
+# variants are sent when present (python -m app.cli.static compress)
+app.mount("/static", CachedStaticFiles(directory="app/static"), name="static")
 templates = Jinja2Templates(directory="app/templates")
 
 # ============================================
@@ -61,7 +114,9 @@ templates = Jinja2Templates(directory="app/templates")
 # ============================================
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(prediction.router, prefix="/api/predict", tags=["Prediction"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["Jobs"])
 app.include_router(dashboard.router, tags=["Dashboard"])
+app.include_router(system.router, tags=["System"])
 
 # ============================================
 # ROOT & HEALTH CHECK ENDPOINTS
@@ -81,7 +136,13 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "rating-prediction",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "auth_cache": principal_cache.stats(),
+        "api_key_cache": api_key_cache.stats(),
+        "memory": memory_governor.status(),
+        "admission": admission.stats(),
+        "live": live_batcher.stats(),
+        "events": event_broker.stats()
     }
 
 # ============================================
@@ -90,4 +151,5 @@ async def health_check():
 if __name__ == "__main__":
     # This only runs when executing: python main.py
     # On Render, gunicorn/uvicorn will be used instead
+    import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)